@@ -0,0 +1,237 @@
+import atexit
+from collections import deque
+import logging
+import threading
+import time
+from typing import Any, Deque, Dict, Optional, Sequence
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import (
+    DatabaseError,
+    InterfaceError,
+    OperationalError,
+    close_old_connections,
+)
+from django.dispatch import receiver
+
+from .ingest import Record, save_records
+
+logger = logging.getLogger(__name__)
+
+
+class BufferFull(Exception):
+    """
+    Raised when the write-behind buffer cannot accept more records.
+    """
+
+
+class WriteBehindBuffer:
+    """
+    Bounded in-process buffer of validated data records, written to the database
+    by a background worker with bulk inserts.
+
+    The worker flushes the buffer when it holds at least 'flush_records' records
+    or every 'flush_interval' seconds, whichever comes first. Records submitted
+    while the buffer holds 'max_records' records are rejected with BufferFull.
+    """
+
+    def __init__(
+        self, max_records: int, flush_records: int, flush_interval: float
+    ) -> None:
+        self.max_records = max_records
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+
+        self._records: Deque[Record] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+        self.submitted = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.deduplicated = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._records)
+
+    def submit(self, records: Sequence[Record]) -> None:
+        """
+        Queue records to be written by the next flush.
+
+        Raises:
+            BufferFull: If the records do not fit in the buffer.
+        """
+        with self._lock:
+            if len(self._records) + len(records) > self.max_records:
+                self.rejected += len(records)
+                raise BufferFull(f"Ingest buffer is full ({self.max_records} records).")
+            self._records.extend(records)
+            self.submitted += len(records)
+            depth = len(self._records)
+
+        if depth >= self.flush_records:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """
+        Write all the buffered records, in bulk inserts of at most 'flush_records'
+        records. Records failing because the database is unreachable are put back
+        in the buffer, up to 'max_records' records with the ones submitted during the
+        flush; the overflow and the records failing for any other database error are
+        dropped and counted as failed.
+
+        Returns:
+            The number of records written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                records = list(self._records)
+                self._records.clear()
+
+            if not records:
+                return 0
+
+            start = time.monotonic()
+            written = 0
+            for i in range(0, len(records), self.flush_records):
+                chunk = records[i : i + self.flush_records]
+                try:
+                    result = save_records(chunk)
+                except (InterfaceError, OperationalError):
+                    with self._lock:
+                        # the oldest records first, the buffer stays bounded
+                        room = max(self.max_records - len(self._records), 0)
+                        requeued = records[i : i + room]
+                        self._records.extendleft(reversed(requeued))
+                    dropped = len(records) - i - len(requeued)
+                    self.failed += dropped
+                    logger.exception(
+                        "Ingest buffer flush failed, %d records requeued, %d dropped",
+                        len(requeued),
+                        dropped,
+                    )
+                    break
+                except DatabaseError:
+                    logger.exception(
+                        "Ingest buffer flush failed, %d records dropped", len(chunk)
+                    )
+                    self.failed += len(chunk)
+                else:
+                    written += len(chunk)
+                    self.deduplicated += result.deduplicated
+
+            elapsed = time.monotonic() - start
+            self.flushed += written
+            self.flushes += 1
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+            return written
+
+    def start(self) -> None:
+        """
+        Start the background worker, and make sure the buffer is flushed when
+        the process exits.
+        """
+        if self._worker is not None:
+            return
+        self._worker = threading.Thread(
+            target=self._run, name="ingest-write-behind", daemon=True
+        )
+        self._worker.start()
+        atexit.register(self.stop)
+
+    def stop(self, flush: bool = True) -> None:
+        """
+        Stop the background worker, then flush the remaining records unless
+        'flush' is False.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+            atexit.unregister(self.stop)
+        if flush:
+            self.flush()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            # the worker thread has its own connection, recycle it like a request would
+            close_old_connections()
+            self.flush()
+            close_old_connections()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "capacity": self.max_records,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+            "avg_flush_seconds": (
+                self.total_flush_seconds / self.flushes if self.flushes else 0.0
+            ),
+        }
+
+
+_buffer: Optional[WriteBehindBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_ingest_buffer() -> Optional[WriteBehindBuffer]:
+    """
+    Return the process-wide write-behind buffer, started on first use,
+    or None when settings.INGEST_WRITE_BEHIND is disabled.
+    """
+    global _buffer
+
+    config = settings.INGEST_WRITE_BEHIND
+    if not config["ENABLED"]:
+        return None
+
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBehindBuffer(
+                max_records=config["MAX_RECORDS"],
+                flush_records=config["FLUSH_RECORDS"],
+                flush_interval=config["FLUSH_INTERVAL"],
+            )
+            _buffer.start()
+        return _buffer
+
+
+def ingest_buffer_stats() -> Optional[Dict[str, Any]]:
+    return _buffer.stats() if _buffer is not None else None
+
+
+@receiver(setting_changed)
+def reset_ingest_buffer(setting: str, **kwargs: Any) -> None:
+    # only happens in tests, buffered records are discarded with the old buffer
+    global _buffer
+
+    if setting != "INGEST_WRITE_BEHIND":
+        return
+    with _buffer_lock:
+        if _buffer is not None:
+            _buffer.stop(flush=False)
+            _buffer = None
@@ -0,0 +1,73 @@
+from typing import Any, List, Sequence, Tuple
+
+from django.db import connections
+from django.db.models import QuerySet
+
+from .models import Measurement
+
+# Each label is split in buckets of equal duration between its first and last row,
+# and each bucket keeps its lowest and highest values. Window functions do all the
+# work in the database: only the kept rows are sent to Python.
+MIN_MAX_SQL = """
+    WITH source AS ({source}),
+    bucketed AS (
+        SELECT
+            source.*,
+            count(*) OVER series AS series_size,
+            CASE
+                WHEN max(at) OVER series = min(at) OVER series THEN 0
+                ELSE least(
+                    floor(
+                        extract(epoch FROM at - min(at) OVER series)
+                        / extract(epoch FROM max(at) OVER series - min(at) OVER series)
+                        * %s
+                    )::integer,
+                    %s - 1
+                )
+            END AS bucket
+        FROM source
+        WINDOW series AS (PARTITION BY label)
+    ),
+    ranked AS (
+        SELECT
+            bucketed.*,
+            row_number() OVER (
+                PARTITION BY label, bucket ORDER BY value, at, id
+            ) AS lowest,
+            row_number() OVER (
+                PARTITION BY label, bucket ORDER BY value DESC, at, id
+            ) AS highest
+        FROM bucketed
+    )
+    SELECT {columns} FROM ranked
+    WHERE series_size <= %s OR lowest = 1 OR highest = 1
+    ORDER BY at, id
+"""
+
+
+def downsample(
+    queryset: QuerySet[Measurement], columns: Sequence[str], max_points: int
+) -> List[Tuple[Any, ...]]:
+    """
+    Reduce each label of the given measurements to at most max_points rows with
+    min/max bucketing: the time range of the label is cut in max_points / 2 buckets
+    and only the lowest and highest values of each bucket are kept, so that peaks
+    survive the reduction. Labels with at most max_points rows are kept whole.
+
+    Args:
+        queryset: Filtered measurements.
+        columns: Measurement columns to return, among 'label', 'at', 'value' and 'id'.
+        max_points: Maximum number of rows per label, at least 2.
+
+    Returns:
+        The kept rows as tuples of the given columns, ordered by ('at', 'id').
+    """
+    buckets = max_points // 2
+    source, params = (
+        queryset.values("id", "label", "at", "value").order_by().query.sql_with_params()
+    )
+    sql = MIN_MAX_SQL.format(source=source, columns=", ".join(columns))
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, [*params, buckets, buckets, max_points])
+        return cursor.fetchall()
@@ -0,0 +1,186 @@
+from datetime import datetime, tzinfo
+from typing import Any, List, Sequence, Tuple
+
+from django.db import connections
+
+from .models import MEASUREMENT_RULES
+from .rollups import PERCENTILES, segments_queryset
+from .spans import Span
+
+# how the slots without measurements are filled
+FILLS: List[str] = ["null", "previous", "linear"]
+
+# statistics of a merged slot, see SlotAggregate.statistic
+STATISTIC_SQL = {
+    "count": "count",
+    "min": "min",
+    "max": "max",
+    "avg": "sum / count",
+    "sum": "sum",
+    # sample standard deviation, like stddev_samp
+    "stddev": (
+        "CASE WHEN count > 1 THEN "
+        "sqrt(greatest((sum_sq - sum * sum / count) / (count - 1), 0)) END"
+    ),
+    **{name: name for name in PERCENTILES},
+}
+
+# The segments are merged per slot and joined to the full time axis of the range,
+# generated in local time like the slots. Empty slots are filled with window
+# functions over the runs of null values of each label: 'previous' carries the last
+# value forward, 'linear' interpolates between the values around the run.
+FILL_SQL = """
+    WITH segments AS ({segments}),
+    slots AS (
+        SELECT
+            label,
+            {local_slot} AS local_slot,
+            sum(slot_count)::double precision AS count,
+            sum(slot_sum) AS sum,
+            min(slot_min) AS min,
+            max(slot_max) AS max,
+            sum(slot_sum_sq) AS sum_sq{percentiles}
+        FROM segments
+        GROUP BY 1, 2
+    ),
+    axis AS (
+        SELECT label, local_slot
+        FROM (SELECT DISTINCT label FROM slots) AS labels
+        CROSS JOIN generate_series({first_slot}, %s AT TIME ZONE %s, {step}) AS local_slot
+    ),
+    series AS (
+        SELECT axis.label, axis.local_slot, {values}
+        FROM axis LEFT JOIN slots USING (label, local_slot)
+    ),
+    runs AS (
+        SELECT series.*{runs}
+        FROM series
+        WINDOW
+            forward AS (PARTITION BY label ORDER BY local_slot),
+            backward AS (PARTITION BY label ORDER BY local_slot DESC)
+    )
+    SELECT label, local_slot AT TIME ZONE %s, {filled}
+    FROM runs
+    ORDER BY label, local_slot
+"""
+
+
+def fill_summary(
+    datalogger_id: str,
+    span: Span,
+    since: datetime,
+    before: datetime,
+    tz: tzinfo,
+    statistics: Sequence[str],
+    fill: str,
+) -> List[Tuple[Any, ...]]:
+    """
+    Summarize a datalogger like summarize, with a row for every slot of the range
+    of each label, in a single query. The time axis is generated by the database and
+    the slots without measurements are filled there.
+
+    Args:
+        datalogger_id: Id of the datalogger to summarize.
+        span: Length of the slots.
+        since: Start of the range (inclusive).
+        before: End of the range (inclusive).
+        tz: Time zone of the slots.
+        statistics: STATISTICS to return, the value aggregated according to the
+            rule of each label when empty.
+        fill: One of FILLS: empty slots have null values, the last value before
+            them, or values interpolated linearly in time between the values around
+            them. Counts of empty slots are always 0.
+
+    Returns:
+        (label, slot, *values) rows ordered by label and slot.
+    """
+    percentiles = [name for name in statistics if name in PERCENTILES]
+    queryset = segments_queryset([datalogger_id], span, since, before, tz, percentiles)
+    segments, segments_params = queryset.query.sql_with_params()
+
+    # date_trunc slots (Trunc) are local timestamps, date_bin slots (DateBin) are
+    # timestamptz
+    if span.truncation is not None:
+        local_slot, local_slot_params = "time_slot", []
+    else:
+        local_slot, local_slot_params = "time_slot AT TIME ZONE %s", [str(tz)]
+    first_slot, first_slot_params = span.local_slot_sql("%s AT TIME ZONE %s")
+    step, step_params = span.step_sql()
+
+    if statistics:
+        values = [STATISTIC_SQL[name] for name in statistics]
+    else:
+        # the value aggregated according to the rule of the label
+        values = [
+            "CASE label "
+            + " ".join(
+                f"WHEN '{label}' THEN {STATISTIC_SQL[rule.aggregate]}"
+                for label, rule in MEASUREMENT_RULES.items()
+            )
+            + " END"
+        ]
+    columns = [f"v{i}" for i in range(len(values))]
+    counts = [name == "count" for name in statistics] or [False]
+
+    runs: List[str] = []
+    filled: List[str] = []
+    for column, is_count in zip(columns, counts):
+        if is_count:
+            filled.append(f"coalesce({column}, 0)::integer")
+            continue
+        if fill == "null":
+            filled.append(column)
+            continue
+        # a run starts at a value and goes on over the following empty slots
+        runs.append(
+            f", count({column}) OVER forward AS {column}_before"
+            f", count({column}) OVER backward AS {column}_after"
+        )
+        previous = f"max({column}) OVER (PARTITION BY label, {column}_before)"
+        if fill == "previous":
+            filled.append(f"coalesce({column}, {previous})")
+            continue
+        previous_slot = (
+            f"max(local_slot) FILTER (WHERE {column} IS NOT NULL) "
+            f"OVER (PARTITION BY label, {column}_before)"
+        )
+        following = f"max({column}) OVER (PARTITION BY label, {column}_after)"
+        following_slot = (
+            f"min(local_slot) FILTER (WHERE {column} IS NOT NULL) "
+            f"OVER (PARTITION BY label, {column}_after)"
+        )
+        filled.append(
+            f"coalesce({column}, {previous} + ({following} - {previous}) "
+            f"* extract(epoch FROM local_slot - {previous_slot}) "
+            f"/ extract(epoch FROM {following_slot} - {previous_slot}))"
+        )
+
+    sql = FILL_SQL.format(
+        segments=segments,
+        local_slot=local_slot,
+        percentiles="".join(f", max(slot_{name}) AS {name}" for name in percentiles),
+        first_slot=first_slot,
+        step=step,
+        values=", ".join(
+            f"{value} AS {column}" for value, column in zip(values, columns)
+        ),
+        runs="".join(runs),
+        filled=", ".join(filled),
+    )
+    tzname = str(tz)
+    params = [
+        *segments_params,
+        *local_slot_params,
+        *first_slot_params[:1],
+        since,
+        tzname,
+        *first_slot_params[1:],
+        before,
+        tzname,
+        *step_params,
+        tzname,
+    ]
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
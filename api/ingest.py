@@ -0,0 +1,281 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .latest import latest_values, record_latest_values
+from .models import Datalogger, Measurement
+from .registry import get_datalogger_registry, get_dataloggers
+from .rollups import fold_rollups_when_due, queue_deltas_sql
+from .summary_cache import WriteRange, record_summary_writes
+
+# A record is the validated data of a DataRecordRequestSerializer
+Record = Dict[str, Any]
+
+# A measurement is unique per datalogger (as a string), label and timestamp
+MeasurementKey = Tuple[str, str, datetime]
+
+# The dataloggers of the batch are created if needed by the same statement: the
+# registry of this process may still hold a datalogger deleted by another one. The
+# rows actually inserted are queued for the rollups by the same statement too.
+INSERT_SQL = """
+    WITH dataloggers AS (
+        INSERT INTO {datalogger_table} (id, lat, lng)
+        SELECT * FROM unnest(%s::uuid[], %s::double precision[], %s::double precision[])
+        ON CONFLICT (id) DO NOTHING
+    ),
+    source AS ({source}),
+    inserted AS (
+        INSERT INTO {table} (datalogger_id, label, at, value)
+        SELECT datalogger_id, label, at, value FROM source
+        ON CONFLICT (datalogger_id, label, at) DO NOTHING
+        RETURNING datalogger_id, label, at, value
+    ),
+    {deltas}
+    SELECT datalogger_id, label, at FROM inserted
+"""
+
+# one array parameter per column, the statement size does not grow with the batch
+VALUES_SOURCE = """
+    SELECT * FROM unnest(
+        %s::uuid[], %s::varchar[], %s::timestamptz[], %s::double precision[]
+    ) AS source (datalogger_id, label, at, value)
+"""
+
+STAGING_TABLE = "measurement_staging"
+
+CREATE_STAGING_SQL = f"""
+    CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} (
+        datalogger_id uuid, label varchar(20), at timestamptz, value double precision
+    ) ON COMMIT DELETE ROWS
+"""
+
+# rows are moved out of the staging table by the insert itself
+STAGING_SOURCE = f"""
+    DELETE FROM {STAGING_TABLE} RETURNING datalogger_id, label, at, value
+"""
+
+
+@dataclass
+class IngestResult:
+    """
+    Outcome of save_records: the measurements of each record (in input order) and
+    how many of them were inserted, the others being duplicates of stored rows.
+    """
+
+    measurements: List[List[Measurement]]
+    inserted_per_record: List[int]
+
+    @property
+    def inserted(self) -> int:
+        return sum(self.inserted_per_record)
+
+    @property
+    def deduplicated(self) -> int:
+        return sum(len(m) for m in self.measurements) - self.inserted
+
+
+def measurement_key(measurement: Measurement) -> MeasurementKey:
+    return (str(measurement.datalogger_id), measurement.label, measurement.at)  # type: ignore[attr-defined, return-value]
+
+
+def resolve_dataloggers(records: Sequence[Record]) -> Dict[str, Datalogger]:
+    """
+    Fetch the dataloggers referenced by the given records from the registry (at most
+    one query for the unknown ones). The missing ones are built from the location of
+    their first record, and created by the insert of their measurements.
+
+    Args:
+        records: Validated data records.
+
+    Returns:
+        A mapping of datalogger id (as a string) to Datalogger instance.
+    """
+    found = get_dataloggers(record["datalogger"] for record in records)
+    dataloggers: Dict[str, Datalogger] = {
+        pk: datalogger for pk, datalogger in found.items() if datalogger is not None
+    }
+
+    missing: Dict[str, Datalogger] = {}
+    for record in records:
+        datalogger_id = record["datalogger"]
+        if datalogger_id in dataloggers or datalogger_id in missing:
+            continue
+        missing[datalogger_id] = Datalogger(
+            id=datalogger_id,
+            lat=record["location"]["lat"],
+            lng=record["location"]["lng"],
+        )
+
+    if missing:
+        dataloggers.update(missing)
+        registry = get_datalogger_registry()
+        transaction.on_commit(lambda: registry.add(missing.values()))
+
+    return dataloggers
+
+
+def copy_measurements(measurements: Sequence[Measurement]) -> str:
+    """
+    Load measurements in a temporary staging table with a PostgreSQL COPY, which
+    streams all the rows in a single statement and is much cheaper than a multi-row
+    INSERT for large batches.
+
+    Args:
+        measurements: Unsaved Measurement instances.
+
+    Returns:
+        The statement moving the staged rows, to be used as the source of an INSERT.
+    """
+    sql = f"COPY {STAGING_TABLE} (datalogger_id, label, at, value) FROM STDIN"
+
+    with connection.cursor() as cursor, connection.wrap_database_errors:
+        cursor.execute(CREATE_STAGING_SQL)
+        with cursor.copy(sql) as copy:
+            for m in measurements:
+                copy.write_row((m.datalogger_id, m.label, m.at, m.value))  # type: ignore[attr-defined]
+
+    return STAGING_SOURCE
+
+
+def insert_measurements(measurements: Sequence[Measurement]) -> Set[MeasurementKey]:
+    """
+    Insert measurements with a single INSERT ... ON CONFLICT DO NOTHING, fed by
+    array parameters or, when the batch reaches settings.INGEST_COPY_THRESHOLD rows,
+    by a COPY into a staging table. Rows already stored are skipped, and the
+    dataloggers of the measurements are created when they no longer exist.
+
+    Args:
+        measurements: Unsaved Measurement instances.
+
+    Returns:
+        The keys of the rows actually inserted.
+    """
+    if not measurements:
+        return set()
+
+    threshold = settings.INGEST_COPY_THRESHOLD
+    params: List[List[Any]] = []
+    if threshold is not None and len(measurements) >= threshold:
+        source = copy_measurements(measurements)
+    else:
+        source = VALUES_SOURCE
+        params = [
+            # existing dataloggers have UUID keys, new ones the validated string
+            [str(m.datalogger_id) for m in measurements],  # type: ignore[attr-defined]
+            [m.label for m in measurements],
+            [m.at for m in measurements],
+            [m.value for m in measurements],
+        ]
+
+    dataloggers = {
+        str(m.datalogger_id): m.datalogger  # type: ignore[attr-defined]
+        for m in measurements
+    }
+    # new dataloggers are locked in id order, like the rollup slots
+    ids = sorted(dataloggers)
+    datalogger_params: List[List[Any]] = [
+        ids,
+        [dataloggers[pk].lat for pk in ids],
+        [dataloggers[pk].lng for pk in ids],
+    ]
+
+    deltas, delta_params = queue_deltas_sql("inserted")
+    sql = INSERT_SQL.format(
+        datalogger_table=Datalogger._meta.db_table,
+        table=Measurement._meta.db_table,
+        source=source,
+        deltas=deltas,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*datalogger_params, *params, *delta_params])
+        return {(str(pk), label, at) for pk, label, at in cursor.fetchall()}
+
+
+def write_ranges(keys: Iterable[MeasurementKey]) -> Dict[str, WriteRange]:
+    """
+    Range of the timestamps of measurements, per datalogger.
+
+    Args:
+        keys: Keys of the measurements.
+
+    Returns:
+        The first and last timestamps per datalogger id.
+    """
+    ranges: Dict[str, WriteRange] = {}
+    for datalogger_id, _, at in keys:
+        first, last = ranges.get(datalogger_id, (at, at))
+        ranges[datalogger_id] = (min(first, at), max(last, at))
+    return ranges
+
+
+@transaction.atomic
+def save_records(records: Sequence[Record]) -> IngestResult:
+    """
+    Persist several data records at once: at most one query to resolve the dataloggers
+    (none when they are all in the registry) and one statement to insert all the
+    measurements.
+
+    Measurements are unique per (datalogger, label, at): duplicates within the batch
+    and rows already stored are counted as deduplicated instead of being inserted
+    again. Replays always reach the INSERT, whose ON CONFLICT clause is the only
+    source of truth about the stored rows.
+
+    Args:
+        records: Validated data records, possibly for different dataloggers.
+
+    Returns:
+        The measurements of each record and how many of them were inserted.
+    """
+    if not records:
+        return IngestResult(measurements=[], inserted_per_record=[])
+
+    dataloggers = resolve_dataloggers(records)
+
+    measurements_per_record: List[List[Measurement]] = []
+    for record in records:
+        datalogger = dataloggers[record["datalogger"]]
+        measurements_per_record.append(
+            [
+                Measurement(
+                    datalogger=datalogger,
+                    label=m["label"],
+                    value=m["value"],
+                    at=record["at"],
+                )
+                for m in record["measurements"]
+            ]
+        )
+
+    pending: Dict[MeasurementKey, Measurement] = {}
+    for measurements in measurements_per_record:
+        for m in measurements:
+            key = measurement_key(m)
+            if key not in pending:
+                pending[key] = m
+
+    inserted = insert_measurements(list(pending.values()))
+
+    if inserted:
+        ranges = write_ranges(inserted)
+        latest = latest_values(pending[key] for key in inserted)
+        transaction.on_commit(lambda: record_summary_writes(ranges))
+        transaction.on_commit(lambda: record_latest_values(latest))
+        transaction.on_commit(fold_rollups_when_due)
+
+    inserted_per_record: List[int] = []
+    for measurements in measurements_per_record:
+        # a key inserted once is only counted for its first occurrence
+        inserted_per_record.append(
+            sum(
+                1
+                for m in measurements
+                if pending.get(key := measurement_key(m)) is m and key in inserted
+            )
+        )
+
+    return IngestResult(
+        measurements=measurements_per_record, inserted_per_record=inserted_per_record
+    )
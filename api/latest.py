@@ -0,0 +1,251 @@
+from datetime import datetime
+import math
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Datalogger, Measurement
+
+# last measurement of a label: (at, value)
+LatestValue = Tuple[datetime, float]
+
+# last measurement of each label of each datalogger, by datalogger id and label
+LatestValues = Dict[str, Dict[str, LatestValue]]
+
+
+class LatestValueStore:
+    """
+    In-memory store of the last measurement of each label of each datalogger, so
+    that "what is the current temperature of logger X" never reaches the database.
+
+    The store is warmed with the last values of the whole fleet by a single query,
+    then kept up to date by the writes committed by this process (see
+    save_records). Entries expire after 'ttl' seconds (never when None) to catch up
+    with the writes of other processes, and are then reloaded one datalogger at a
+    time.
+    """
+
+    def __init__(self, ttl: Optional[float]) -> None:
+        self.ttl = ttl
+
+        self._entries: Dict[str, Tuple[Dict[str, LatestValue], float]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.warmed = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def warm(self) -> None:
+        """
+        Load the last values of all the dataloggers, with one DISTINCT ON query.
+        Dataloggers without measurements are loaded when they are looked up.
+        """
+        values: LatestValues = {}
+        for pk, label, value in latest_values_query(None):
+            values.setdefault(pk, {})[label] = value
+        self.add(values)
+        self.warmed = True
+
+    def get_many(self, ids: Iterable[str]) -> LatestValues:
+        """
+        Look up the last values of several dataloggers.
+
+        Args:
+            ids: Datalogger ids, as strings.
+
+        Returns:
+            The last value of each label of the stored dataloggers. Ids missing from
+            the mapping are unknown or expired.
+        """
+        found: LatestValues = {}
+        now = time.monotonic()
+
+        with self._lock:
+            for pk in ids:
+                entry = self._entries.get(pk)
+                if entry is None or entry[1] <= now:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                # a copy, stored values are updated by other threads
+                found[pk] = dict(entry[0])
+
+        return found
+
+    def add(self, values: LatestValues) -> None:
+        """
+        Store the last values read from the database for some dataloggers, which
+        expire after 'ttl' seconds.
+        """
+        expires = time.monotonic() + self.ttl if self.ttl is not None else math.inf
+        with self._lock:
+            for pk, labels in values.items():
+                entry = self._entries.get(pk)
+                # a value committed since the values were read wins
+                merged = dict(labels)
+                if entry is not None:
+                    merge(merged, entry[0])
+                self._entries[pk] = (merged, expires)
+
+    def update(self, values: LatestValues) -> None:
+        """
+        Record committed measurements in the stored dataloggers, the others are
+        loaded with all their labels when they are looked up.
+        """
+        with self._lock:
+            for pk, labels in values.items():
+                entry = self._entries.get(pk)
+                if entry is not None:
+                    merge(entry[0], labels)
+
+    def invalidate(self, pk: str) -> None:
+        with self._lock:
+            self._entries.pop(pk, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "warmed": self.warmed,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def merge(values: Dict[str, LatestValue], others: Dict[str, LatestValue]) -> None:
+    # keeps the most recent value of each label
+    for label, value in others.items():
+        current = values.get(label)
+        if current is None or value[0] > current[0]:
+            values[label] = value
+
+
+def latest_values_query(
+    ids: Optional[List[str]],
+) -> Iterable[Tuple[str, str, LatestValue]]:
+    """
+    Read the last value of each label of some dataloggers, all of them when None,
+    with a single DISTINCT ON query walking the (datalogger, label, at) index.
+
+    Returns:
+        (datalogger id, label, (at, value)) rows.
+    """
+    queryset = Measurement.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(datalogger_id__in=ids)
+    rows = (
+        queryset.order_by("datalogger_id", "label", "-at")
+        .distinct("datalogger_id", "label")
+        .values_list("datalogger_id", "label", "at", "value")
+    )
+    return ((str(pk), label, (at, value)) for pk, label, at, value in rows)
+
+
+def latest_values(measurements: Iterable[Measurement]) -> LatestValues:
+    """
+    The last value of each label of each datalogger among some measurements.
+    """
+    values: LatestValues = {}
+    for m in measurements:
+        merge(
+            values.setdefault(str(m.datalogger_id), {}),  # type: ignore[attr-defined]
+            {m.label: (m.at, m.value)},
+        )
+    return values
+
+
+_store: Optional[LatestValueStore] = None
+_store_lock = threading.Lock()
+
+
+def get_latest_store() -> Optional[LatestValueStore]:
+    """
+    Return the process-wide store of the last values, warmed on first use, or None
+    when settings.LATEST_VALUES is disabled.
+    """
+    global _store
+
+    config = settings.LATEST_VALUES
+    if not config["ENABLED"]:
+        return None
+
+    with _store_lock:
+        if _store is None:
+            store = LatestValueStore(ttl=config["TTL"])
+            store.warm()
+            _store = store
+        return _store
+
+
+def get_latest_values(ids: List[str]) -> LatestValues:
+    """
+    Fetch the last values of existing dataloggers from the store, querying the
+    database only for the dataloggers it does not hold. Values read from the
+    database are stored once the current transaction is committed.
+
+    Args:
+        ids: Ids of existing dataloggers, as strings.
+
+    Returns:
+        The last value of each label of each datalogger, no label for a datalogger
+        without measurements.
+    """
+    store = get_latest_store()
+    values = store.get_many(ids) if store is not None else {}
+
+    unknown = [pk for pk in ids if pk not in values]
+    if unknown:
+        fetched: LatestValues = {pk: {} for pk in unknown}
+        for pk, label, value in latest_values_query(unknown):
+            fetched[pk][label] = value
+        if store is not None:
+            transaction.on_commit(lambda: store.add(fetched))
+        values.update(fetched)
+
+    return values
+
+
+def record_latest_values(values: LatestValues) -> None:
+    if _store is not None and values:
+        _store.update(values)
+
+
+def clear_latest_values() -> None:
+    if _store is not None:
+        _store.clear()
+
+
+def latest_store_stats() -> Optional[Dict[str, Any]]:
+    return _store.stats() if _store is not None else None
+
+
+@receiver(post_delete, sender=Datalogger)
+def forget_deleted_datalogger(instance: Datalogger, **kwargs: Any) -> None:
+    # like the registry, dropped right away and again once the deletion is committed
+    store = _store
+    if store is not None:
+        pk = str(instance.id)
+        store.invalidate(pk)
+        transaction.on_commit(lambda: store.invalidate(pk))
+
+
+@receiver(setting_changed)
+def reset_latest_store(setting: str, **kwargs: Any) -> None:
+    global _store
+
+    if setting != "LATEST_VALUES":
+        return
+    with _store_lock:
+        _store = None
@@ -0,0 +1,161 @@
+from datetime import timedelta
+import random
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Sequence
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils.timezone import now
+
+from api.ingest import Record, save_records
+from api.management.commands.populate_db import LABELS, RANGES
+from api.models import Datalogger, Measurement
+
+
+def save_records_per_row(records: Sequence[Record]) -> None:
+    """
+    Former write path of DataRecordRequestSerializer.create, kept as the
+    baseline: one get_or_create per record and one INSERT per measurement.
+    """
+    for record in records:
+        with transaction.atomic():
+            datalogger, _ = Datalogger.objects.get_or_create(
+                id=record["datalogger"],
+                defaults={
+                    "lat": record["location"]["lat"],
+                    "lng": record["location"]["lng"],
+                },
+            )
+            for m in record["measurements"]:
+                Measurement.objects.create(
+                    datalogger=datalogger,
+                    label=m["label"],
+                    value=m["value"],
+                    at=record["at"],
+                )
+
+
+def save_records_without_copy(records: Sequence[Record]) -> None:
+    with override_settings(INGEST_COPY_THRESHOLD=None):
+        save_records(records)
+
+
+def save_records_with_copy(records: Sequence[Record]) -> None:
+    with override_settings(INGEST_COPY_THRESHOLD=1):
+        save_records(records)
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the ingest write path: statements per request and rows/sec of the
+    former per-row inserts against the set-based (multi-row INSERT and COPY) path.
+    Everything written by the benchmark is rolled back.
+    """
+
+    def add_arguments(self, parser: Any) -> None:
+        """
+        Add command-line arguments to size the benchmark.
+
+        Args:
+            parser: The argument parser instance.
+        """
+        parser.add_argument(
+            "--requests", type=int, default=200, help="Number of ingest requests"
+        )
+        parser.add_argument(
+            "--dataloggers", type=int, default=10, help="Number of dataloggers"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Records per request for the batch strategies",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Generate random records and time each write strategy on them.
+
+        Args:
+            *args: Additional positional arguments.
+            **options: Command options, expects 'requests', 'dataloggers' and 'batch-size'.
+        """
+        records = self.generate_records(options["requests"], options["dataloggers"])
+        batch_size = options["batch_size"]
+
+        single = [[record] for record in records]
+        batches = [
+            records[i : i + batch_size] for i in range(0, len(records), batch_size)
+        ]
+
+        strategies: List[tuple[str, Callable[[Sequence[Record]], None], Any]] = [
+            ("per-row (before)", save_records_per_row, single),
+            ("set-based INSERT", save_records_without_copy, single),
+            (f"batch x{batch_size} per-row", save_records_per_row, batches),
+            (f"batch x{batch_size} INSERT", save_records_without_copy, batches),
+            (f"batch x{batch_size} COPY", save_records_with_copy, batches),
+        ]
+
+        rows = sum(len(r["measurements"]) for r in records)
+        self.stdout.write(f"{len(records)} records, {rows} measurements")
+        self.stdout.write(f"{'strategy':<24} {'statements/request':>20} {'rows/s':>12}")
+
+        for name, save, requests in strategies:
+            statements, elapsed = self.run(save, requests)
+            self.stdout.write(
+                f"{name:<24} {statements / len(requests):>20.1f} {rows / elapsed:>12.0f}"
+            )
+
+    def run(
+        self,
+        save: Callable[[Sequence[Record]], None],
+        requests: List[List[Record]],
+    ) -> tuple[int, float]:
+        """
+        Run a write strategy on all the requests inside a rolled back transaction.
+
+        Returns:
+            The number of statements executed and the elapsed time in seconds.
+        """
+        statements = 0
+        elapsed = 0.0
+
+        with transaction.atomic():
+            for request in requests:
+                # the query log is bounded, count it one request at a time
+                reset_queries()
+                with CaptureQueriesContext(connection) as queries:
+                    start = perf_counter()
+                    save(request)
+                    elapsed += perf_counter() - start
+                statements += len(queries)
+            transaction.set_rollback(True)
+
+        return statements, elapsed
+
+    def generate_records(self, count: int, num_dataloggers: int) -> List[Record]:
+        locations: Dict[str, Dict[str, float]] = {
+            str(uuid4()): {
+                "lat": round(random.uniform(-90, 90), 4),
+                "lng": round(random.uniform(-180, 180), 4),
+            }
+            for _ in range(num_dataloggers)
+        }
+        base_time = now() - timedelta(days=5)
+
+        records: List[Record] = []
+        for i in range(count):
+            datalogger_id = random.choice(list(locations))
+            records.append(
+                {
+                    "datalogger": datalogger_id,
+                    "location": locations[datalogger_id],
+                    "at": base_time + timedelta(seconds=i),
+                    "measurements": [
+                        {"label": label, "value": RANGES[label]()} for label in LABELS
+                    ],
+                }
+            )
+        return records
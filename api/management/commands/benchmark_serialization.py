@@ -0,0 +1,108 @@
+from datetime import timedelta
+from time import perf_counter
+from typing import Any, Callable, List
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils.timezone import now
+from rest_framework.renderers import JSONRenderer
+
+from api.ingest import Record, save_records
+from api.management.commands.populate_db import LABELS, RANGES
+from api.models import Measurement
+from api.serializers import DataRecordResponseSerializer, MeasurementRowSerializer
+
+
+def serialize_instances(queryset: QuerySet[Measurement]) -> bytes:
+    """
+    Former read path: model instances serialized by DataRecordResponseSerializer.
+    """
+    return JSONRenderer().render(DataRecordResponseSerializer(queryset, many=True).data)
+
+
+def serialize_rows(queryset: QuerySet[Measurement]) -> bytes:
+    serializer = MeasurementRowSerializer()
+    rows = queryset.values_list(*serializer.columns)
+    return JSONRenderer().render(list(serializer.serialize(rows)))
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the read path of /api/data: rows/sec fetched, serialized and rendered
+    with DataRecordResponseSerializer against MeasurementRowSerializer, and check that
+    both produce the same bytes. Everything written by the benchmark is rolled back.
+    """
+
+    def add_arguments(self, parser: Any) -> None:
+        """
+        Add command-line arguments to size the benchmark.
+
+        Args:
+            parser: The argument parser instance.
+        """
+        parser.add_argument(
+            "--rows", type=int, default=30_000, help="Number of measurements"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs per serializer, best is kept"
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Write random measurements for one datalogger, then time each serializer
+        on all of them.
+
+        Args:
+            *args: Additional positional arguments.
+            **options: Command options, expects 'rows' and 'repeat'.
+        """
+        num_rows = options["rows"]
+        strategies: List[tuple[str, Callable[[QuerySet[Measurement]], bytes]]] = [
+            ("DataRecordResponseSerializer", serialize_instances),
+            ("MeasurementRowSerializer", serialize_rows),
+        ]
+
+        with transaction.atomic():
+            datalogger_id = uuid4()
+            save_records(self.generate_records(str(datalogger_id), num_rows))
+            queryset = Measurement.objects.filter(datalogger=datalogger_id).order_by(
+                "at", "id"
+            )
+
+            self.stdout.write(f"{num_rows} measurements")
+            self.stdout.write(f"{'serializer':<30} {'rows/s':>12}")
+
+            outputs = []
+            for name, serialize in strategies:
+                best = float("inf")
+                for _ in range(options["repeat"]):
+                    start = perf_counter()
+                    output = serialize(queryset)
+                    best = min(best, perf_counter() - start)
+                outputs.append(output)
+                self.stdout.write(f"{name:<30} {num_rows / best:>12.0f}")
+
+            transaction.set_rollback(True)
+
+        if all(output == outputs[0] for output in outputs):
+            self.stdout.write(self.style.SUCCESS("Outputs are identical."))
+        else:
+            self.stdout.write(self.style.ERROR("Outputs differ."))
+
+    def generate_records(self, datalogger_id: str, num_rows: int) -> List[Record]:
+        location = {"lat": 47.56321, "lng": 1.524568}
+        base_time = now() - timedelta(days=30)
+        return [
+            {
+                "datalogger": datalogger_id,
+                "location": location,
+                "at": base_time + timedelta(minutes=i),
+                "measurements": [
+                    {"label": label, "value": RANGES[label]()}
+                    for label in LABELS[: num_rows - i * len(LABELS)]
+                ],
+            }
+            for i in range(-(-num_rows // len(LABELS)))
+        ]
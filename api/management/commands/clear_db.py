@@ -2,7 +2,9 @@ from typing import Any
 
 from django.core.management.base import BaseCommand
 
+from api.latest import clear_latest_values
 from api.models import Datalogger, Measurement
+from api.summary_cache import get_summary_cache
 
 
 class Command(BaseCommand):
@@ -10,11 +12,16 @@ class Command(BaseCommand):
 
     def handle(self, *args: Any, **options: Any) -> None:
         """
-        Delete all records from the Measurement and Datalogger tables,
-        then output a success message.
+        Delete all records from the Measurement and Datalogger tables, the cached
+        summaries and latest values, then output a success message.
         """
         Measurement.objects.all().delete()
         Datalogger.objects.all().delete()
+        # deletions are not logged as writes, cached summaries would outlive the data
+        summary_cache = get_summary_cache()
+        if summary_cache is not None:
+            summary_cache.clear()
+        clear_latest_values()
         self.stdout.write(
             self.style.SUCCESS("All dataloggers and measurements deleted")
         )
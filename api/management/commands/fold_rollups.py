@@ -0,0 +1,23 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from api.rollups import fold_rollups
+
+
+class Command(BaseCommand):
+    """
+    Move the aggregates queued by ingest to the hourly and daily rollups, when no
+    ingest process folds them (ROLLUP_FOLD_INTERVAL = None) or to catch up at once.
+    """
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Fold the queued deltas, after a fold or rebuild running in another process.
+
+        Args:
+            *args: Additional positional arguments.
+            **options: Command options.
+        """
+        folded = fold_rollups()
+        self.stdout.write(self.style.SUCCESS(f"{folded} deltas folded."))
@@ -0,0 +1,337 @@
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from dataclasses import dataclass, field
+import gzip
+import json
+from time import perf_counter
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from rest_framework import serializers
+
+from api.ingest import Record, save_records
+from api.serializers import DataRecordRequestSerializer, validate_measurements
+
+CSV_COLUMNS = ["datalogger", "lat", "lng", "at", "label", "value"]
+
+# (line number, raw row) of a source file
+Row = Tuple[int, Dict[str, Any]]
+
+
+@dataclass
+class ImportReport:
+    """
+    Counters of the import of one file, and the first rejected rows.
+    """
+
+    path: str
+    rows: int = 0
+    inserted: int = 0
+    deduplicated: int = 0
+    rejected: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    errors: List[Tuple[int, Any]] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class RowValidator:
+    """
+    Validate flat CSV rows (one measurement per row) with the fields and validation
+    methods of DataRecordRequestSerializer, and the measurements with
+    validate_measurements. The datalogger, location and timestamp of consecutive rows
+    repeat a lot, their validation is cached.
+    """
+
+    CACHE_SIZE = 10_000
+
+    def __init__(self) -> None:
+        self.serializer = DataRecordRequestSerializer()
+        self._cache: Dict[Tuple[str, Any], Tuple[Any, Any]] = {}
+
+    def validate_field(self, name: str, value: Any) -> Tuple[Any, Any]:
+        """
+        Returns:
+            The validated value and None, or None and the error detail.
+        """
+        key = (name, json.dumps(value) if isinstance(value, dict) else value)
+        if key in self._cache:
+            return self._cache[key]
+
+        try:
+            # the fields of the API, so that both paths accept the same timestamps
+            validated = self.serializer.fields[name].run_validation(value)
+            validate_method = getattr(self.serializer, f"validate_{name}", None)
+            if validate_method is not None:
+                validated = validate_method(validated)
+            result: Tuple[Any, Any] = (validated, None)
+        except serializers.ValidationError as err:
+            result = (None, err.detail)
+
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = result
+        return result
+
+    def validate(self, rows: List[Row]) -> Tuple[List[Record], List[Tuple[int, Any]]]:
+        """
+        Returns:
+            The valid rows as data records and the (line, errors) of the invalid ones.
+        """
+        measurements, measurement_errors = validate_measurements(
+            [
+                {"label": row.get("label"), "value": to_float(row.get("value"))}
+                for _, row in rows
+            ]
+        )
+        valid_measurements = iter(measurements)
+
+        records: List[Record] = []
+        errors: List[Tuple[int, Any]] = []
+        for (line, row), measurement_error in zip(
+            rows, measurement_errors, strict=True
+        ):
+            record: Record = {}
+            row_errors: Dict[str, Any] = {}
+            for name, value in [
+                ("datalogger", row.get("datalogger")),
+                ("location", {"lat": row.get("lat"), "lng": row.get("lng")}),
+                ("at", row.get("at")),
+            ]:
+                record[name], error = self.validate_field(name, value)
+                if error is not None:
+                    row_errors[name] = error
+
+            if measurement_error:
+                row_errors["measurements"] = [measurement_error]
+            else:
+                record["measurements"] = [next(valid_measurements)]
+
+            if row_errors:
+                errors.append((line, row_errors))
+            else:
+                records.append(record)
+
+        return records, errors
+
+
+def to_float(value: Any) -> Any:
+    # keeps the float fast path of validate_measurements, DRF reports the invalid ones
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def open_source(path: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def source_format(path: str) -> str:
+    name = path.removesuffix(".gz")
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    raise CommandError(
+        f"Cannot guess the format of {path}, expected .csv or .ndjson (optionally .gz)."
+    )
+
+
+class Command(BaseCommand):
+    """
+    Import measurements from CSV or NDJSON files, optionally gzip-compressed.
+
+    CSV files have a header with the columns datalogger, lat, lng, at, label and
+    value, one measurement per row. NDJSON files have one data record per line, in
+    the format of POST /api/ingest. Rows are validated with the rules of the
+    ingest endpoints, unknown dataloggers are created and measurements already stored
+    are skipped. Valid rows are written in batches with a PostgreSQL COPY.
+    """
+
+    def add_arguments(self, parser: Any) -> None:
+        """
+        Add command-line arguments: the files to import and how to import them.
+
+        Args:
+            parser: The argument parser instance.
+        """
+        parser.add_argument("paths", nargs="+", help="CSV or NDJSON files (.gz)")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5_000,
+            help="Measurements written per transaction",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of files imported in parallel",
+        )
+        parser.add_argument(
+            "--max-errors",
+            type=int,
+            default=20,
+            help="Rejected rows reported per file",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Import every file, in parallel when there are several workers, then print
+        the throughput of each file and the rejected rows.
+
+        Args:
+            *args: Additional positional arguments.
+            **options: Command options, expects 'paths', 'batch_size', 'workers'
+                and 'max_errors'.
+        """
+        paths: List[str] = options["paths"]
+        for path in paths:
+            source_format(path)
+
+        batch_size, max_errors = options["batch_size"], options["max_errors"]
+
+        start = perf_counter()
+        if options["workers"] > 1:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                reports = list(
+                    executor.map(
+                        lambda path: self.import_file_in_thread(
+                            path, batch_size, max_errors
+                        ),
+                        paths,
+                    )
+                )
+        else:
+            reports = [self.import_file(p, batch_size, max_errors) for p in paths]
+        elapsed = perf_counter() - start
+
+        for report in reports:
+            self.write_report(report)
+
+        total = sum(r.rows for r in reports)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {total} rows from {len(reports)} files in {elapsed:.2f}s "
+                f"({total / elapsed if elapsed else 0:.0f} rows/s): "
+                f"{sum(r.inserted for r in reports)} inserted, "
+                f"{sum(r.deduplicated for r in reports)} duplicates, "
+                f"{sum(r.rejected for r in reports)} rejected, "
+                f"{sum(r.failed for r in reports)} failed."
+            )
+        )
+
+    def import_file_in_thread(
+        self, path: str, batch_size: int, max_errors: int
+    ) -> ImportReport:
+        try:
+            return self.import_file(path, batch_size, max_errors)
+        finally:
+            # each worker thread opened its own connection
+            connection.close()
+
+    def import_file(self, path: str, batch_size: int, max_errors: int) -> ImportReport:
+        """
+        Validate and write a file batch by batch, each batch in its own transaction.
+        """
+        report = ImportReport(path=path)
+        start = perf_counter()
+
+        with open_source(path) as source:
+            if source_format(path) == "csv":
+                batches = self.read_csv(source, batch_size)
+            else:
+                batches = self.read_ndjson(source, batch_size)
+
+            for rows, records, errors in batches:
+                report.rows += rows
+                report.rejected += len(errors)
+                report.errors.extend(errors[: max_errors - len(report.errors)])
+                if not records:
+                    continue
+
+                try:
+                    result = save_records(records)
+                except DatabaseError as err:
+                    report.failed += sum(len(r["measurements"]) for r in records)
+                    self.stderr.write(f"{path}: batch failed: {err}")
+                    continue
+                report.inserted += result.inserted
+                report.deduplicated += result.deduplicated
+
+        report.seconds = perf_counter() - start
+        return report
+
+    def read_csv(
+        self, source: IO[str], batch_size: int
+    ) -> Iterator[Tuple[int, List[Record], List[Tuple[int, Any]]]]:
+        reader = csv.DictReader(source)
+        missing = set(CSV_COLUMNS) - set(reader.fieldnames or [])
+        if missing:
+            raise CommandError(f"Missing CSV columns: {', '.join(sorted(missing))}.")
+
+        validator = RowValidator()
+        rows: List[Row] = []
+        for row in reader:
+            rows.append((reader.line_num, row))
+            if len(rows) >= batch_size:
+                yield (len(rows), *validator.validate(rows))
+                rows = []
+        if rows:
+            yield (len(rows), *validator.validate(rows))
+
+    def read_ndjson(
+        self, source: IO[str], batch_size: int
+    ) -> Iterator[Tuple[int, List[Record], List[Tuple[int, Any]]]]:
+        rows = 0
+        records: List[Record] = []
+        errors: List[Tuple[int, Any]] = []
+        measurements = 0
+
+        for number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            rows += 1
+            error: Optional[Any] = None
+            try:
+                serializer = DataRecordRequestSerializer(data=json.loads(line))
+            except ValueError:
+                error = {"non_field_errors": ["Line is not valid JSON."]}
+            else:
+                if serializer.is_valid():
+                    records.append(serializer.validated_data)
+                    measurements += len(serializer.validated_data["measurements"])
+                else:
+                    error = serializer.errors
+            if error is not None:
+                errors.append((number, error))
+
+            if measurements >= batch_size:
+                yield rows, records, errors
+                rows, records, errors, measurements = 0, [], [], 0
+
+        if rows:
+            yield rows, records, errors
+
+    def write_report(self, report: ImportReport) -> None:
+        self.stdout.write(
+            f"{report.path}: {report.rows} rows in {report.seconds:.2f}s "
+            f"({report.rows_per_second:.0f} rows/s), {report.inserted} inserted, "
+            f"{report.deduplicated} duplicates, {report.rejected} rejected, "
+            f"{report.failed} failed"
+        )
+        for line, errors in report.errors:
+            self.stdout.write(
+                self.style.WARNING(f"  line {line}: {json.dumps(errors)}")
+            )
+        if report.rejected > len(report.errors):
+            self.stdout.write(
+                f"  ... {report.rejected - len(report.errors)} more rejected rows"
+            )
@@ -1,12 +1,12 @@
 from datetime import datetime, timedelta
 import random
-from typing import Any
+from typing import Any, Set, Tuple
 from uuid import uuid4
 
 from django.core.management.base import BaseCommand
 from django.utils.timezone import now
 
-from api.models import Datalogger, Measurement
+from api.ingest import save_records
 
 LABELS = ["temp", "hum", "rain"]
 RANGES = {
@@ -39,7 +39,7 @@ class Command(BaseCommand):
 
     def handle(self, *args: Any, **options: Any) -> None:
         """
-        Create specified numbers of dataloggers and measurements.
+        Create specified numbers of dataloggers and measurements, written in bulk.
         Measurement timestamps are randomly distributed over the last 5 days.
 
         Args:
@@ -54,13 +54,15 @@ class Command(BaseCommand):
         )
 
         for _ in range(num_dataloggers):
-            datalogger = Datalogger.objects.create(
-                id=uuid4(),
-                lat=round(random.uniform(-90, 90), 4),
-                lng=round(random.uniform(-180, 180), 4),
-            )
-
-            for _ in range(num_measurements):
+            datalogger_id = str(uuid4())
+            location = {
+                "lat": round(random.uniform(-90, 90), 4),
+                "lng": round(random.uniform(-180, 180), 4),
+            }
+
+            # a datalogger has a single value per label and timestamp
+            keys: Set[Tuple[str, datetime]] = set()
+            while len(keys) < num_measurements:
                 # Generate a datetime within the last 5 days
                 base_time: datetime = now() - timedelta(days=5)
                 at: datetime = base_time + timedelta(
@@ -69,15 +71,20 @@ class Command(BaseCommand):
                     minutes=random.randint(0, 59),
                     seconds=random.randint(0, 59),
                 )
+                keys.add((random.choice(LABELS), at))
+
+            save_records(
+                [
+                    {
+                        "datalogger": datalogger_id,
+                        "location": location,
+                        "at": at,
+                        "measurements": [{"label": label, "value": RANGES[label]()}],
+                    }
+                    for label, at in keys
+                ]
+            )
 
-                label = random.choice(LABELS)
-                value = RANGES[label]()
-
-                # Store the datetime object directly, not its ISO string
-                Measurement.objects.create(
-                    datalogger=datalogger, label=label, value=value, at=at
-                )
-
-            self.stdout.write(f"Created datalogger: {datalogger.id}")
+            self.stdout.write(f"Created datalogger: {datalogger_id}")
 
         self.stdout.write(self.style.SUCCESS("Population complete."))
@@ -0,0 +1,64 @@
+from typing import Any, Optional
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Datalogger
+from api.rollups import rebuild_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    """
+    Recompute the hourly and daily rollups from the raw measurements, or only check
+    that they match them with --verify.
+    """
+
+    def add_arguments(self, parser: Any) -> None:
+        """
+        Add command-line arguments: the datalogger to process and the mode.
+
+        Args:
+            parser: The argument parser instance.
+        """
+        parser.add_argument(
+            "--datalogger", help="Only process this datalogger (UUID)", default=None
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Report the slots that differ from the raw data instead of rebuilding",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """
+        Rebuild or verify the rollups, of all the dataloggers or of a single one.
+
+        Args:
+            *args: Additional positional arguments.
+            **options: Command options, expects 'datalogger' and 'verify'.
+
+        Raises:
+            CommandError: If the datalogger does not exist or, with --verify, if some
+                slots differ from the raw data.
+        """
+        datalogger: Optional[Datalogger] = None
+        if options["datalogger"] is not None:
+            try:
+                datalogger = Datalogger.objects.filter(pk=options["datalogger"]).first()
+            except ValidationError:
+                datalogger = None
+            if datalogger is None:
+                raise CommandError(f"Unknown datalogger {options['datalogger']}.")
+
+        if not options["verify"]:
+            for table, rows in rebuild_rollups(datalogger).items():
+                self.stdout.write(f"{table}: {rows} slots")
+            self.stdout.write(self.style.SUCCESS("Rollups rebuilt."))
+            return
+
+        mismatches = verify_rollups(datalogger)
+        for table, count in mismatches.items():
+            self.stdout.write(f"{table}: {count} slots differ")
+        if any(mismatches.values()):
+            raise CommandError("Rollups differ from the raw data, run rebuild_rollups.")
+        self.stdout.write(self.style.SUCCESS("Rollups match the raw data."))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+# keep the first stored row of each (datalogger, label, at)
+DELETE_DUPLICATES_SQL = """
+    DELETE FROM api_measurement duplicate
+    USING api_measurement original
+    WHERE duplicate.datalogger_id = original.datalogger_id
+      AND duplicate.label = original.label
+      AND duplicate.at = original.at
+      AND duplicate.id > original.id
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0003_alter_datalogger_lng"),
+    ]
+
+    operations = [
+        migrations.RunSQL(DELETE_DUPLICATES_SQL, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="measurement",
+            constraint=models.UniqueConstraint(
+                fields=("datalogger", "label", "at"),
+                name="unique_measurement_per_datalogger_label_at",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_measurement_unique_measurement_per_datalogger_label_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(fields=['datalogger', 'at', 'id'], name='measurement_datalogger_at_id'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:34
+
+from typing import Any
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# aggregate the measurements already stored, slots are truncated in settings.TIME_ZONE
+BACKFILL_SQL = """
+    INSERT INTO {table} (datalogger_id, label, slot, count, sum, min, max)
+    SELECT datalogger_id, label, date_trunc('{span}', at AT TIME ZONE %s) AT TIME ZONE %s,
+        count(*), sum(value), min(value), max(value)
+    FROM api_measurement
+    GROUP BY 1, 2, 3
+"""
+
+
+def backfill_rollups(apps: Any, schema_editor: Any) -> None:
+    for table, span in [("api_hourlyrollup", "hour"), ("api_dailyrollup", "day")]:
+        schema_editor.execute(
+            BACKFILL_SQL.format(table=table, span=span),
+            [settings.TIME_ZONE, settings.TIME_ZONE],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_measurement_datalogger_at_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(choices=[('temp', 'Temperature'), ('rain', 'Rain'), ('hum', 'Humidity')], max_length=20)),
+                ('slot', models.DateTimeField(help_text='Start of the time slot.')),
+                ('count', models.IntegerField()),
+                ('sum', models.FloatField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('datalogger', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.datalogger')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('datalogger', 'label', 'slot'), name='unique_daily_rollup_per_datalogger_label_slot')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(choices=[('temp', 'Temperature'), ('rain', 'Rain'), ('hum', 'Humidity')], max_length=20)),
+                ('slot', models.DateTimeField(help_text='Start of the time slot.')),
+                ('count', models.IntegerField()),
+                ('sum', models.FloatField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('datalogger', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.datalogger')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('datalogger', 'label', 'slot'), name='unique_hourly_rollup_per_datalogger_label_slot')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
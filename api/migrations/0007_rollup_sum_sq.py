@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-17 11:02
+
+from typing import Any
+
+from django.conf import settings
+from django.db import migrations, models
+
+# fill the new column from the measurements already aggregated
+BACKFILL_SQL = """
+    UPDATE {table} AS rollup SET sum_sq = source.sum_sq
+    FROM (
+        SELECT datalogger_id, label,
+            date_trunc('{span}', at AT TIME ZONE %s) AT TIME ZONE %s AS slot,
+            sum(value * value) AS sum_sq
+        FROM api_measurement
+        GROUP BY 1, 2, 3
+    ) AS source
+    WHERE rollup.datalogger_id = source.datalogger_id
+      AND rollup.label = source.label
+      AND rollup.slot = source.slot
+"""
+
+
+def backfill_sum_sq(apps: Any, schema_editor: Any) -> None:
+    for table, span in [("api_hourlyrollup", "hour"), ("api_dailyrollup", "day")]:
+        schema_editor.execute(
+            BACKFILL_SQL.format(table=table, span=span),
+            [settings.TIME_ZONE, settings.TIME_ZONE],
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0006_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dailyrollup",
+            name="sum_sq",
+            field=models.FloatField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="hourlyrollup",
+            name="sum_sq",
+            field=models.FloatField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_sum_sq, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:57
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_rollup_sum_sq'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='measurement',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['at'], name='measurement_at_brin'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-17 03:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_measurement_at_brin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(choices=[('temp', 'Temperature'), ('rain', 'Rain'), ('hum', 'Humidity')], max_length=20)),
+                ('slot', models.DateTimeField(help_text='Start of the time slot.')),
+                ('count', models.IntegerField()),
+                ('sum', models.FloatField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('sum_sq', models.FloatField()),
+                ('datalogger', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.datalogger')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
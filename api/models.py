@@ -1,8 +1,49 @@
-from typing import List, Tuple
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 import uuid
 
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
 
+# tolerance used to absorb float errors when checking the step of a value
+STEP_TOLERANCE = 1e-5
+
+
+@dataclass(frozen=True)
+class MeasurementRule:
+    """
+    Constraints on the values of a measurement label: accepted range and step, and
+    how its values are aggregated over a time slot ("avg" or "sum").
+    """
+
+    name: str
+    min_value: float
+    max_value: float
+    step: float
+    unit: str
+    aggregate: str = "avg"
+
+    def check(self, value: float) -> Optional[str]:
+        """
+        Return the error message for a value breaking the rule, None if it is valid.
+        """
+        if not self.min_value <= value <= self.max_value:
+            return f"{self.name} must be between {self.min_value:g} and {self.max_value:g}."
+
+        steps = value / self.step
+        if abs(steps - round(steps)) > STEP_TOLERANCE:
+            return f"{self.name} must be in steps of {self.step:g}."
+
+        return None
+
+
+# Supported measurement labels, adding a label only requires a new entry here
+MEASUREMENT_RULES: Dict[str, MeasurementRule] = {
+    "temp": MeasurementRule("Temperature", -20, 40, 0.1, "°C"),
+    "rain": MeasurementRule("Rain", 0, 2, 0.2, "mm", aggregate="sum"),
+    "hum": MeasurementRule("Humidity", 20, 100, 0.1, "%"),
+}
+
 
 class UUIDModel(models.Model):
     """
@@ -34,9 +75,7 @@ class Measurement(models.Model):
     """
 
     LABEL_CHOICES: List[Tuple[str, str]] = [
-        ("temp", "Temperature"),
-        ("rain", "Rain"),
-        ("hum", "Humidity"),
+        (label, rule.name) for label, rule in MEASUREMENT_RULES.items()
     ]
 
     label = models.CharField(max_length=20, choices=LABEL_CHOICES)
@@ -46,5 +85,84 @@ class Measurement(models.Model):
     value = models.FloatField()
     datalogger = models.ForeignKey(Datalogger, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            # a datalogger sends one value per label at a given time, retries are duplicates
+            models.UniqueConstraint(
+                fields=["datalogger", "label", "at"],
+                name="unique_measurement_per_datalogger_label_at",
+            )
+        ]
+        indexes = [
+            # keyset pagination of the raw data of a datalogger, ordered by (at, id)
+            models.Index(
+                fields=["datalogger", "at", "id"], name="measurement_datalogger_at_id"
+            ),
+            # range scans on 'at' over all the dataloggers: measurements are mostly
+            # appended in time order, so a few block ranges per page are enough
+            BrinIndex(fields=["at"], name="measurement_at_brin"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.label}: {self.value}"
+
+
+class Rollup(models.Model):
+    """
+    Aggregates of the measurements of a datalogger and label over a time slot,
+    maintained from the ingested measurements (see api.rollups) so that summaries
+    do not recompute them from the raw rows.
+    """
+
+    # truncation of the slots, as in date_trunc
+    span: str
+
+    datalogger = models.ForeignKey(Datalogger, on_delete=models.CASCADE)
+    label = models.CharField(max_length=20, choices=Measurement.LABEL_CHOICES)
+    slot = models.DateTimeField(help_text="Start of the time slot.")
+    count = models.IntegerField()
+    sum = models.FloatField()
+    min = models.FloatField()
+    max = models.FloatField()
+    # sum of the squared values, for the standard deviation
+    sum_sq = models.FloatField()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self) -> str:
+        return f"{self.label} {self.slot}: {self.count}"
+
+
+class HourlyRollup(Rollup):
+    span = "hour"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["datalogger", "label", "slot"],
+                name="unique_hourly_rollup_per_datalogger_label_slot",
+            )
+        ]
+
+
+class DailyRollup(Rollup):
+    span = "day"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["datalogger", "label", "slot"],
+                name="unique_daily_rollup_per_datalogger_label_slot",
+            )
+        ]
+
+
+class RollupDelta(Rollup):
+    """
+    Aggregates of the measurements inserted by an ingest statement over an hour, not
+    folded into the hourly and daily rollups yet. Ingest only appends them, without
+    locking the rollup rows shared with the other writers.
+    """
+
+    span = "hour"
@@ -0,0 +1,93 @@
+import base64
+import binascii
+from datetime import datetime
+import json
+from typing import Any, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# position of the last row of a page: its timestamp and id
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    at, pk = cursor
+    raw = json.dumps([at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(value: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        at, pk = json.loads(raw)
+        cursor = (datetime.fromisoformat(at), int(pk))
+    except (binascii.Error, TypeError, ValueError) as err:
+        raise NotFound("Invalid cursor.") from err
+    if cursor[0].tzinfo is None:
+        raise NotFound("Invalid cursor.")
+    return cursor
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination ordered by ('at', 'id').
+
+    Each page starts right after the last row of the previous one, so fetching a
+    page is an index range scan whatever its depth, instead of an OFFSET scan over
+    all the previous rows. The response body stays the list of rows, the next page
+    is advertised in a 'Link: <url>; rel="next"' header with an opaque cursor.
+
+    The page size is settings.RAW_DATA_PAGE_SIZE, clients can ask for another one
+    with the 'page_size' parameter up to settings.RAW_DATA_MAX_PAGE_SIZE.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def paginate_queryset(
+        self, queryset: QuerySet, request: Request, view: Any = None
+    ) -> List[Any]:
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        value = request.query_params.get(self.cursor_query_param)
+        if value:
+            at, pk = decode_cursor(value)
+            # the 'at >= ...' bound starts the index scan, the OR only filters its ties
+            queryset = queryset.filter(at__gte=at).filter(Q(at__gt=at) | Q(id__gt=pk))
+
+        rows = list(queryset.order_by("at", "id")[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        page = rows[: self.page_size]
+        self.next_cursor: Optional[Cursor] = (
+            # model instances or named values_list rows
+            (page[-1].at, page[-1].id) if self.has_next else None
+        )
+        return page
+
+    def get_page_size(self, request: Request) -> int:
+        value = request.query_params.get(self.page_size_query_param)
+        try:
+            page_size = int(value) if value else settings.RAW_DATA_PAGE_SIZE
+        except ValueError:
+            page_size = settings.RAW_DATA_PAGE_SIZE
+        return max(1, min(page_size, settings.RAW_DATA_MAX_PAGE_SIZE))
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, encode_cursor(self.next_cursor)
+        )
+
+    def get_paginated_response(self, data: Any) -> Response:
+        next_link = self.get_next_link()
+        headers = {"Link": f'<{next_link}>; rel="next"'} if next_link else None
+        return Response(data, headers=headers)
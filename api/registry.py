@@ -0,0 +1,205 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Datalogger
+
+# cached location of a datalogger, None for a datalogger known not to exist
+Location = Optional[Tuple[float, float]]
+
+
+class DataloggerRegistry:
+    """
+    Bounded LRU cache of the dataloggers known by this process, shared by the ingest
+    and read paths to skip the lookup query of a table that almost never changes.
+
+    Entries expire after 'ttl' seconds, so changes made by another process are seen
+    eventually. Dataloggers known not to exist are cached too, for 'negative_ttl'
+    seconds, so that requests for unknown ids do not all reach the database.
+    """
+
+    def __init__(self, capacity: int, ttl: float, negative_ttl: float) -> None:
+        self.capacity = capacity
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._entries: OrderedDict[str, Tuple[Location, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, ids: Iterable[str]) -> Dict[str, Optional[Datalogger]]:
+        """
+        Look up several dataloggers in the cache.
+
+        Args:
+            ids: Datalogger ids, as strings.
+
+        Returns:
+            A mapping of the cached ids to their Datalogger, or to None when the
+            datalogger is known not to exist. Ids missing from the mapping are unknown.
+        """
+        found: Dict[str, Optional[Datalogger]] = {}
+        now = time.monotonic()
+
+        with self._lock:
+            for pk in ids:
+                entry = self._entries.get(pk)
+                if entry is None or entry[1] <= now:
+                    self._entries.pop(pk, None)
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(pk)
+                self.hits += 1
+                location = entry[0]
+                found[pk] = (
+                    None
+                    if location is None
+                    # a fresh instance per lookup, cached ones are shared by threads
+                    else Datalogger.from_db(
+                        DEFAULT_DB_ALIAS, ["id", "lat", "lng"], (pk, *location)
+                    )
+                )
+
+        return found
+
+    def add(self, dataloggers: Iterable[Datalogger]) -> None:
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for datalogger in dataloggers:
+                self._set(str(datalogger.id), (datalogger.lat, datalogger.lng), expires)
+
+    def add_missing(self, ids: Iterable[str]) -> None:
+        expires = time.monotonic() + self.negative_ttl
+        with self._lock:
+            for pk in ids:
+                # a datalogger created since the lookup wins over its absence
+                entry = self._entries.get(pk)
+                if entry is not None and entry[0] is not None:
+                    continue
+                self._set(pk, None, expires)
+
+    def invalidate(self, pk: str) -> None:
+        with self._lock:
+            self._entries.pop(pk, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _set(self, pk: str, location: Location, expires: float) -> None:
+        if self.capacity <= 0:
+            return
+        self._entries[pk] = (location, expires)
+        self._entries.move_to_end(pk)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+
+_registry: Optional[DataloggerRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_datalogger_registry() -> DataloggerRegistry:
+    """
+    Return the process-wide datalogger registry, configured by
+    settings.DATALOGGER_REGISTRY.
+    """
+    global _registry
+
+    with _registry_lock:
+        if _registry is None:
+            config = settings.DATALOGGER_REGISTRY
+            _registry = DataloggerRegistry(
+                capacity=config["CAPACITY"],
+                ttl=config["TTL"],
+                negative_ttl=config["NEGATIVE_TTL"],
+            )
+        return _registry
+
+
+def get_dataloggers(ids: Iterable[str]) -> Dict[str, Optional[Datalogger]]:
+    """
+    Fetch dataloggers from the registry, querying the database only for the ids
+    it does not know. Rows read from the database are cached once the current
+    transaction is committed, so a rollback never leaves an entry behind.
+
+    Args:
+        ids: Datalogger ids, as strings.
+
+    Returns:
+        A mapping of each id to its Datalogger, or to None when it does not exist.
+    """
+    registry = get_datalogger_registry()
+    ids = set(ids)
+    dataloggers = registry.get_many(ids)
+
+    unknown = ids - dataloggers.keys()
+    if unknown:
+        fetched = {
+            str(pk): datalogger
+            for pk, datalogger in Datalogger.objects.in_bulk(list(unknown)).items()
+        }
+        missing = unknown - fetched.keys()
+        transaction.on_commit(lambda: registry.add(fetched.values()))
+        if missing:
+            transaction.on_commit(lambda: registry.add_missing(missing))
+        dataloggers.update(fetched)
+        dataloggers.update(dict.fromkeys(missing))
+
+    return dataloggers
+
+
+def get_datalogger(pk: str) -> Optional[Datalogger]:
+    return get_dataloggers([pk])[pk]
+
+
+def datalogger_registry_stats() -> Optional[Dict[str, Any]]:
+    return _registry.stats() if _registry is not None else None
+
+
+@receiver(post_save, sender=Datalogger)
+def register_saved_datalogger(instance: Datalogger, **kwargs: Any) -> None:
+    # the insert of save_records creates dataloggers without post_save, it registers
+    # them itself
+    registry = get_datalogger_registry()
+    transaction.on_commit(lambda: registry.add([instance]))
+
+
+@receiver(post_delete, sender=Datalogger)
+def unregister_deleted_datalogger(instance: Datalogger, **kwargs: Any) -> None:
+    # dropped right away for this transaction, and again in case a concurrent
+    # reader cached it before the deletion was committed
+    registry = get_datalogger_registry()
+    pk = str(instance.id)
+    registry.invalidate(pk)
+    transaction.on_commit(lambda: registry.invalidate(pk))
+
+
+@receiver(setting_changed)
+def reset_datalogger_registry(setting: str, **kwargs: Any) -> None:
+    global _registry
+
+    if setting != "DATALOGGER_REGISTRY":
+        return
+    with _registry_lock:
+        _registry = None
@@ -0,0 +1,154 @@
+import csv
+import io
+from itertools import islice
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def dumps(data: Any) -> str:
+    # same encoding as rest_framework.renderers.JSONRenderer (compact, strict floats)
+    return json.dumps(
+        data,
+        cls=JSONEncoder,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    )
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Render a list as newline-delimited JSON, one item per line. Anything else
+    (an error for instance) is rendered as a single line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: Optional[str] = None,
+        renderer_context: Optional[Mapping[str, Any]] = None,
+    ) -> bytes:
+        if data is None:
+            return b""
+        items = data if isinstance(data, list) else [data]
+        return "".join(dumps(item) + "\n" for item in items).encode()
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Render a list of flat dicts as CSV, with a header row made of the keys of the
+    first item. Anything else (an error for instance) is rendered as a single row.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(
+        self,
+        data: Any,
+        accepted_media_type: Optional[str] = None,
+        renderer_context: Optional[Mapping[str, Any]] = None,
+    ) -> bytes:
+        if data is None:
+            return b""
+        items = data if isinstance(data, list) else [data]
+        return "".join(iter_csv(items, len(items) or 1)).encode()
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    JSON renderer for the columnar layout built by to_columnar: the views check
+    for it and build their data straight from database rows.
+    """
+
+    media_type = "application/vnd.weenat.columnar+json"
+    format = "columnar"
+
+
+# renderers of the data endpoints, negotiated with the Accept header or 'format'
+DATA_RENDERERS = [
+    JSONRenderer,
+    BrowsableAPIRenderer,
+    NDJSONRenderer,
+    CSVRenderer,
+    ColumnarJSONRenderer,
+]
+
+
+def to_columnar(
+    rows: Iterable[Sequence[Any]], names: Sequence[str] = ("value",)
+) -> Dict[str, Dict[str, List[Any]]]:
+    """
+    Group (label, datetime, value, ...) rows per label, in a compact layout for
+    charting clients.
+
+    Args:
+        rows: Database rows, for instance from values_list("label", "at", "value").
+        names: Names of the values following the datetime in the rows, extra
+            values are ignored.
+
+    Returns:
+        For each label, the epoch timestamps (in seconds) and the values of its rows
+        in arrays of the same length: {label: {"at": [...], "value": [...]}}.
+    """
+    columns: Dict[str, Dict[str, List[Any]]] = {}
+    for label, at, *values in rows:
+        column = columns.get(label)
+        if column is None:
+            column = columns[label] = {"at": [], **{name: [] for name in names}}
+        column["at"].append(int(at.timestamp()))
+        for name, value in zip(names, values):
+            column[name].append(value)
+    return columns
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_json_array(items: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[str]:
+    """
+    Encode items as a JSON array, one chunk of items at a time, so that the
+    whole array never has to be held in memory.
+    """
+    yield "["
+    separator = ""
+    for chunk in chunked(items, chunk_size):
+        yield separator + ",".join(dumps(item) for item in chunk)
+        separator = ","
+    yield "]"
+
+
+def iter_ndjson(items: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[str]:
+    """
+    Encode items as NDJSON, one chunk of lines at a time.
+    """
+    for chunk in chunked(items, chunk_size):
+        yield "".join(dumps(item) + "\n" for item in chunk)
+
+
+def iter_csv(items: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[str]:
+    """
+    Encode flat dicts as CSV, with a header row made of the keys of the first
+    item, one chunk of rows at a time.
+    """
+    buffer = io.StringIO()
+    writer: Optional[csv.DictWriter] = None
+    for chunk in chunked(items, chunk_size):
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(chunk[0]))
+            writer.writeheader()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
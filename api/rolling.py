@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, tzinfo
+import math
+from typing import Any, List, Optional, Sequence, Tuple
+
+from django.db import connections
+
+from .filling import STATISTIC_SQL
+from .models import MEASUREMENT_RULES, Datalogger, Measurement
+from .spans import BIN_ORIGIN
+
+# statistics of a rolling window
+ROLLING_STATISTICS: List[str] = ["count", "min", "max", "avg", "sum", "stddev"]
+
+# Window functions over raw measurements would recompute each float aggregate over
+# the whole window for every row. The measurements are first aggregated in buckets
+# of gcd(window, step), so that each window is made of whole buckets, then the
+# window functions run over the buckets and the points at which the windows are
+# evaluated, merged as rows without values. A bucket holds the measurements of
+# (bucket_end - bucket, bucket_end], like the windows. Buckets, points and windows
+# are in the wall-clock time of the time zone, like the slots of DateBin, so that
+# they stay aligned on local midnight across DST changes.
+ROLLING_SQL = """
+    WITH buckets AS (
+        SELECT
+            label,
+            date_bin(%s, (at AT TIME ZONE %s) - interval '1 microsecond', %s) + %s
+                AS bucket_end,
+            count(*) AS count,
+            sum(value) AS sum,
+            sum(value * value) AS sum_sq,
+            min(value) AS min,
+            max(value) AS max
+        FROM ({source}) AS source
+        GROUP BY 1, 2
+    ),
+    points AS (
+        SELECT label, point AS bucket_end
+        FROM (SELECT DISTINCT label FROM buckets) AS labels
+        CROSS JOIN generate_series(
+            date_bin(%s, (%s AT TIME ZONE %s) - interval '1 microsecond', %s) + %s,
+            %s AT TIME ZONE %s,
+            %s
+        ) AS point
+    ),
+    merged AS (
+        SELECT label, bucket_end, count, sum, sum_sq, min, max, false AS is_point
+        FROM buckets
+        UNION ALL
+        SELECT label, bucket_end, NULL, NULL, NULL, NULL, NULL, true FROM points
+    ),
+    windows AS (
+        SELECT
+            label,
+            bucket_end AS at,
+            is_point,
+            coalesce(sum(count) OVER window_, 0)::double precision AS count,
+            sum(sum) OVER window_ AS sum,
+            sum(sum_sq) OVER window_ AS sum_sq,
+            min(min) OVER window_ AS min,
+            max(max) OVER window_ AS max
+        FROM merged
+        WINDOW window_ AS (
+            PARTITION BY label ORDER BY bucket_end
+            RANGE BETWEEN %s PRECEDING AND CURRENT ROW
+        )
+    )
+    SELECT label, at AT TIME ZONE %s, {statistics} FROM windows
+    WHERE is_point
+    ORDER BY label, at
+"""
+
+
+def rolling_statistics(
+    datalogger: Datalogger,
+    window: timedelta,
+    step: timedelta,
+    since: datetime,
+    before: datetime,
+    tz: tzinfo,
+    statistics: Sequence[str] = (),
+    labels: Optional[Sequence[str]] = None,
+) -> List[Tuple[Any, ...]]:
+    """
+    Moving statistics of the measurements of a datalogger, evaluated every step in
+    a single query.
+
+    Args:
+        datalogger: The datalogger to read.
+        window: Length of the windows: the statistics at a point aggregate the
+            measurements taken after point - window and up to the point included,
+            in the wall-clock time of the time zone.
+        step: Interval between two points, aligned on BIN_ORIGIN (a Monday at
+            midnight) in the given time zone.
+        since: The points start at the first step not before this datetime.
+        before: The points end at the last step not after this datetime.
+        tz: Time zone in which the steps are aligned.
+        statistics: ROLLING_STATISTICS to compute, the aggregate of the rule of each
+            label (sum for rain, average otherwise) when empty.
+        labels: Labels to read, all of them when None.
+
+    Returns:
+        (label, point, *values) rows ordered by label and point, for the labels
+        that have measurements in the range.
+    """
+    # the first windows start before 'since'
+    queryset = Measurement.objects.filter(
+        datalogger=datalogger, at__gt=since - window, at__lte=before
+    )
+    if labels is not None:
+        queryset = queryset.filter(label__in=labels)
+    source, source_params = (
+        queryset.values("label", "at", "value").order_by().query.sql_with_params()
+    )
+
+    if statistics:
+        expressions = [
+            "count::integer" if name == "count" else STATISTIC_SQL[name]
+            for name in statistics
+        ]
+    else:
+        expressions = [
+            "CASE label "
+            + " ".join(
+                f"WHEN '{label}' THEN {STATISTIC_SQL[rule.aggregate]}"
+                for label, rule in MEASUREMENT_RULES.items()
+            )
+            + " END"
+        ]
+
+    microsecond = timedelta(microseconds=1)
+    bucket = microsecond * math.gcd(window // microsecond, step // microsecond)
+    tzname = str(tz)
+
+    sql = ROLLING_SQL.format(source=source, statistics=", ".join(expressions))
+    params = [
+        bucket,
+        tzname,
+        BIN_ORIGIN,
+        bucket,
+        *source_params,
+        step,
+        since,
+        tzname,
+        BIN_ORIGIN,
+        step,
+        before,
+        tzname,
+        step,
+        # the bucket ending at point - window + bucket is the first of the window
+        window - bucket,
+        tzname,
+    ]
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
@@ -0,0 +1,573 @@
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, tzinfo
+import logging
+import math
+import threading
+from time import monotonic
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import (
+    Aggregate,
+    Count,
+    F,
+    FloatField,
+    Max,
+    Min,
+    QuerySet,
+    Sum,
+)
+from django.utils.timezone import get_current_timezone, localtime
+
+from .models import (
+    DailyRollup,
+    Datalogger,
+    HourlyRollup,
+    Measurement,
+    Rollup,
+    RollupDelta,
+)
+from .spans import Span
+
+logger = logging.getLogger(__name__)
+
+# rollup tables, from the coarsest to the finest
+ROLLUPS: List[Type[Rollup]] = [DailyRollup, HourlyRollup]
+
+# statistics of the summaries, percentiles are only computed from raw measurements
+STATISTICS: List[str] = ["count", "min", "max", "avg", "sum", "stddev", "p50", "p90"]
+PERCENTILES: Dict[str, float] = {"p50": 0.5, "p90": 0.9}
+
+# slots are truncated in settings.TIME_ZONE, like TruncDay and TruncHour
+SLOT_SQL = "date_trunc('{span}', {column} AT TIME ZONE %s) AT TIME ZONE %s"
+
+# added to a statement whose CTE {source} returns the inserted measurements: their
+# aggregates per hour are appended to the deltas, no rollup row is locked
+QUEUE_DELTAS_SQL = """
+    rollup_deltas AS (
+        INSERT INTO {table} (datalogger_id, label, slot, count, sum, min, max, sum_sq)
+        SELECT datalogger_id, label, {slot},
+            count(*), sum(value), min(value), max(value), sum(value * value)
+        FROM {source}
+        GROUP BY 1, 2, 3
+    )
+"""
+
+# moves all the deltas to the rollups, locking the slots in key order
+FOLD_SQL = """
+    WITH deltas AS (
+        DELETE FROM {table}
+        RETURNING datalogger_id, label, slot, count, sum, min, max, sum_sq
+    ),
+    {upserts}
+    SELECT count(*) FROM deltas
+"""
+
+UPSERT_ROLLUP_SQL = """
+    {table}_upsert AS (
+        INSERT INTO {table} AS rollup
+            (datalogger_id, label, slot, count, sum, min, max, sum_sq)
+        SELECT datalogger_id, label, {slot},
+            sum(count), sum(sum), min(min), max(max), sum(sum_sq)
+        FROM deltas
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (datalogger_id, label, slot) DO UPDATE SET
+            count = rollup.count + excluded.count,
+            sum = rollup.sum + excluded.sum,
+            min = least(rollup.min, excluded.min),
+            max = greatest(rollup.max, excluded.max),
+            sum_sq = rollup.sum_sq + excluded.sum_sq
+    )
+"""
+
+# advisory lock serializing the folds and rebuilds of all the processes
+ROLLUP_LOCK = 0x726F6C6C
+
+AGGREGATE_SQL = """
+    SELECT datalogger_id, label, {slot} AS slot,
+        count(*) AS count, sum(value) AS sum, min(value) AS min, max(value) AS max,
+        sum(value * value) AS sum_sq
+    FROM {measurements}
+    {where}
+    GROUP BY 1, 2, 3
+"""
+
+REBUILD_SQL = """
+    INSERT INTO {table} (datalogger_id, label, slot, count, sum, min, max, sum_sq)
+    {aggregate}
+"""
+
+# sums are compared with a relative tolerance, rollups add them in another order.
+# The deltas not folded yet are added to the stored slots.
+VERIFY_SQL = """
+    WITH expected AS ({aggregate})
+    SELECT count(*)
+    FROM expected FULL OUTER JOIN (
+        SELECT datalogger_id, label, slot,
+            sum(count) AS count, sum(sum) AS sum, min(min) AS min, max(max) AS max,
+            sum(sum_sq) AS sum_sq
+        FROM (
+            SELECT datalogger_id, label, slot, count, sum, min, max, sum_sq
+            FROM {table} {where}
+            UNION ALL
+            SELECT datalogger_id, label, {slot}, count, sum, min, max, sum_sq
+            FROM {deltas} {where}
+        ) AS slots
+        GROUP BY 1, 2, 3
+    ) AS stored USING (datalogger_id, label, slot)
+    WHERE expected.count IS DISTINCT FROM stored.count
+        OR abs(expected.sum - stored.sum) > 1e-9 * greatest(1, abs(expected.sum))
+        OR abs(expected.sum_sq - stored.sum_sq) > 1e-9 * greatest(1, expected.sum_sq)
+        OR expected.min IS DISTINCT FROM stored.min
+        OR expected.max IS DISTINCT FROM stored.max
+"""
+
+
+def slot_sql(rollup: Type[Rollup], column: str = "at") -> Tuple[str, List[Any]]:
+    return SLOT_SQL.format(span=rollup.span, column=column), [settings.TIME_ZONE] * 2
+
+
+def queue_deltas_sql(source: str) -> Tuple[str, List[Any]]:
+    """
+    Common table expression appending the aggregates of the inserted measurements
+    to the deltas, for the statement inserting them (see fold_rollups).
+
+    Args:
+        source: Name of a CTE of the statement returning the inserted measurements
+            (datalogger_id, label, at, value).
+
+    Returns:
+        The CTE and its parameters.
+    """
+    slot, params = slot_sql(RollupDelta)
+    sql = QUEUE_DELTAS_SQL.format(
+        table=RollupDelta._meta.db_table, slot=slot, source=source
+    )
+    return sql, params
+
+
+def fold_rollups(wait: bool = True) -> Optional[int]:
+    """
+    Move the deltas queued by ingest to the rollups, in a single statement. Late
+    measurements update the slots already stored.
+
+    Args:
+        wait: Wait for a fold or a rebuild running in another transaction, instead
+            of leaving the deltas to it.
+
+    Returns:
+        The number of deltas folded, None if another transaction was folding them.
+    """
+    upserts: List[str] = []
+    params: List[Any] = []
+    for rollup in ROLLUPS:
+        slot, slot_params = slot_sql(rollup, column="slot")
+        upserts.append(UPSERT_ROLLUP_SQL.format(table=rollup._meta.db_table, slot=slot))
+        params.extend(slot_params)
+    sql = FOLD_SQL.format(table=RollupDelta._meta.db_table, upserts=",".join(upserts))
+    with transaction.atomic(), connection.cursor() as cursor:
+        if wait:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ROLLUP_LOCK])
+        else:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [ROLLUP_LOCK])
+            if not cursor.fetchone()[0]:
+                return None
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0]
+
+
+_fold_lock = threading.Lock()
+_last_fold = -math.inf
+
+
+def fold_rollups_when_due() -> None:
+    """
+    Fold the deltas at most every settings.ROLLUP_FOLD_INTERVAL seconds per
+    process, after the commit of an ingest. A failed fold leaves the deltas to the
+    next one, the ingested measurements are already committed.
+    """
+    global _last_fold
+    interval: Optional[float] = settings.ROLLUP_FOLD_INTERVAL
+    if interval is None:
+        return
+    with _fold_lock:
+        if monotonic() - _last_fold < interval:
+            return
+        _last_fold = monotonic()
+    try:
+        fold_rollups(wait=False)
+    except DatabaseError:
+        logger.exception("Rollup fold failed")
+
+
+def aggregate_sql(
+    rollup: Type[Rollup], datalogger: Optional[Datalogger]
+) -> Tuple[str, List[Any]]:
+    slot, params = slot_sql(rollup)
+    where = ""
+    if datalogger is not None:
+        where = "WHERE datalogger_id = %s"
+        params.append(datalogger.pk)
+    sql = AGGREGATE_SQL.format(
+        slot=slot, measurements=Measurement._meta.db_table, where=where
+    )
+    return sql, params
+
+
+@transaction.atomic
+def rebuild_rollups(datalogger: Optional[Datalogger] = None) -> Dict[str, int]:
+    """
+    Recompute the rollups from the raw measurements, of all the dataloggers or of
+    a single one. Writes to the measurements wait for the end of the rebuild.
+
+    Returns:
+        The number of slots written per rollup table.
+    """
+    rows: Dict[str, int] = {}
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {Measurement._meta.db_table} IN SHARE MODE")
+        # the queued deltas are recomputed too, once a running fold has moved them
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ROLLUP_LOCK])
+        deltas = RollupDelta.objects.all()
+        if datalogger is not None:
+            deltas = deltas.filter(datalogger=datalogger)
+        deltas.delete()
+
+        for rollup in ROLLUPS:
+            stored = rollup._default_manager.all()
+            if datalogger is not None:
+                stored = stored.filter(datalogger=datalogger)
+            stored.delete()
+
+            aggregate, params = aggregate_sql(rollup, datalogger)
+            table = rollup._meta.db_table
+            cursor.execute(REBUILD_SQL.format(table=table, aggregate=aggregate), params)
+            rows[table] = cursor.rowcount
+    return rows
+
+
+def verify_rollups(datalogger: Optional[Datalogger] = None) -> Dict[str, int]:
+    """
+    Compare the rollups, with the deltas not folded yet, with aggregates recomputed
+    from the raw measurements.
+
+    Returns:
+        The number of missing, extra or differing slots per rollup table.
+    """
+    mismatches: Dict[str, int] = {}
+    with connection.cursor() as cursor:
+        for rollup in ROLLUPS:
+            aggregate, params = aggregate_sql(rollup, datalogger)
+            slot, slot_params = slot_sql(rollup, column="slot")
+            where, where_params = "", []
+            if datalogger is not None:
+                where, where_params = "WHERE datalogger_id = %s", [datalogger.pk]
+            table = rollup._meta.db_table
+            sql = VERIFY_SQL.format(
+                aggregate=aggregate,
+                table=table,
+                where=where,
+                slot=slot,
+                deltas=RollupDelta._meta.db_table,
+            )
+            cursor.execute(sql, [*params, *where_params, *slot_params, *where_params])
+            mismatches[table] = cursor.fetchone()[0]
+    return mismatches
+
+
+def floor_slot(at: datetime, span: str) -> datetime:
+    local = localtime(at, ZoneInfo(settings.TIME_ZONE))
+    if span == "hour":
+        return local.replace(minute=0, second=0, microsecond=0)
+    return datetime.combine(local.date(), time(), tzinfo=local.tzinfo)
+
+
+def ceil_slot(at: datetime, span: str) -> datetime:
+    slot = floor_slot(at, span)
+    if slot == at:
+        return slot
+    if span == "hour":
+        return slot + timedelta(hours=1)
+    return datetime.combine(slot.date() + timedelta(days=1), time(), slot.tzinfo)
+
+
+Segment = Tuple[Optional[Type[Rollup]], Optional[datetime], Optional[datetime]]
+
+
+def plan_segments(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    rollups: Sequence[Type[Rollup]],
+) -> List[Segment]:
+    """
+    Split [since, until) in the full slots of the coarsest rollup, and edges read
+    from the finer rollups or, for partial slots of the finest one, from the raw
+    measurements (None). Unbounded ends are None.
+    """
+    if not rollups:
+        return [(None, since, until)]
+
+    rollup, finer = rollups[0], rollups[1:]
+    start = ceil_slot(since, rollup.span) if since is not None else None
+    end = floor_slot(until, rollup.span) if until is not None else None
+    if start is not None and end is not None and start >= end:
+        return plan_segments(since, until, finer)
+
+    segments: List[Segment] = [(rollup, start, end)]
+    if since is not None and start is not None and since < start:
+        segments.extend(plan_segments(since, start, finer))
+    if until is not None and end is not None and end < until:
+        segments.extend(plan_segments(end, until, finer))
+    return segments
+
+
+class Percentile(Aggregate):
+    """
+    Continuous percentile of an expression, interpolated between the values.
+    """
+
+    function = "percentile_cont"
+    template = "%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+    def __init__(self, expression: Any, fraction: float) -> None:
+        super().__init__(expression, fraction=float(fraction))
+
+
+@dataclass
+class SlotAggregate:
+    """
+    Aggregates of the measurements of a label over a time slot, of a datalogger or
+    of several ones, from which the STATISTICS are derived.
+    """
+
+    label: str
+    slot: datetime
+    count: int
+    sum: float
+    min: float
+    max: float
+    sum_sq: float
+    percentiles: Dict[str, float] = field(default_factory=dict)
+    # id of the datalogger, None for the aggregates of several dataloggers
+    datalogger: Optional[str] = None
+
+    def merge(self, other: "SlotAggregate") -> None:
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sum_sq += other.sum_sq
+
+    def statistic(self, name: str) -> Optional[float]:
+        if name == "avg":
+            return self.sum / self.count
+        if name == "stddev":
+            # sample standard deviation, like stddev_samp
+            if self.count < 2:
+                return None
+            variance = (self.sum_sq - self.sum * self.sum / self.count) / (
+                self.count - 1
+            )
+            return math.sqrt(max(variance, 0.0))
+        if name in PERCENTILES:
+            return self.percentiles[name]
+        return getattr(self, name)
+
+
+def segment_queryset(
+    segment: Segment,
+    dataloggers: Optional[Sequence[str]],
+    span: Span,
+    tz: tzinfo,
+    percentiles: Sequence[str] = (),
+    labels: Optional[Sequence[str]] = None,
+    by_datalogger: bool = False,
+) -> QuerySet[Any]:
+    rollup, since, until = segment
+    if rollup is None:
+        queryset: QuerySet[Any] = Measurement.objects.all()
+        if since is not None:
+            queryset = queryset.filter(at__gte=since)
+        if until is not None:
+            queryset = queryset.filter(at__lt=until)
+        aggregates = {
+            "slot_count": Count("id"),
+            "slot_sum": Sum("value"),
+            "slot_min": Min("value"),
+            "slot_max": Max("value"),
+            "slot_sum_sq": Sum(F("value") * F("value")),
+            **{
+                f"slot_{name}": Percentile("value", PERCENTILES[name])
+                for name in percentiles
+            },
+        }
+        field = "at"
+    else:
+        queryset = rollup._default_manager.all()
+        if since is not None:
+            queryset = queryset.filter(slot__gte=since)
+        if until is not None:
+            queryset = queryset.filter(slot__lt=until)
+        aggregates = {
+            "slot_count": Sum("count"),
+            "slot_sum": Sum("sum"),
+            "slot_min": Min("min"),
+            "slot_max": Max("max"),
+            "slot_sum_sq": Sum("sum_sq"),
+        }
+        field = "slot"
+
+    if dataloggers is not None:
+        queryset = queryset.filter(datalogger_id__in=dataloggers)
+    if labels is not None:
+        queryset = queryset.filter(label__in=labels)
+
+    groups = (
+        ["datalogger_id", "label", "time_slot"]
+        if by_datalogger
+        else ["label", "time_slot"]
+    )
+    return (
+        queryset.annotate(time_slot=span.slot(field, tz))
+        .values(*groups)
+        .annotate(**aggregates)
+        .values_list(*groups, *aggregates)
+        .order_by()
+    )
+
+
+def segments_queryset(
+    dataloggers: Optional[Sequence[str]],
+    span: Span,
+    since: Optional[datetime],
+    before: Optional[datetime],
+    tz: tzinfo,
+    percentiles: Sequence[str] = (),
+    labels: Optional[Sequence[str]] = None,
+    by_datalogger: bool = False,
+) -> QuerySet[Any]:
+    """
+    Union of the aggregates of the segments of a summary (see plan_segments), a slot
+    may be split between several rows.
+
+    Returns:
+        ([datalogger_id,] label, time_slot, slot_count, slot_sum, slot_min, slot_max,
+        slot_sum_sq, [slot_<percentile>, ...]) rows.
+    """
+    # rollups are truncated in settings.TIME_ZONE, raw rows serve other time zones
+    # and slots that are not made of whole rollup slots
+    rollups = [
+        rollup
+        for rollup in ROLLUPS
+        if str(tz) == settings.TIME_ZONE
+        and span.is_multiple_of(rollup.span)
+        and not percentiles
+    ]
+    until = before + timedelta(microseconds=1) if before is not None else None
+
+    segments = plan_segments(since, until, rollups)
+    # the deltas not folded yet complete the slots read from the rollups
+    segments += [(RollupDelta, start, end) for rollup, start, end in segments if rollup]
+    querysets = [
+        segment_queryset(
+            segment, dataloggers, span, tz, percentiles, labels, by_datalogger
+        )
+        for segment in segments
+    ]
+    return querysets[0].union(*querysets[1:], all=True)
+
+
+def summarize(
+    datalogger: Datalogger,
+    span: Span,
+    since: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    tz: Optional[tzinfo] = None,
+    statistics: Sequence[str] = (),
+) -> List[SlotAggregate]:
+    """
+    Aggregate the measurements of a datalogger per label and time slot, in a single
+    query. Full slots are read from the coarsest rollup covering them, only the
+    partial slots at the edges of the range are aggregated from raw measurements.
+
+    Args:
+        datalogger: The datalogger to summarize.
+        span: Length of the slots.
+        since: Optional start of the range (inclusive).
+        before: Optional end of the range (inclusive).
+        tz: Time zone of the slots, the current time zone by default.
+        statistics: STATISTICS that will be read from the aggregates; percentiles
+            cannot be combined from rollups and are computed from raw measurements.
+
+    Returns:
+        The aggregates of each slot, ordered by label and slot.
+    """
+    return summarize_dataloggers(
+        [str(datalogger.id)], span, since, before, tz, statistics
+    )
+
+
+def summarize_dataloggers(
+    dataloggers: Optional[Sequence[str]],
+    span: Span,
+    since: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    tz: Optional[tzinfo] = None,
+    statistics: Sequence[str] = (),
+    labels: Optional[Sequence[str]] = None,
+    by_datalogger: bool = False,
+) -> List[SlotAggregate]:
+    """
+    Aggregate the measurements of several dataloggers together per label and time
+    slot, or per datalogger, label and time slot, in a single grouped query (see
+    summarize).
+
+    Args:
+        dataloggers: Ids of the dataloggers to summarize, None for all of them.
+        span: Length of the slots.
+        since: Optional start of the range (inclusive).
+        before: Optional end of the range (inclusive).
+        tz: Time zone of the slots, the current time zone by default.
+        statistics: STATISTICS that will be read from the aggregates.
+        labels: Labels to summarize, None for all of them.
+        by_datalogger: Whether to aggregate each datalogger separately.
+
+    Returns:
+        The aggregates of each slot, ordered by datalogger (when grouped by
+        datalogger), label and slot.
+    """
+    tz = tz or get_current_timezone()
+    percentiles = [name for name in statistics if name in PERCENTILES]
+    queryset = segments_queryset(
+        dataloggers, span, since, before, tz, percentiles, labels, by_datalogger
+    )
+
+    # a slot may be split between several segments
+    slots: Dict[Tuple[Optional[str], str, datetime], SlotAggregate] = {}
+    for row in queryset:
+        datalogger = str(row[0]) if by_datalogger else None
+        label, slot, count, total, low, high, sum_sq, *values = (
+            row[1:] if by_datalogger else row
+        )
+        aggregate = SlotAggregate(
+            label,
+            slot,
+            count,
+            total,
+            low,
+            high,
+            sum_sq,
+            dict(zip(percentiles, values)),
+            datalogger,
+        )
+        key = (datalogger, label, slot)
+        if key in slots:
+            slots[key].merge(aggregate)
+        else:
+            slots[key] = aggregate
+
+    return [aggregate for _, aggregate in sorted(slots.items())]
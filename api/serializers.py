@@ -1,24 +1,175 @@
-from datetime import datetime
-from typing import Any, Dict, List
+from datetime import datetime, timedelta
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 from uuid import UUID
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from django.db import transaction
-from django.utils.timezone import now
-from rest_framework import serializers
+from django.conf import settings
+from django.utils.timezone import get_current_timezone, now
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import empty
+from rest_framework.settings import api_settings
 
-from .models import Datalogger, Measurement
+from .filling import FILLS
+from .ingest import save_records
+from .models import MEASUREMENT_RULES, Datalogger, Measurement
+from .rolling import ROLLING_STATISTICS
+from .rollups import STATISTICS
+from .spans import Span, parse_span
+
+# output fields of the raw data endpoints and the Measurement columns they come from
+ROW_FIELDS: Dict[str, str] = {"label": "label", "measured_at": "at", "value": "value"}
+
+
+class CommaSeparatedListField(serializers.ListField):
+    """
+    List field for query parameters, given either repeated ('?label=temp&label=rain')
+    or comma-separated ('?label=temp,rain').
+    """
+
+    def to_internal_value(self, data: Any) -> List[Any]:
+        if isinstance(data, str):
+            data = [data]
+        if isinstance(data, (list, tuple)):
+            data = [
+                part.strip()
+                for item in data
+                for part in (item.split(",") if isinstance(item, str) else [item])
+                if not isinstance(part, str) or part.strip()
+            ]
+        return super().to_internal_value(data)
 
 
 class DataQueryParamsSerializer(serializers.Serializer):
     """
     Serializer for query parameters accepted by the '/api/data' endpoint.
 
-    Handles optional 'since', 'before', 'span' and required 'datalogger' UUID.
+    Handles optional 'since', 'before', 'stream', 'label' (measurement labels to keep),
+    'fields' (output fields to keep), 'max_points' (downsampling) and required
+    'datalogger' UUID.
     """
 
     datalogger = serializers.UUIDField(required=True)
     since = serializers.DateTimeField(required=False)
     before = serializers.DateTimeField(required=False)
+    stream = serializers.BooleanField(required=False, default=False)
+    label = CommaSeparatedListField(  # type: ignore[assignment]
+        child=serializers.ChoiceField(choices=list(MEASUREMENT_RULES)),
+        required=False,
+        allow_empty=False,
+    )
+    fields = CommaSeparatedListField(  # type: ignore[assignment]
+        child=serializers.ChoiceField(choices=list(ROW_FIELDS)),
+        required=False,
+        allow_empty=False,
+    )
+    max_points = serializers.IntegerField(required=False, min_value=2)
+
+
+class MultiDataQueryParamsSerializer(DataQueryParamsSerializer):
+    """
+    Serializer for query parameters accepted by the '/api/data/batch' endpoint.
+
+    Same as DataQueryParamsSerializer, with several 'datalogger' UUIDs (repeated or
+    comma-separated) and without 'stream' nor 'max_points'.
+    """
+
+    datalogger = CommaSeparatedListField(  # type: ignore[assignment]
+        child=serializers.UUIDField(), allow_empty=False
+    )
+    stream = None  # type: ignore[assignment]
+    max_points = None  # type: ignore[assignment]
+
+    def validate_datalogger(self, value: List[UUID]) -> List[UUID]:
+        if len(value) > settings.RAW_DATA_MAX_DATALOGGERS:
+            raise serializers.ValidationError(
+                f"At most {settings.RAW_DATA_MAX_DATALOGGERS} dataloggers per request."
+            )
+        # keep the requested order, without duplicates
+        return list(dict.fromkeys(value))
+
+
+class LatestQueryParamsSerializer(serializers.Serializer):
+    """
+    Serializer for query parameters accepted by the '/api/latest' endpoint.
+
+    Handles required 'datalogger' UUIDs (repeated or comma-separated) and optional
+    'label' (measurement labels to keep).
+    """
+
+    datalogger = CommaSeparatedListField(
+        child=serializers.UUIDField(), allow_empty=False
+    )
+    label = CommaSeparatedListField(  # type: ignore[assignment]
+        child=serializers.ChoiceField(choices=list(MEASUREMENT_RULES)),
+        required=False,
+        allow_empty=False,
+    )
+
+    def validate_datalogger(self, value: List[UUID]) -> List[UUID]:
+        max_dataloggers = settings.LATEST_VALUES["MAX_DATALOGGERS"]
+        if len(value) > max_dataloggers:
+            raise serializers.ValidationError(
+                f"At most {max_dataloggers} dataloggers per request."
+            )
+        return list(dict.fromkeys(value))
+
+
+class RollingQueryParamsSerializer(DataQueryParamsSerializer):
+    """
+    Serializer for query parameters accepted by the '/api/data/rolling' endpoint.
+
+    Same filters as DataQueryParamsSerializer, with required 'since' and 'before',
+    the 'window' and 'step' durations (ISO 8601, 'PT24H', 'P7D') and optional 'agg'
+    (rolling statistics), without 'stream', 'fields' nor 'max_points'.
+    """
+
+    since = serializers.DateTimeField(required=True)
+    before = serializers.DateTimeField(required=True)
+    window = serializers.DurationField(min_value=timedelta(minutes=1))
+    step = serializers.DurationField(min_value=timedelta(minutes=1))
+    agg = CommaSeparatedListField(
+        child=serializers.ChoiceField(choices=ROLLING_STATISTICS),
+        required=False,
+        allow_empty=False,
+    )
+    stream = None  # type: ignore[assignment]
+    max_points = None  # type: ignore[assignment]
+
+    def get_fields(self) -> Dict[str, serializers.Field]:
+        # 'fields' cannot be removed by setting it to None like the others, it would
+        # hide Serializer.fields
+        fields = super().get_fields()
+        del fields["fields"]
+        return fields
+
+    def validate_agg(self, value: List[str]) -> List[str]:
+        # statistics are output in a fixed order, whatever the order of the request
+        return [name for name in ROLLING_STATISTICS if name in value]
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        if attrs["before"] < attrs["since"]:
+            raise serializers.ValidationError(
+                {"before": "The range must end after its start."}
+            )
+        points = (attrs["before"] - attrs["since"]) // attrs["step"] + 1
+        if points > settings.ROLLING_MAX_POINTS:
+            raise serializers.ValidationError(
+                {
+                    "step": f"At most {settings.ROLLING_MAX_POINTS} points per label, "
+                    "use a longer step or a shorter range."
+                }
+            )
+        return attrs
 
 
 class LocationSerializer(serializers.Serializer):
@@ -41,49 +192,106 @@ class LocationSerializer(serializers.Serializer):
         return value
 
 
-class MeasurementSerializer(serializers.Serializer):
+# shared fields used to build the exact DRF error of an invalid label or value
+LABEL_FIELD = serializers.ChoiceField(choices=list(MEASUREMENT_RULES))
+VALUE_FIELD = serializers.FloatField()
+
+
+def validate_measurements(
+    data: Sequence[Any],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
     """
-    Serializer for individual measurements, validating the value
-    according to the label type constraints.
+    Validate a batch of raw measurements in a single pass against MEASUREMENT_RULES,
+    without building a serializer per measurement.
+
+    Args:
+        data: Raw measurements, expected to be dicts with a 'label' and a 'value'.
+
+    Returns:
+        The validated measurements and the errors, one dict per measurement
+        (empty when valid), in the same shape as a MeasurementSerializer(many=True).
     """
+    validated: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+
+    for item in data:
+        if not isinstance(item, dict):
+            message = str(serializers.Serializer.default_error_messages["invalid"])
+            message = message.format(datatype=type(item).__name__)
+            errors.append(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        serializers.ErrorDetail(message, code="invalid")
+                    ]
+                }
+            )
+            continue
 
-    label = serializers.ChoiceField(choices=[c[0] for c in Measurement.LABEL_CHOICES])  # type: ignore[assignment]
-    value = serializers.FloatField()
+        item_errors: Dict[str, Any] = {}
+        label = item.get("label", empty)
+        value = item.get("value", empty)
 
-    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
-        label = attrs["label"]
-        value = attrs["value"]
+        rule = MEASUREMENT_RULES.get(label) if isinstance(label, str) else None
+        if rule is None:
+            try:
+                LABEL_FIELD.run_validation(label)
+            except serializers.ValidationError as err:
+                item_errors["label"] = err.detail
 
-        if label == "temp":
-            if not (-20 <= value <= 40):
-                raise serializers.ValidationError(
-                    {"value": "Temperature must be between -20 and 40."}
-                )
-            if round((value * 10) % 1, 5) != 0:
-                raise serializers.ValidationError(
-                    {"value": "Temperature must be in steps of 0.1."}
-                )
+        # floats are the common case, anything else goes through the DRF field
+        if type(value) is not float:
+            try:
+                value = VALUE_FIELD.run_validation(value)
+            except serializers.ValidationError as err:
+                item_errors["value"] = err.detail
 
-        elif label == "hum":
-            if not (20 <= value <= 100):
-                raise serializers.ValidationError(
-                    {"value": "Humidity must be between 20 and 100."}
-                )
-            if round((value * 10) % 1, 5) != 0:
-                raise serializers.ValidationError(
-                    {"value": "Humidity must be in steps of 0.1."}
-                )
+        if not item_errors and rule is not None:
+            rule_error = rule.check(value)
+            if rule_error is not None:
+                item_errors["value"] = [
+                    serializers.ErrorDetail(rule_error, code="invalid")
+                ]
+
+        errors.append(item_errors)
+        if not item_errors:
+            validated.append({"label": label, "value": value})
+
+    return validated, errors
 
-        elif label == "rain":
-            if not (0 <= value <= 2):
-                raise serializers.ValidationError(
-                    {"value": "Rain must be between 0 and 2."}
-                )
-            if round((value * 5) % 1, 5) != 0:
-                raise serializers.ValidationError(
-                    {"value": "Rain must be in steps of 0.2."}
-                )
 
+class MeasurementListSerializer(serializers.ListSerializer):
+    """
+    List serializer validating all the measurements at once with validate_measurements
+    instead of running the child serializer on each of them.
+    """
+
+    def to_internal_value(self, data: Any) -> List[Dict[str, Any]]:
+        if not isinstance(data, list):
+            # let DRF report the 'not_a_list' error
+            return super().to_internal_value(data)
+
+        validated, errors = validate_measurements(data)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated
+
+
+class MeasurementSerializer(serializers.Serializer):
+    """
+    Serializer for individual measurements, validating the value
+    according to the rule of its label in MEASUREMENT_RULES.
+    """
+
+    label = serializers.ChoiceField(choices=list(MEASUREMENT_RULES))  # type: ignore[assignment]
+    value = serializers.FloatField()
+
+    class Meta:
+        list_serializer_class = MeasurementListSerializer
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        message = MEASUREMENT_RULES[attrs["label"]].check(attrs["value"])
+        if message is not None:
+            raise serializers.ValidationError({"value": message})
         return attrs
 
 
@@ -98,7 +306,8 @@ class DataRecordRequestSerializer(serializers.Serializer):
       - 'at' datetime ensuring it is not in the future.
 
     Also implements a 'create' method to persist the datalogger
-    (creating if missing) and associated measurements in the DB.
+    (creating if missing) and associated measurements in the DB,
+    skipping the measurements already stored.
     """
 
     datalogger = serializers.CharField()
@@ -116,9 +325,20 @@ class DataRecordRequestSerializer(serializers.Serializer):
                 "'datalogger' field must be a valid UUID."
             ) from err
 
-    def validate_measurements(self, value: List[Measurement]) -> List[Measurement]:
+    def validate_measurements(
+        self, value: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
         if not value:
             raise serializers.ValidationError("Measurements cannot be empty.")
+        # all the measurements of a record share its 'at': a label repeated with the
+        # same value is a duplicate, with another value it is a conflict
+        values: Dict[str, float] = {}
+        for measurement in value:
+            label = measurement["label"]
+            if values.setdefault(label, measurement["value"]) != measurement["value"]:
+                raise serializers.ValidationError(
+                    f"The '{label}' label has several values."
+                )
         return value
 
     def validate_at(self, value: datetime) -> datetime:
@@ -128,27 +348,11 @@ class DataRecordRequestSerializer(serializers.Serializer):
             )
         return value
 
-    @transaction.atomic
     def create(self, validated_data: Dict[str, Any]) -> Dict[str, Any]:
-        location_data = validated_data["location"]
-        measurement_data = validated_data["measurements"]
-        at = validated_data["at"]
-
-        datalogger: Datalogger
-        datalogger, _ = Datalogger.objects.get_or_create(
-            id=validated_data["datalogger"],
-            defaults={
-                "lat": location_data["lat"],
-                "lng": location_data["lng"],
-            },
-        )
-
-        measurement_instances: List[Measurement] = []
-        for m in measurement_data:
-            measurement = Measurement.objects.create(
-                datalogger=datalogger, label=m["label"], value=m["value"], at=at
-            )
-            measurement_instances.append(measurement)
+        # set-based write: one datalogger lookup and one insert for all measurements
+        result = save_records([validated_data])
+        [measurement_instances] = result.measurements
+        datalogger: Datalogger = measurement_instances[0].datalogger
 
         return {
             "datalogger": str(datalogger.id),
@@ -157,6 +361,8 @@ class DataRecordRequestSerializer(serializers.Serializer):
                 "lng": datalogger.lng,
             },
             "measurements": measurement_instances,
+            "inserted": result.inserted,
+            "deduplicated": result.deduplicated,
         }
 
 
@@ -172,19 +378,145 @@ class DataRecordResponseSerializer(serializers.ModelSerializer):
         fields = ["label", "measured_at", "value"]
 
 
+def datetime_formatter() -> Callable[[Any], Any]:
+    """
+    Build a function formatting datetimes exactly like a DRF DateTimeField, with the
+    output format and timezone resolved once instead of for every value. Rows are
+    usually ordered by time and share their timestamp across labels, so the last
+    formatted value is memoized.
+
+    Returns:
+        A function taking a datetime and returning its representation.
+    """
+    field = serializers.DateTimeField()
+    output_format = api_settings.DATETIME_FORMAT
+    # same as DateTimeField.default_timezone
+    field_timezone = get_current_timezone() if settings.USE_TZ else None
+    if output_format is None or field_timezone is None:
+        # the datetime is returned as is or made naive, nothing worth precomputing
+        return field.to_representation
+
+    iso_8601 = output_format.lower() == ISO_8601
+    last: List[Any] = [None, None]
+
+    def format_datetime(value: Any) -> Any:
+        if value == last[0]:
+            return last[1]
+        if not isinstance(value, datetime) or value.tzinfo is None:
+            output = field.to_representation(value)
+        elif iso_8601:
+            output = value.astimezone(field_timezone).isoformat()
+            if output.endswith("+00:00"):
+                output = output[:-6] + "Z"
+        else:
+            output = value.astimezone(field_timezone).strftime(output_format)
+        last[0], last[1] = value, output
+        return output
+
+    return format_datetime
+
+
+class MeasurementRowSerializer:
+    """
+    Read-path counterpart of DataRecordResponseSerializer working on values_list rows:
+    same output, byte for byte, without model instances nor DRF field machinery for
+    every row. Only the requested 'fields' are output, and only their columns need
+    to be read from the database.
+    """
+
+    def __init__(self, fields: Optional[Sequence[str]] = None) -> None:
+        self.fields = [name for name in ROW_FIELDS if fields is None or name in fields]
+        # the values_list columns, in the order expected by to_representation
+        self.columns = tuple(ROW_FIELDS[name] for name in self.fields)
+        self.format_datetime = datetime_formatter()
+
+    def to_representation(self, row: Sequence[Any]) -> Dict[str, Any]:
+        return {
+            "label": row[0],
+            "measured_at": self.format_datetime(row[1]),
+            "value": row[2],
+        }
+
+    def to_projected_representation(self, row: Sequence[Any]) -> Dict[str, Any]:
+        return {
+            name: self.format_datetime(value) if name == "measured_at" else value
+            for name, value in zip(self.fields, row)
+        }
+
+    def serialize(self, rows: Iterable[Sequence[Any]]) -> Iterator[Dict[str, Any]]:
+        to_representation = (
+            self.to_representation
+            if len(self.fields) == len(ROW_FIELDS)
+            else self.to_projected_representation
+        )
+        return (to_representation(row) for row in rows)
+
+
+class SpanField(serializers.Field):
+    """
+    Span of the summary slots: a name ('minute', '15min', 'hour', 'day', 'week',
+    'month') or an ISO 8601 duration ('PT5M', 'P2D'), see parse_span.
+    """
+
+    def to_internal_value(self, data: Any) -> Span:
+        try:
+            return parse_span(str(data))
+        except ValueError as err:
+            raise serializers.ValidationError(str(err)) from err
+
+    def to_representation(self, value: Span) -> str:
+        return value.name
+
+
 class DataRecordAggregateResponseSerializer(serializers.Serializer):
     """
     Serializer for aggregated measurement data in response to summary queries.
 
     Fields:
+      - datalogger: id of the datalogger, only for fleet summaries grouped by
+        datalogger,
       - label: measurement label,
       - time_slot: datetime for the aggregation period,
-      - value: aggregated value (average or sum according to the label).
+      - value: aggregated value (average or sum according to the label),
+      - count, min, max, avg, sum, stddev, p50, p90: the statistics asked with 'agg'
+        instead of value, stddev is null for slots of a single measurement.
     """
 
+    datalogger = serializers.UUIDField(required=False)
     label = serializers.CharField()  # type: ignore[assignment]
     time_slot = serializers.DateTimeField()
-    value = serializers.FloatField()
+    value = serializers.FloatField(required=False)
+    count = serializers.IntegerField(required=False)
+    min = serializers.FloatField(required=False)
+    max = serializers.FloatField(required=False)
+    avg = serializers.FloatField(required=False)
+    sum = serializers.FloatField(required=False)
+    stddev = serializers.FloatField(required=False)
+    p50 = serializers.FloatField(required=False)
+    p90 = serializers.FloatField(required=False)
+
+
+class RollingRecordResponseSerializer(serializers.Serializer):
+    """
+    Serializer for the rolling statistics of a label at a point.
+
+    Fields:
+      - label: measurement label,
+      - at: end of the window,
+      - value: aggregate of the window according to the label (sum or average),
+      - count, min, max, avg, sum, stddev: the statistics asked with 'agg' instead
+        of value, null for windows without measurements (count is 0).
+    """
+
+    label = serializers.CharField()  # type: ignore[assignment]
+    at = serializers.DateTimeField()
+    value = serializers.FloatField(required=False)
+    count = serializers.IntegerField(required=False)
+    min = serializers.FloatField(required=False)
+    max = serializers.FloatField(required=False)
+    avg = serializers.FloatField(required=False)
+    sum = serializers.FloatField(required=False)
+    stddev = serializers.FloatField(required=False)
 
 
 # We need a serializer for /api/summary because the span is not handled natively with APIView / DRF / django_filters /
@@ -192,10 +524,78 @@ class SummaryQueryParamsSerializer(serializers.Serializer):
     """
     Serializer for query parameters accepted by the '/api/summary' endpoint.
 
-    Handles optional 'since', 'before', 'span' and required 'datalogger' UUID.
+    Handles optional 'since', 'before', 'span', 'tz' (time zone of the slots and of
+    the output, defaults to settings.TIME_ZONE), 'agg' (statistics of each slot, with
+    a span), 'fill' (how empty slots are filled, with a span, since and before) and
+    required 'datalogger' UUID.
     """
 
     since = serializers.DateTimeField(required=False)
     before = serializers.DateTimeField(required=False)
     datalogger = serializers.UUIDField(required=True)
-    span = serializers.ChoiceField(choices=["day", "hour"], required=False)
+    span = SpanField(required=False)
+    tz = serializers.CharField(required=False)
+    agg = CommaSeparatedListField(
+        child=serializers.ChoiceField(choices=STATISTICS),
+        required=False,
+        allow_empty=False,
+    )
+    fill = serializers.ChoiceField(choices=FILLS, required=False)
+
+    def validate_agg(self, value: List[str]) -> List[str]:
+        # statistics are output in a fixed order, whatever the order of the request
+        return [name for name in STATISTICS if name in value]
+
+    def validate(self, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        if "agg" in attrs and "span" not in attrs:
+            raise serializers.ValidationError({"agg": "Statistics require a span."})
+        if "fill" in attrs:
+            if "span" not in attrs or "since" not in attrs or "before" not in attrs:
+                raise serializers.ValidationError(
+                    {"fill": "Filling requires a span, since and before."}
+                )
+            slots = attrs["span"].count_slots(attrs["since"], attrs["before"])
+            if slots > settings.SUMMARY_MAX_FILLED_SLOTS:
+                raise serializers.ValidationError(
+                    {
+                        "fill": f"At most {settings.SUMMARY_MAX_FILLED_SLOTS} slots "
+                        "per label can be filled."
+                    }
+                )
+        return attrs
+
+    def validate_tz(self, value: str) -> ZoneInfo:
+        try:
+            return ZoneInfo(value)
+        except (ValueError, ZoneInfoNotFoundError) as err:
+            raise serializers.ValidationError("Unknown time zone.") from err
+
+
+class FleetSummaryQueryParamsSerializer(SummaryQueryParamsSerializer):
+    """
+    Serializer for query parameters accepted by the '/api/summary/fleet' endpoint.
+
+    Same as SummaryQueryParamsSerializer with a required 'span', optional 'datalogger'
+    UUIDs (repeated or comma-separated, all the dataloggers when missing), 'label'
+    (measurement labels to keep) and 'group_by' ('datalogger' to summarize each
+    datalogger separately), and without 'fill'.
+    """
+
+    datalogger = CommaSeparatedListField(  # type: ignore[assignment]
+        child=serializers.UUIDField(), required=False, allow_empty=False
+    )
+    span = SpanField(required=True)
+    label = CommaSeparatedListField(  # type: ignore[assignment]
+        child=serializers.ChoiceField(choices=list(MEASUREMENT_RULES)),
+        required=False,
+        allow_empty=False,
+    )
+    group_by = serializers.ChoiceField(choices=["datalogger"], required=False)
+    fill = None  # type: ignore[assignment]
+
+    def validate_datalogger(self, value: List[UUID]) -> List[UUID]:
+        if len(value) > settings.SUMMARY_MAX_DATALOGGERS:
+            raise serializers.ValidationError(
+                f"At most {settings.SUMMARY_MAX_DATALOGGERS} dataloggers per request."
+            )
+        return list(dict.fromkeys(value))
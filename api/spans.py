@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, tzinfo
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db.models import DateTimeField, Expression, F, Func
+from django.db.models.functions import Trunc
+from django.utils.dateparse import parse_duration
+
+# truncations of date_trunc supported as spans, from the finest to the coarsest
+TRUNCATIONS: List[str] = ["minute", "hour", "day", "week", "month"]
+
+# fixed-length spans are aligned on a Monday at midnight, like 'week'
+BIN_ORIGIN = datetime(2000, 1, 3)
+
+
+class DateBin(Func):
+    """
+    PostgreSQL date_bin: start of the bin of the given stride containing a timestamp,
+    bins being aligned on BIN_ORIGIN in the wall-clock time of a time zone.
+    """
+
+    output_field = DateTimeField()
+
+    def __init__(self, expression: Any, stride: timedelta, tz: tzinfo) -> None:
+        super().__init__(expression)
+        self.stride = stride
+        self.tzname = str(tz)
+
+    def as_sql(
+        self,
+        compiler: Any,
+        connection: Any,
+        function: Optional[str] = None,
+        template: Optional[str] = None,
+        arg_joiner: Optional[str] = None,
+        **extra_context: Any,
+    ) -> Any:
+        sql, params = compiler.compile(self.source_expressions[0])
+        return (
+            f"date_bin(%s, {sql} AT TIME ZONE %s, %s) AT TIME ZONE %s",
+            [self.stride, *params, self.tzname, BIN_ORIGIN, self.tzname],
+        )
+
+
+@dataclass(frozen=True)
+class Span:
+    """
+    Length of the time slots of a summary: a date_trunc truncation ('day', 'month',
+    ...) or a fixed stride binned with date_bin ('15min', 'PT6H', ...).
+    """
+
+    name: str
+    truncation: Optional[str] = None
+    stride: Optional[timedelta] = None
+
+    def slot(self, field: str, tz: tzinfo) -> Expression:
+        """
+        Expression of the start of the slot of a datetime field, in the given time zone.
+        """
+        if self.truncation is not None:
+            return Trunc(field, self.truncation, tzinfo=tz)
+        assert self.stride is not None
+        return DateBin(F(field), self.stride, tz)
+
+    def local_slot_sql(self, sql: str) -> Tuple[str, List[Any]]:
+        """
+        SQL of the start of the slot containing a local timestamp, and its parameters.
+        """
+        if self.truncation is not None:
+            return f"date_trunc('{self.truncation}', {sql})", []
+        return f"date_bin(%s, {sql}, %s)", [self.stride, BIN_ORIGIN]
+
+    def step_sql(self) -> Tuple[str, List[Any]]:
+        """
+        SQL of the interval between the starts of two consecutive slots, and its
+        parameters.
+        """
+        if self.truncation is not None:
+            return f"interval '1 {self.truncation}'", []
+        return "%s::interval", [self.stride]
+
+    def count_slots(self, since: datetime, before: datetime) -> int:
+        """
+        Number of slots between two datetimes, approximated for months.
+        """
+        length = self.stride or TRUNCATION_LENGTHS[self.truncation or "minute"]
+        return (before - since) // length + 1
+
+    def is_multiple_of(self, truncation: str) -> bool:
+        """
+        Whether every slot of this span is made of whole slots of the given truncation
+        ('hour' or 'day'), in the same time zone.
+        """
+        if self.truncation is not None:
+            return TRUNCATIONS.index(self.truncation) >= TRUNCATIONS.index(truncation)
+        assert self.stride is not None
+        return self.stride % FIXED_TRUNCATIONS[truncation] == timedelta(0)
+
+
+FIXED_TRUNCATIONS: Dict[str, timedelta] = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# shortest length of the slots of each truncation
+TRUNCATION_LENGTHS: Dict[str, timedelta] = {
+    **FIXED_TRUNCATIONS,
+    "week": timedelta(days=7),
+    "month": timedelta(days=28),
+}
+
+NAMED_SPANS: Dict[str, Span] = {
+    **{name: Span(name, truncation=name) for name in TRUNCATIONS},
+    "15min": Span("15min", stride=timedelta(minutes=15)),
+}
+
+
+def parse_span(value: str) -> Span:
+    """
+    Parse a span: one of NAMED_SPANS or an ISO 8601 duration without years nor
+    months ('PT5M', 'P2D', 'P1DT12H').
+
+    Raises:
+        ValueError: If the value is not a supported span.
+    """
+    if value in NAMED_SPANS:
+        return NAMED_SPANS[value]
+    stride = parse_duration(value) if value.startswith("P") else None
+    if stride is None:
+        raise ValueError("Invalid span value.")
+    if stride < FIXED_TRUNCATIONS["minute"] or stride % timedelta(seconds=1):
+        raise ValueError(
+            "The span must be a whole number of seconds, at least a minute."
+        )
+    return Span(value, stride=stride)
@@ -0,0 +1,264 @@
+from datetime import datetime, tzinfo
+import hashlib
+import json
+import pickle
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# range of the measurements written for a datalogger: (first at, last at)
+WriteRange = Tuple[datetime, datetime]
+
+
+class SummaryCache:
+    """
+    Cache of /api/summary results in a Django cache backend, keyed on the normalized
+    query parameters.
+
+    The writes of each datalogger are numbered by a counter incremented atomically
+    in the same backend, and the range of the measurements of each write is stored
+    under its own key, so that concurrent writers never overwrite each other. An
+    entry keeps the counter read before its query: it is stale once a later write
+    overlaps its time range, or when a later write is unknown (counter or write
+    evicted, or more than 'max_writes' writes to check). Writes outside the range
+    of an entry keep it valid. The backend must increment atomically, like locmem,
+    Redis or Memcached.
+
+    Entries larger than 'max_entry_bytes' are not cached, the number of entries is
+    bounded by the backend (MAX_ENTRIES of its OPTIONS for locmem).
+    """
+
+    def __init__(self, alias: str, max_entry_bytes: int, max_writes: int) -> None:
+        self.alias = alias
+        self.max_entry_bytes = max_entry_bytes
+        self.max_writes = max_writes
+
+        # the counters are updated by the request threads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.oversized = 0
+
+    @property
+    def cache(self) -> BaseCache:
+        # cache connections are per thread
+        return caches[self.alias]
+
+    def key(
+        self, datalogger_id: str, params: Dict[str, Any], tz: tzinfo, columnar: bool
+    ) -> str:
+        """
+        Key of a summary, the same for all the spellings of the same query.
+
+        Args:
+            datalogger_id: Id of the summarized datalogger.
+            params: Validated query parameters of SummaryQueryParamsSerializer.
+            tz: Time zone of the summary.
+            columnar: Whether the summary is in the columnar layout.
+        """
+        normalized = {
+            "since": timestamp(params.get("since")),
+            "before": timestamp(params.get("before")),
+            "span": params["span"].name,
+            "tz": str(tz),
+            "agg": params.get("agg", []),
+            "fill": params.get("fill"),
+            "columnar": columnar,
+        }
+        digest = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode())
+        return f"summary:{datalogger_id}:{digest.hexdigest()}"
+
+    def generation(self, datalogger_id: str) -> Optional[int]:
+        """
+        Read the write counter of a datalogger, before summarizing it.
+
+        Returns:
+            The number of the last write, None when the counter is unknown: it is
+            started now and the summary cannot be cached.
+        """
+        generation = self.cache.get(sequence_key(datalogger_id))
+        if generation is None:
+            start_sequence(self.cache, datalogger_id)
+        return generation
+
+    def get(self, datalogger_id: str, key: str) -> Optional[Any]:
+        """
+        Returns:
+            The cached data of a summary, None if it is not cached or stale.
+        """
+        values = self.cache.get_many([key, sequence_key(datalogger_id)])
+        entry = values.get(key)
+        if entry is None:
+            self.count("misses")
+            return None
+
+        generation, since, before, payload = entry
+        if self.is_stale(
+            datalogger_id,
+            generation,
+            values.get(sequence_key(datalogger_id)),
+            since,
+            before,
+        ):
+            self.cache.delete(key)
+            self.count("invalidations", "misses")
+            return None
+
+        self.count("hits")
+        return pickle.loads(payload)
+
+    def set(
+        self,
+        datalogger_id: str,
+        key: str,
+        generation: Optional[int],
+        since: Optional[datetime],
+        before: Optional[datetime],
+        data: Any,
+    ) -> None:
+        """
+        Cache the data of a summary.
+
+        Args:
+            datalogger_id: Id of the summarized datalogger.
+            key: Key of the summary.
+            generation: The generation read before the summary was read from the
+                database.
+            since: Start of the range of the summary, None if unbounded.
+            before: End of the range of the summary, None if unbounded.
+            data: The summary.
+        """
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_entry_bytes:
+            self.count("oversized")
+            return
+        # writes made before the counter was started are unknown
+        if generation is None:
+            return
+        self.cache.set(key, (generation, since, before, payload))
+
+    def record_writes(self, ranges: Dict[str, WriteRange]) -> None:
+        """
+        Log committed writes, invalidating the entries they overlap.
+
+        Args:
+            ranges: The range of the measurements written per datalogger id.
+        """
+        writes: Dict[str, WriteRange] = {}
+        for pk, write_range in ranges.items():
+            try:
+                number = self.cache.incr(sequence_key(pk))
+            except ValueError:
+                # evicted counter: the entries of the datalogger are already stale
+                start_sequence(self.cache, pk)
+                number = self.cache.incr(sequence_key(pk))
+            writes[write_key(pk, number)] = write_range
+        self.cache.set_many(writes)
+
+    def is_stale(
+        self,
+        datalogger_id: str,
+        generation: int,
+        current: Optional[int],
+        since: Optional[datetime],
+        before: Optional[datetime],
+    ) -> bool:
+        if current is None or not 0 <= current - generation <= self.max_writes:
+            return True
+        if current == generation:
+            return False
+        writes = self.cache.get_many(
+            [write_key(datalogger_id, n) for n in range(generation + 1, current + 1)]
+        )
+        # a write counted but not logged yet, or evicted, may overlap
+        if len(writes) < current - generation:
+            return True
+        return any(
+            (since is None or last >= since) and (before is None or first <= before)
+            for first, last in writes.values()
+        )
+
+    def count(self, *counters: str) -> None:
+        with self._lock:
+            for counter in counters:
+                setattr(self, counter, getattr(self, counter) + 1)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "oversized": self.oversized,
+            }
+
+
+def sequence_key(datalogger_id: str) -> str:
+    return f"summary:writes:{datalogger_id}"
+
+
+def write_key(datalogger_id: str, number: int) -> str:
+    return f"summary:write:{datalogger_id}:{number}"
+
+
+def start_sequence(cache: BaseCache, datalogger_id: str) -> None:
+    # starts past any number of a previous, evicted counter: entries numbered by
+    # the old one are too far behind and stale
+    cache.add(sequence_key(datalogger_id), time.time_ns(), timeout=None)
+
+
+def timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+_summary_cache: Optional[SummaryCache] = None
+_summary_cache_lock = threading.Lock()
+
+
+def get_summary_cache() -> Optional[SummaryCache]:
+    """
+    Return the process-wide summary cache configured by settings.SUMMARY_CACHE,
+    None when it is disabled.
+    """
+    global _summary_cache
+
+    config = settings.SUMMARY_CACHE
+    if not config["ENABLED"]:
+        return None
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = SummaryCache(
+                alias=config["ALIAS"],
+                max_entry_bytes=config["MAX_ENTRY_BYTES"],
+                max_writes=config["MAX_WRITES"],
+            )
+        return _summary_cache
+
+
+def record_summary_writes(ranges: Dict[str, WriteRange]) -> None:
+    summary_cache = get_summary_cache()
+    if summary_cache is not None and ranges:
+        summary_cache.record_writes(ranges)
+
+
+def summary_cache_stats() -> Optional[Dict[str, Any]]:
+    return _summary_cache.stats() if _summary_cache is not None else None
+
+
+@receiver(setting_changed)
+def reset_summary_cache(setting: str, **kwargs: Any) -> None:
+    global _summary_cache
+
+    if setting != "SUMMARY_CACHE":
+        return
+    with _summary_cache_lock:
+        _summary_cache = None
@@ -0,0 +1,143 @@
+import uuid
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APITestCase
+
+from api.buffer import WriteBehindBuffer
+from api.models import DailyRollup, Datalogger, HourlyRollup, Measurement
+from api.registry import DataloggerRegistry, get_datalogger_registry
+from api.serializers import DataRecordRequestSerializer
+
+from .test_utils import DATALOGGERS, Payload, generate_random_payload
+
+
+class DataloggerRegistryTest(TestCase):
+    def test_registry_lru_and_ttl(self) -> None:
+        registry = DataloggerRegistry(capacity=3, ttl=60, negative_ttl=0)
+        dataloggers = [Datalogger(lat=1.0, lng=2.0) for _ in range(3)]
+        ids = [str(d.id) for d in dataloggers]
+
+        registry.add(dataloggers)
+        registry.add_missing(["unknown"])
+
+        found = registry.get_many([*ids, "unknown"])
+        # the oldest entry was evicted and the negative one has already expired
+        self.assertEqual(set(found), set(ids[1:]))
+        self.assertEqual((found[ids[2]].lat, found[ids[2]].lng), (1.0, 2.0))  # type: ignore[union-attr]
+        self.assertEqual(registry.stats()["hits"], 2)
+        self.assertEqual(registry.stats()["misses"], 2)
+
+    def test_registry_negative_entry_does_not_hide_datalogger(self) -> None:
+        registry = DataloggerRegistry(capacity=10, ttl=60, negative_ttl=60)
+        datalogger = Datalogger(lat=1.0, lng=2.0)
+
+        registry.add([datalogger])
+        registry.add_missing([str(datalogger.id)])
+
+        self.assertIsNotNone(
+            registry.get_many([str(datalogger.id)])[str(datalogger.id)]
+        )
+
+
+class DataloggerRegistryEndPointTest(APITestCase):
+    client: APIClient
+
+    def setUp(self) -> None:
+        self.addCleanup(get_datalogger_registry().clear)
+
+    def test_cached_datalogger_skips_lookup(self) -> None:
+        datalogger_id, location = next(iter(DATALOGGERS.items()))
+        Datalogger.objects.create(id=datalogger_id, **location)
+        url = reverse("api_fetch_data_raw")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(url, {"datalogger": datalogger_id})
+
+        # only the measurements query
+        with self.assertNumQueries(1):
+            response: Response = self.client.get(url, {"datalogger": datalogger_id})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_datalogger_is_cached(self) -> None:
+        url = reverse("api_fetch_data_aggregates")
+        params = {"datalogger": str(uuid.uuid4())}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get(url, params).status_code, 404)
+
+        with self.assertNumQueries(0):
+            response: Response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 404)
+
+    def test_ingest_registers_new_datalogger(self) -> None:
+        payload: Payload = generate_random_payload()
+        url = reverse("api_fetch_data_raw")
+        params = {"datalogger": payload["datalogger"]}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get(url, params).status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("api_ingest_data"), payload, format="json")
+
+        with self.assertNumQueries(1):
+            response: Response = self.client.get(url, params)
+        self.assertEqual(len(response.data), len(payload["measurements"]))
+
+        # savepoint, one insert for all measurements, release
+        payload["at"] = "2020-01-01T00:00:00Z"
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                reverse("api_ingest_data"), payload, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_deleted_datalogger_is_invalidated(self) -> None:
+        datalogger_id, location = next(iter(DATALOGGERS.items()))
+        url = reverse("api_fetch_data_raw")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            datalogger = Datalogger.objects.create(id=datalogger_id, **location)
+        self.assertEqual(
+            self.client.get(url, {"datalogger": datalogger_id}).status_code, 200
+        )
+
+        datalogger.delete()
+        response: Response = self.client.get(url, {"datalogger": datalogger_id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_ingest_after_external_delete(self) -> None:
+        payload: Payload = generate_random_payload()
+        url = reverse("api_ingest_data")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(
+                self.client.post(url, payload, format="json").status_code, 201
+            )
+
+        # deleted by another process (clear_db), the registry still knows it
+        with connection.cursor() as cursor:
+            for model in (Measurement, HourlyRollup, DailyRollup, Datalogger):
+                cursor.execute(f"DELETE FROM {model._meta.db_table}")
+
+        payload["at"] = "2020-01-01T00:00:00Z"
+        response: Response = self.client.post(url, payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Datalogger.objects.filter(id=payload["datalogger"]).exists())
+
+        # the buffer path writes the acknowledged records too
+        with connection.cursor() as cursor:
+            for model in (Measurement, HourlyRollup, DailyRollup, Datalogger):
+                cursor.execute(f"DELETE FROM {model._meta.db_table}")
+        buffer = WriteBehindBuffer(max_records=10, flush_records=10, flush_interval=60)
+        serializer = DataRecordRequestSerializer(data=payload)
+        serializer.is_valid(raise_exception=True)
+        buffer.submit([dict(serializer.validated_data)])
+
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(buffer.stats()["failed"], 0)
+        self.assertEqual(
+            Measurement.objects.filter(datalogger=payload["datalogger"]).count(),
+            len(payload["measurements"]),
+        )
@@ -1,12 +1,22 @@
+import csv
 from datetime import datetime, timedelta
-from typing import List, cast
+import io
+import json
+import re
+from typing import Any, Dict, List, Tuple, cast
+from unittest import mock
 
 from django.core.management import call_command
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.timezone import now
 from rest_framework.test import APITestCase
 
 from api.models import Datalogger, Measurement
+from api.serializers import DataQueryParamsSerializer, DataRecordResponseSerializer
 
 
 class FetchDataRawTest(APITestCase):
@@ -42,6 +52,17 @@ class FetchDataRawTest(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data), 50)
 
+    def test_query_params_validated_once(self) -> None:
+        with mock.patch(
+            "api.views.DataQueryParamsSerializer",
+            side_effect=DataQueryParamsSerializer,
+        ) as params_serializer:
+            response = self.client.get(
+                self.url, {"datalogger": str(self.datalogger.id), "max_points": "10"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(params_serializer.call_count, 1)
+
     def test_filter_by_datalogger_and_date_range(self) -> None:
         # We arbitrarily pick 2 values representing the time range we will be testing
         since = cast(datetime, self.measurements[8].at).isoformat()
@@ -89,3 +110,214 @@ class FetchDataRawTest(APITestCase):
     def test_invalid_datalogger_uuid(self) -> None:
         response = self.client.get(self.url, {"datalogger": "4"})
         self.assertEqual(response.status_code, 400)
+
+    def get_all_pages(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        response = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            rows.extend(response.data)
+            if "Link" not in response.headers:
+                return rows
+            next_url = re.fullmatch(r'<(.+)>; rel="next"', response.headers["Link"])
+            assert next_url is not None
+            response = self.client.get(next_url.group(1))
+
+    def test_pagination_walks_all_rows_in_order(self) -> None:
+        # rows sharing a timestamp are ordered by id across page boundaries
+        at = cast(datetime, self.measurements[10].at)
+        Measurement.objects.bulk_create(
+            Measurement(datalogger=self.datalogger, label=label, at=at, value=1.0)
+            for label in ["temp", "hum", "rain"]
+            if not Measurement.objects.filter(
+                datalogger=self.datalogger, label=label, at=at
+            ).exists()
+        )
+        expected = list(
+            Measurement.objects.filter(datalogger=self.datalogger).order_by("at", "id")
+        )
+
+        rows = self.get_all_pages(
+            {"datalogger": str(self.datalogger.id), "page_size": "7"}
+        )
+
+        self.assertEqual(len(rows), len(expected))
+        self.assertEqual(
+            [(r["label"], r["measured_at"]) for r in rows],
+            [
+                (m.label, DataRecordResponseSerializer(m).data["measured_at"])
+                for m in expected
+            ],
+        )
+
+    @override_settings(RAW_DATA_PAGE_SIZE=30, RAW_DATA_MAX_PAGE_SIZE=40)
+    def test_pagination_page_size(self) -> None:
+        params = {"datalogger": str(self.datalogger.id)}
+        response = self.client.get(self.url, params)
+        self.assertEqual(len(response.data), 30)
+        self.assertIn('rel="next"', response.headers["Link"])
+
+        response = self.client.get(self.url, {**params, "page_size": "1000"})
+        self.assertEqual(len(response.data), 40)
+
+    def test_pagination_invalid_cursor(self) -> None:
+        response = self.client.get(
+            self.url, {"datalogger": str(self.datalogger.id), "cursor": "not-a-cursor"}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(RAW_DATA_STREAM_CHUNK_SIZE=7, RAW_DATA_PAGE_SIZE=10)
+    def test_stream_json_array(self) -> None:
+        params = {"datalogger": str(self.datalogger.id)}
+        response = self.client.get(self.url, {**params, "stream": "true"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertNotIn("Link", response.headers)
+
+        body = b"".join(response.streaming_content)  # type: ignore[attr-defined]
+        paginated = self.get_all_pages(params)
+        self.assertEqual(json.loads(body), json.loads(json.dumps(paginated)))
+
+    def test_stream_ndjson(self) -> None:
+        params = {"datalogger": str(self.datalogger.id), "stream": "true"}
+        response = self.client.get(self.url, params, HTTP_ACCEPT="application/x-ndjson")
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content)  # type: ignore[attr-defined]
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(rows, sorted(rows, key=lambda r: r["measured_at"]))
+
+    def test_ndjson_format_without_stream(self) -> None:
+        response = self.client.get(
+            self.url,
+            {
+                "datalogger": str(self.datalogger.id),
+                "format": "ndjson",
+                "page_size": "5",
+            },
+        )
+
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        self.assertEqual(len(response.content.decode().splitlines()), 5)
+
+    def test_columnar_format(self) -> None:
+        response = self.client.get(
+            self.url,
+            {"datalogger": str(self.datalogger.id), "page_size": "20"},
+            HTTP_ACCEPT="application/vnd.weenat.columnar+json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('rel="next"', response.headers["Link"])
+        columns = response.json()
+        self.assertEqual(sum(len(c["at"]) for c in columns.values()), 20)
+
+        expected = self.measurements[:20]
+        for label, column in columns.items():
+            rows = [m for m in expected if m.label == label]
+            self.assertEqual(
+                column["at"], [int(cast(datetime, m.at).timestamp()) for m in rows]
+            )
+            self.assertEqual(column["value"], [m.value for m in rows])
+
+    def test_columnar_format_cannot_be_streamed(self) -> None:
+        response = self.client.get(
+            self.url,
+            {
+                "datalogger": str(self.datalogger.id),
+                "stream": "true",
+                "format": "columnar",
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_csv_format(self) -> None:
+        params = {"datalogger": str(self.datalogger.id), "format": "csv"}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        page = list(csv.DictReader(io.StringIO(response.content.decode())))
+
+        response = self.client.get(self.url, {**params, "stream": "true"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        body = b"".join(response.streaming_content)  # type: ignore[attr-defined]
+        streamed = list(csv.DictReader(io.StringIO(body.decode())))
+
+        self.assertEqual(len(page), 50)
+        self.assertEqual(page, streamed)
+        self.assertEqual(list(page[0]), ["label", "measured_at", "value"])
+
+    def test_filter_by_label(self) -> None:
+        params = {"datalogger": str(self.datalogger.id)}
+        cases: List[Tuple[List[str], Dict[str, Any]]] = [
+            (["rain"], {"label": "rain"}),
+            (["rain", "temp"], {"label": ["rain", "temp"]}),
+            (["hum", "rain"], {"label": "hum,rain"}),
+        ]
+        for labels, query in cases:
+            with self.subTest(query=query):
+                response = self.client.get(self.url, {**params, **query})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.data),
+                    sum(1 for m in self.measurements if m.label in labels),
+                )
+                self.assertTrue(all(r["label"] in labels for r in response.data))
+
+        response = self.client.get(self.url, {**params, "label": "wind"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_fields_projection(self) -> None:
+        params = {"datalogger": str(self.datalogger.id), "fields": "value,measured_at"}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 50)
+        self.assertEqual(list(response.data[0]), ["measured_at", "value"])
+        # the label column is not even read
+        select = queries.captured_queries[-1]["sql"].split(" FROM ")[0]
+        self.assertNotIn("label", select)
+
+        rows = self.get_all_pages({**params, "fields": "value", "page_size": "8"})
+        self.assertEqual(
+            [r["value"] for r in rows], [m.value for m in self.measurements]
+        )
+
+        response = self.client.get(self.url, {**params, "fields": "datalogger"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_downsampling(self) -> None:
+        params = {"datalogger": str(self.datalogger.id), "page_size": "5"}
+        response = self.client.get(self.url, {**params, "max_points": "4"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Link", response.headers)
+        self.assertEqual(
+            response.data, sorted(response.data, key=lambda r: r["measured_at"])
+        )
+        for label in {m.label for m in self.measurements}:
+            values = [m.value for m in self.measurements if m.label == label]
+            kept = [r["value"] for r in response.data if r["label"] == label]
+            self.assertLessEqual(len(kept), 4)
+            # peaks survive the reduction
+            self.assertIn(min(values), kept)
+            self.assertIn(max(values), kept)
+
+        # short series are kept whole
+        response = self.client.get(self.url, {**params, "max_points": "50"})
+        self.assertEqual(len(response.data), 50)
+
+        response = self.client.get(
+            self.url, {**params, "max_points": "6", "format": "columnar"}
+        )
+        self.assertTrue(all(len(c["at"]) <= 6 for c in response.json().values()))
+
+        for query in [{"max_points": "1"}, {"max_points": "4", "stream": "true"}]:
+            with self.subTest(query=query):
+                response = self.client.get(self.url, {**params, **query})
+                self.assertEqual(response.status_code, 400)
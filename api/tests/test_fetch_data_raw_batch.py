@@ -0,0 +1,95 @@
+import re
+from typing import Any, Dict, List
+import uuid
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from api.models import Datalogger, Measurement
+
+
+class FetchMultiDataRawTest(APITestCase):
+    url: str
+    ids: List[str]
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.url = reverse("api_fetch_data_raw_batch")
+        call_command("populate_db", dataloggers=3, measurements=20)
+        cls.ids = [str(pk) for pk in Datalogger.objects.values_list("id", flat=True)]
+
+    def test_fetch_grouped_per_datalogger(self) -> None:
+        ids = list(reversed(self.ids))
+        # datalogger lookup and a single query for all the measurements
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"datalogger": ",".join(ids)})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data), ids)
+        for pk in ids:
+            self.assertEqual(len(response.data[pk]), 20)
+            self.assertEqual(
+                [r["value"] for r in response.data[pk]],
+                list(
+                    Measurement.objects.filter(datalogger=uuid.UUID(pk))
+                    .order_by("at", "id")
+                    .values_list("value", flat=True)
+                ),
+            )
+
+    def test_fetch_with_filters_and_pages(self) -> None:
+        params = {
+            "datalogger": self.ids[:2],
+            "label": "temp",
+            "fields": "measured_at,value",
+            "page_size": "4",
+        }
+        groups: Dict[str, List[Any]] = {pk: [] for pk in self.ids[:2]}
+        response = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            for pk, rows in response.data.items():
+                groups[pk].extend(rows)
+            if "Link" not in response.headers:
+                break
+            next_url = re.fullmatch(r'<(.+)>; rel="next"', response.headers["Link"])
+            assert next_url is not None
+            response = self.client.get(next_url.group(1))
+
+        for pk, rows in groups.items():
+            self.assertEqual(
+                len(rows),
+                Measurement.objects.filter(
+                    datalogger=uuid.UUID(pk), label="temp"
+                ).count(),
+            )
+            self.assertTrue(all(list(r) == ["measured_at", "value"] for r in rows))
+
+    def test_fetch_columnar(self) -> None:
+        response = self.client.get(
+            self.url, {"datalogger": self.ids, "format": "columnar"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        columns = response.json()
+        self.assertEqual(sum(len(c["at"]) for c in columns[self.ids[0]].values()), 20)
+
+    def test_fetch_unknown_dataloggers(self) -> None:
+        unknown = [str(uuid.uuid4()), str(uuid.uuid4())]
+        response = self.client.get(
+            self.url, {"datalogger": [unknown[0], self.ids[0], unknown[1]]}
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data["unknown"], unknown)
+
+    @override_settings(RAW_DATA_MAX_DATALOGGERS=2)
+    def test_fetch_too_many_dataloggers(self) -> None:
+        response = self.client.get(self.url, {"datalogger": self.ids})
+        self.assertEqual(response.status_code, 400)
+
+    def test_fetch_invalid_datalogger(self) -> None:
+        response = self.client.get(self.url, {"datalogger": "4"})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta, timezone
+from statistics import mean, stdev
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.test import override_settings
+from django.urls import reverse
+
+from api.ingest import save_records
+from api.models import Datalogger
+
+from .test_utils import DATALOGGER, START, DataloggerAPITestCase, make_record
+
+
+class FetchDataRollingTest(DataloggerAPITestCase):
+    url: str = reverse("api_fetch_data_rolling")
+    datalogger: Datalogger
+    measurements: Dict[str, List[Tuple[datetime, float]]]
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        # hourly measurements over 3 days, with a 5 hours gap on the second day
+        hours = [h for h in range(72) if not 30 <= h < 35]
+        cls.measurements = {
+            "temp": [(START + timedelta(hours=h), float(h % 24)) for h in hours],
+            "rain": [(START + timedelta(hours=h), (h % 3) * 0.5) for h in hours],
+        }
+        save_records(
+            [
+                make_record(
+                    at,
+                    **{
+                        label: values[i][1]
+                        for label, values in cls.measurements.items()
+                    },
+                )
+                for i, (at, _) in enumerate(cls.measurements["temp"])
+            ]
+        )
+        cls.datalogger = Datalogger.objects.get()
+
+    def window(self, label: str, end: datetime, length: timedelta) -> List[float]:
+        return [v for at, v in self.measurements[label] if end - length < at <= end]
+
+    def test_rolling_default_aggregates(self) -> None:
+        params = {
+            "datalogger": DATALOGGER,
+            "since": "2026-03-01T12:00:00Z",
+            "before": "2026-03-04T00:00:00Z",
+            "window": "PT24H",
+            "step": "PT6H",
+        }
+        # a single pass of window functions
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, params)
+
+        self.assertEqual(response.status_code, 200)
+        points = [START + timedelta(hours=h) for h in range(12, 73, 6)]
+        self.assertEqual(len(response.data), 2 * len(points))
+        records = {(r["label"], r["at"]): r["value"] for r in response.data}
+        for point in points:
+            at = point.strftime("%Y-%m-%dT%H:%M:%S+0000")
+            # cumulative rain, mean temperature
+            self.assertAlmostEqual(
+                records[("rain", at)],
+                sum(self.window("rain", point, timedelta(hours=24))),
+                places=6,
+            )
+            self.assertAlmostEqual(
+                records[("temp", at)],
+                mean(self.window("temp", point, timedelta(hours=24))),
+                places=6,
+            )
+
+    def test_rolling_statistics(self) -> None:
+        response = self.client.get(
+            self.url,
+            {
+                "datalogger": DATALOGGER,
+                "label": "temp",
+                "since": "2026-02-28T22:00:00Z",
+                "before": "2026-03-02T12:00:00Z",
+                "window": "PT3H",
+                "step": "PT1H",
+                "agg": "stddev,count,max",
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        for record in response.data:
+            self.assertEqual(record["label"], "temp")
+            self.assertEqual(list(record), ["label", "at", "count", "max", "stddev"])
+            values = self.window(
+                "temp", datetime.fromisoformat(record["at"]), timedelta(hours=3)
+            )
+            expected: Dict[str, Any] = {
+                "count": len(values),
+                "max": max(values) if values else None,
+                "stddev": stdev(values) if len(values) > 1 else None,
+            }
+            for name, value in expected.items():
+                if value is None:
+                    self.assertIsNone(record[name])
+                else:
+                    self.assertAlmostEqual(record[name], value, places=6)
+        # windows before the first measurement and in the gap are empty
+        counts = [r["count"] for r in response.data]
+        self.assertEqual(counts[:3], [0, 0, 1])
+        self.assertIn(0, counts[30:])
+
+    def test_rolling_columnar(self) -> None:
+        response = self.client.get(
+            self.url,
+            {
+                "datalogger": DATALOGGER,
+                "since": "2026-03-02T00:00:00Z",
+                "before": "2026-03-02T12:00:00Z",
+                "window": "P1D",
+                "step": "PT12H",
+                "format": "columnar",
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        columns = response.json()
+        self.assertEqual(
+            columns["rain"]["at"],
+            [int((START + timedelta(hours=h)).timestamp()) for h in (24, 36)],
+        )
+        self.assertAlmostEqual(
+            columns["rain"]["value"][0],
+            sum(self.window("rain", START + timedelta(hours=24), timedelta(days=1))),
+        )
+
+    @override_settings(TIME_ZONE="Europe/Paris")
+    def test_rolling_across_dst_change(self) -> None:
+        # hourly rain around the switch to summer time, on 2026-03-29 in Paris
+        first = datetime(2026, 3, 26, 12, 30, tzinfo=timezone.utc)
+        save_records(
+            [make_record(first + timedelta(hours=h), rain=0.5) for h in range(120)]
+        )
+        params = {
+            "datalogger": DATALOGGER,
+            "label": "rain",
+            "since": "2026-03-28T00:00:00+01:00",
+            "before": "2026-03-31T00:00:00+02:00",
+        }
+        rolling = self.client.get(self.url, {**params, "window": "P1D", "step": "P1D"})
+        summary = self.client.get(
+            reverse("api_fetch_data_aggregates"),
+            {**params, "span": "P1D", "tz": "Europe/Paris"},
+        )
+        self.assertEqual(rolling.status_code, 200)
+        self.assertEqual(summary.status_code, 200)
+
+        # points on each local midnight, like the slots of the summary, and the
+        # window ending at a midnight is the slot of the day before
+        slots = [datetime.fromisoformat(r["time_slot"]) for r in summary.data]
+        points = [datetime.fromisoformat(r["at"]) for r in rolling.data]
+        self.assertEqual(points, [*slots, slots[-1] + timedelta(days=1)])
+        for record, slot in zip(rolling.data[1:], summary.data, strict=True):
+            self.assertAlmostEqual(record["value"], slot["value"], places=6)
+        # the day of the change is 23 hours long
+        self.assertAlmostEqual(rolling.data[2]["value"], 23 * 0.5, places=6)
+
+    @override_settings(ROLLING_MAX_POINTS=10)
+    def test_rolling_invalid_params(self) -> None:
+        params: Dict[str, str] = {
+            "datalogger": DATALOGGER,
+            "since": "2026-03-01T00:00:00Z",
+            "before": "2026-03-01T06:00:00Z",
+            "window": "PT24H",
+            "step": "PT1H",
+        }
+        self.assertEqual(self.client.get(self.url, params).status_code, 200)
+
+        invalid_params: List[Dict[str, Optional[str]]] = [
+            {"window": None},
+            {"since": None},
+            {"step": "PT10S"},
+            {"step": "PT10M"},
+            {"before": "2026-02-28T00:00:00Z"},
+            {"agg": "p50"},
+        ]
+        for invalid in invalid_params:
+            with self.subTest(params=invalid):
+                query = {
+                    k: v for k, v in {**params, **invalid}.items() if v is not None
+                }
+                self.assertEqual(self.client.get(self.url, query).status_code, 400)
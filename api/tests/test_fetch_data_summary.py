@@ -1,12 +1,22 @@
+from collections import defaultdict
+import csv
+from datetime import datetime, timedelta
+import io
+from statistics import mean, median, quantiles, stdev
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
 from django.core.management import call_command
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.utils.dateparse import parse_duration
 
+from api.ingest import save_records
 from api.models import Datalogger, Measurement
-from api.tests.test_utils import aggregate
+from api.rollups import STATISTICS
+from api.tests.test_utils import START, DataloggerAPITestCase, aggregate, make_record
 
 
-class FetchDataSummaryTest(APITestCase):
+class FetchDataSummaryTest(DataloggerAPITestCase):
     url: str
     datalogger: Datalogger
     measurements: list
@@ -64,11 +74,175 @@ class FetchDataSummaryTest(APITestCase):
         self.assertEqual(len(response.data), len(expected))
 
     def test_summary_invalid_span(self) -> None:
+        for span in ["fortnight", "P1M", "PT30S"]:
+            with self.subTest(span=span):
+                response = self.client.get(
+                    self.url, {"datalogger": str(self.datalogger.id), "span": span}
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_summary_invalid_timezone(self) -> None:
         response = self.client.get(
-            self.url, {"datalogger": str(self.datalogger.id), "span": "minute"}
+            self.url,
+            {
+                "datalogger": str(self.datalogger.id),
+                "span": "day",
+                "tz": "Mars/Olympus",
+            },
         )
         self.assertEqual(response.status_code, 400)
 
+    def test_summary_spans(self) -> None:
+        def slot(at: datetime, span: str, tz: ZoneInfo) -> datetime:
+            local = at.astimezone(tz).replace(tzinfo=None)
+            if span == "month":
+                start = local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            elif span == "week":
+                day = local.replace(hour=0, minute=0, second=0, microsecond=0)
+                start = day - timedelta(days=day.weekday())
+            else:
+                stride = {"15min": timedelta(minutes=15)}.get(span) or parse_duration(
+                    span
+                )
+                assert stride is not None
+                origin = datetime(2000, 1, 3)
+                start = origin + (local - origin) // stride * stride
+            return start.replace(tzinfo=tz)
+
+        cases = [
+            ("15min", "UTC"),
+            ("week", "UTC"),
+            ("month", "UTC"),
+            ("PT6H", "UTC"),
+            ("P2D", "UTC"),
+            ("PT6H", "America/New_York"),
+            ("week", "Asia/Kolkata"),
+        ]
+        for span, tzname in cases:
+            with self.subTest(span=span, tz=tzname):
+                tz = ZoneInfo(tzname)
+                expected: Dict[Tuple[str, datetime], List[float]] = defaultdict(list)
+                for m in self.measurements:
+                    expected[(m.label, slot(m.at, span, tz))].append(m.value)
+
+                response = self.client.get(
+                    self.url,
+                    {"datalogger": str(self.datalogger.id), "span": span, "tz": tzname},
+                )
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), len(expected))
+                for record in response.data:
+                    values = expected[
+                        (record["label"], datetime.fromisoformat(record["time_slot"]))
+                    ]
+                    value = sum(values) if record["label"] == "rain" else mean(values)
+                    self.assertAlmostEqual(record["value"], value, places=6)
+
+    def test_summary_statistics(self) -> None:
+        def statistics(values: List[float]) -> Dict[str, Any]:
+            return {
+                "count": len(values),
+                "min": min(values),
+                "max": max(values),
+                "avg": mean(values),
+                "sum": sum(values),
+                "stddev": stdev(values) if len(values) > 1 else None,
+                "p50": median(values),
+                "p90": (
+                    quantiles(values, n=10, method="inclusive")[8]
+                    if len(values) > 1
+                    else values[0]
+                ),
+            }
+
+        since, before = self.measurements[5].at, self.measurements[45].at
+        cases: List[Dict[str, Any]] = [
+            # percentiles are computed from the raw measurements
+            {"span": "day", "agg": "count,min,max,avg,sum,stddev,p50,p90"},
+            {"span": "hour", "agg": ["p90", "min"]},
+            # the others come from the rollups, and raw rows at the edges
+            {
+                "span": "day",
+                "agg": "stddev,max,count",
+                "since": since.isoformat(),
+                "before": before.isoformat(),
+            },
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                agg = params["agg"]
+                asked = agg.split(",") if isinstance(agg, str) else agg
+                names = [name for name in STATISTICS if name in asked]
+                bounded = "since" in params
+                expected: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+                for item in self.measurements:
+                    if not bounded or since <= item.at <= before:
+                        slot = item.at.replace(minute=0, second=0, microsecond=0)
+                        if params["span"] == "day":
+                            slot = slot.replace(hour=0)
+                        expected[(item.label, slot.isoformat()[:19])].append(item.value)
+
+                # all the statistics are computed by a single query
+                with self.assertNumQueries(1):
+                    response = self.client.get(
+                        self.url, {"datalogger": str(self.datalogger.id), **params}
+                    )
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data), len(expected))
+                for record in response.data:
+                    self.assertEqual(list(record), ["label", "time_slot", *names])
+                    values = statistics(
+                        expected[(record["label"], record["time_slot"][:19])]
+                    )
+                    for name in names:
+                        if values[name] is None:
+                            self.assertIsNone(record[name])
+                        else:
+                            self.assertAlmostEqual(record[name], values[name], places=6)
+
+    def test_summary_statistics_columnar(self) -> None:
+        response = self.client.get(
+            self.url,
+            {
+                "datalogger": str(self.datalogger.id),
+                "span": "day",
+                "agg": "min,max",
+                "format": "columnar",
+            },
+        )
+
+        self.assertEqual(response.status_code, 200)
+        for column in response.json().values():
+            self.assertEqual(list(column), ["at", "min", "max"])
+            self.assertTrue(all(a <= b for a, b in zip(column["min"], column["max"])))
+
+    def test_summary_invalid_statistics(self) -> None:
+        params = {"datalogger": str(self.datalogger.id)}
+        for query in [{"span": "day", "agg": "mode"}, {"agg": "min"}]:
+            with self.subTest(query=query):
+                response = self.client.get(self.url, {**params, **query})
+                self.assertEqual(response.status_code, 400)
+
+    def test_summary_local_days(self) -> None:
+        params = {"datalogger": str(self.datalogger.id), "span": "day"}
+        tz = ZoneInfo("Pacific/Auckland")
+        expected = {
+            (m.label, m.at.astimezone(tz).date().isoformat()) for m in self.measurements
+        }
+
+        response = self.client.get(self.url, {**params, "tz": "Pacific/Auckland"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {(r["label"], r["time_slot"][:10]) for r in response.data}, expected
+        )
+        for record in response.data:
+            local = datetime.fromisoformat(record["time_slot"])
+            self.assertEqual(local.utcoffset(), local.astimezone(tz).utcoffset())
+            self.assertEqual(local.astimezone(tz).hour, 0)
+
     def test_summary_response_structure(self) -> None:
         response = self.client.get(
             self.url, {"datalogger": str(self.datalogger.id), "span": "hour"}
@@ -128,3 +302,167 @@ class FetchDataSummaryTest(APITestCase):
                     break
 
             self.assertTrue(found, f"Item not found in response: {expected_item}")
+
+    def test_summary_single_query(self) -> None:
+        for span in ["hour", "day"]:
+            with self.subTest(span=span):
+                # a single GROUP BY whatever the number of labels
+                with self.assertNumQueries(1):
+                    response = self.client.get(
+                        self.url, {"datalogger": str(self.datalogger.id), "span": span}
+                    )
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.data), len(aggregate(self.measurements, span))
+                )
+                slots = [(r["label"], r["time_slot"]) for r in response.data]
+                self.assertEqual(slots, sorted(slots))
+
+    def test_summary_columnar_format(self) -> None:
+        params = {"datalogger": str(self.datalogger.id), "span": "hour"}
+        expected = self.client.get(self.url, params).data
+
+        response = self.client.get(self.url, {**params, "format": "columnar"})
+
+        self.assertEqual(response.status_code, 200)
+        columns = response.json()
+        self.assertEqual(
+            sorted(
+                (label, at, value)
+                for label, column in columns.items()
+                for at, value in zip(column["at"], column["value"], strict=True)
+            ),
+            sorted(
+                (
+                    item["label"],
+                    int(datetime.fromisoformat(item["time_slot"]).timestamp()),
+                    item["value"],
+                )
+                for item in expected
+            ),
+        )
+
+    def test_summary_csv_format(self) -> None:
+        response = self.client.get(
+            self.url,
+            {"datalogger": str(self.datalogger.id), "span": "day"},
+            HTTP_ACCEPT="text/csv",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(response.content.decode())))
+        self.assertGreater(len(rows), 0)
+        self.assertEqual(list(rows[0]), ["label", "time_slot", "value"])
+
+
+class FetchDataSummaryFillTest(DataloggerAPITestCase):
+    url: str = reverse("api_fetch_data_aggregates")
+    datalogger: Datalogger
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        save_records(
+            [
+                make_record(START + timedelta(hours=hour), **{label: value})
+                for hour, label, value in [
+                    (0, "temp", 10.0),
+                    (1, "temp", 12.0),
+                    (4, "temp", 18.0),
+                    (2, "rain", 1.0),
+                ]
+            ]
+        )
+        cls.datalogger = Datalogger.objects.get()
+
+    def series(self, **params: str) -> Dict[str, List[Any]]:
+        response = self.client.get(
+            self.url,
+            {
+                "datalogger": str(self.datalogger.id),
+                "since": "2026-03-01T00:00:00Z",
+                "before": "2026-03-01T05:59:59Z",
+                "span": "hour",
+                **params,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        series: Dict[str, List[Any]] = defaultdict(list)
+        for record in response.data:
+            series[record["label"]].append(
+                (record["time_slot"][11:13], *list(record.values())[2:])
+            )
+        return series
+
+    def test_summary_fill(self) -> None:
+        hours = ["00", "01", "02", "03", "04", "05"]
+        expected: Dict[str, Dict[str, List[Optional[float]]]] = {
+            "null": {
+                "temp": [10.0, 12.0, None, None, 18.0, None],
+                "rain": [None, None, 1.0, None, None, None],
+            },
+            "previous": {
+                "temp": [10.0, 12.0, 12.0, 12.0, 18.0, 18.0],
+                "rain": [None, None, 1.0, 1.0, 1.0, 1.0],
+            },
+            "linear": {
+                "temp": [10.0, 12.0, 14.0, 16.0, 18.0, None],
+                "rain": [None, None, 1.0, None, None, None],
+            },
+        }
+        for fill, values in expected.items():
+            with self.subTest(fill=fill):
+                # the dense series is generated by the summary query
+                with self.assertNumQueries(1):
+                    series = self.series(fill=fill)
+                self.assertEqual(
+                    dict(series),
+                    {
+                        label: [(h, v) for h, v in zip(hours, label_values)]
+                        for label, label_values in values.items()
+                    },
+                )
+
+    def test_summary_fill_statistics(self) -> None:
+        series = self.series(fill="linear", agg="count,avg,max")
+
+        # counts of empty slots are 0, whatever the fill
+        self.assertEqual(
+            series["temp"],
+            [
+                ("00", 1, 10.0, 10.0),
+                ("01", 1, 12.0, 12.0),
+                ("02", 0, 14.0, 14.0),
+                ("03", 0, 16.0, 16.0),
+                ("04", 1, 18.0, 18.0),
+                ("05", 0, None, None),
+            ],
+        )
+
+    def test_summary_fill_fixed_span(self) -> None:
+        series = self.series(fill="linear", span="PT2H")
+        self.assertEqual(series["temp"], [("00", 11.0), ("02", 14.5), ("04", 18.0)])
+
+        # slots are generated in local time
+        series = self.series(fill="previous", span="day", tz="Europe/Paris")
+        self.assertEqual(series["temp"], [("00", 13.333333333333334)])
+
+    def test_summary_invalid_fill(self) -> None:
+        params = {"datalogger": str(self.datalogger.id), "span": "hour"}
+        for invalid in [
+            {
+                "fill": "next",
+                "since": "2026-03-01T00:00:00Z",
+                "before": "2026-03-02T00:00:00Z",
+            },
+            {"fill": "null", "since": "2026-03-01T00:00:00Z"},
+            {
+                "fill": "null",
+                "since": "2026-03-01T00:00:00Z",
+                "before": "2028-03-01T00:00:00Z",
+            },
+        ]:
+            with self.subTest(params=invalid):
+                response = self.client.get(self.url, {**params, **invalid})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("fill", response.data)
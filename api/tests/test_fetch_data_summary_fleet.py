@@ -0,0 +1,131 @@
+from io import StringIO
+from typing import List
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from api.models import Datalogger, Measurement
+from api.tests.test_utils import DataloggerAPITestCase, aggregate
+
+
+class FetchDataSummaryFleetTest(DataloggerAPITestCase):
+    url: str
+    dataloggers: List[Datalogger]
+    measurements: List[Measurement]
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.url = reverse("api_fetch_data_aggregates_fleet")
+        call_command("populate_db", dataloggers=3, measurements=60, stdout=StringIO())
+        cls.dataloggers = list(Datalogger.objects.order_by("id"))
+        cls.measurements = list(Measurement.objects.all())
+
+    def test_fleet_summary(self) -> None:
+        # a single grouped query for all the dataloggers
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"span": "day"})
+
+        self.assertEqual(response.status_code, 200)
+        expected = aggregate(self.measurements, "day")
+        self.assertEqual(len(response.data), len(expected))
+        values = {(r["label"], r["time_slot"][:19]): r["value"] for r in response.data}
+        for item in expected:
+            self.assertAlmostEqual(
+                values[(item["label"], item["time_slot"])], item["value"], places=6
+            )
+        self.assertNotIn("datalogger", response.data[0])
+
+    def test_fleet_summary_of_listed_dataloggers(self) -> None:
+        listed = self.dataloggers[:2]
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                self.url,
+                {
+                    "datalogger": ",".join(str(d.id) for d in listed),
+                    "span": "hour",
+                    "agg": "count,sum",
+                    "label": "rain",
+                },
+            )
+
+        self.assertEqual(response.status_code, 200)
+        measurements = [
+            m
+            for m in self.measurements
+            if m.datalogger_id in {d.id for d in listed} and m.label == "rain"  # type: ignore[attr-defined]
+        ]
+        self.assertEqual(sum(r["count"] for r in response.data), len(measurements))
+        self.assertAlmostEqual(
+            sum(r["sum"] for r in response.data),
+            sum(m.value for m in measurements),
+            places=6,
+        )
+        self.assertEqual({r["label"] for r in response.data}, {"rain"})
+
+    def test_fleet_summary_by_datalogger(self) -> None:
+        response = self.client.get(
+            self.url, {"span": "day", "group_by": "datalogger", "agg": "avg,max"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # the same slots as the summary of each datalogger, up to the order in which
+        # the queued deltas are added
+        for datalogger in self.dataloggers:
+            single = self.client.get(
+                reverse("api_fetch_data_aggregates"),
+                {"datalogger": str(datalogger.id), "span": "day", "agg": "avg,max"},
+            )
+            records = [
+                r for r in response.data if r["datalogger"] == str(datalogger.id)
+            ]
+            self.assertEqual(len(records), len(single.data))
+            for record, expected in zip(records, single.data):
+                self.assertEqual(
+                    (record["label"], record["time_slot"]),
+                    (expected["label"], expected["time_slot"]),
+                )
+                self.assertAlmostEqual(record["avg"], expected["avg"], places=9)
+                self.assertEqual(record["max"], expected["max"])
+
+    def test_fleet_summary_by_datalogger_columnar(self) -> None:
+        response = self.client.get(
+            self.url, {"span": "day", "group_by": "datalogger", "format": "columnar"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        columns = response.json()
+        self.assertEqual(set(columns), {str(d.id) for d in self.dataloggers})
+        self.assertEqual(
+            sum(len(c["at"]) for group in columns.values() for c in group.values()),
+            len(
+                {
+                    (m.datalogger_id, m.label, m.at.date())  # type: ignore[attr-defined]
+                    for m in self.measurements
+                }
+            ),
+        )
+
+    def test_fleet_summary_unknown_datalogger(self) -> None:
+        unknown = "00000000-0000-0000-0000-000000000000"
+        response = self.client.get(
+            self.url,
+            {"datalogger": [str(self.dataloggers[0].id), unknown], "span": "day"},
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data["unknown"], [unknown])
+
+    @override_settings(SUMMARY_MAX_DATALOGGERS=1)
+    def test_fleet_summary_invalid_params(self) -> None:
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(
+            self.client.get(self.url, {"span": "day", "group_by": "label"}).status_code,
+            400,
+        )
+        response = self.client.get(
+            self.url,
+            {"datalogger": [str(d.id) for d in self.dataloggers], "span": "day"},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("datalogger", response.data)
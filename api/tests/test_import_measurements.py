@@ -0,0 +1,204 @@
+import csv
+import gzip
+from io import StringIO
+import json
+import os
+import tempfile
+from typing import Any, List
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from api.models import Datalogger, Measurement
+from api.serializers import DataRecordRequestSerializer
+
+from .test_utils import DATALOGGERS, generate_random_payload
+
+DATALOGGER_ID, LOCATION = next(iter(DATALOGGERS.items()))
+
+
+class ImportMeasurementsTest(TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_csv(self, name: str, rows: List[List[Any]]) -> str:
+        path = os.path.join(self.directory, name)
+        opener: Any = gzip.open if name.endswith(".gz") else open
+        with opener(path, "wt", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["datalogger", "lat", "lng", "at", "label", "value"])
+            writer.writerows(rows)
+        return path
+
+    def import_files(self, *paths: str, **options: Any) -> str:
+        stdout = StringIO()
+        call_command("import_measurements", *paths, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_import_csv(self) -> None:
+        rows = [
+            [
+                DATALOGGER_ID,
+                LOCATION["lat"],
+                LOCATION["lng"],
+                f"2024-01-01T00:{m:02}:00Z",
+                label,
+                value,
+            ]
+            for m in range(30)
+            for label, value in [("temp", "12.3"), ("hum", "45.6"), ("rain", "0.4")]
+        ]
+        path = self.write_csv("export.csv.gz", rows)
+
+        output = self.import_files(path, batch_size=25)
+
+        self.assertIn("90 rows", output)
+        self.assertIn("90 inserted", output)
+        self.assertEqual(Measurement.objects.count(), 90)
+        datalogger = Datalogger.objects.get()
+        self.assertEqual(
+            (datalogger.lat, datalogger.lng), (LOCATION["lat"], LOCATION["lng"])
+        )
+
+        # importing the same file again only finds duplicates
+        output = self.import_files(path)
+        self.assertIn("0 inserted, 90 duplicates", output)
+        self.assertEqual(Measurement.objects.count(), 90)
+
+    def test_import_csv_rejected_rows(self) -> None:
+        path = self.write_csv(
+            "export.csv",
+            [
+                [
+                    DATALOGGER_ID,
+                    LOCATION["lat"],
+                    LOCATION["lng"],
+                    "2024-01-01T00:00:00Z",
+                    "temp",
+                    "12.3",
+                ],
+                [
+                    DATALOGGER_ID,
+                    LOCATION["lat"],
+                    LOCATION["lng"],
+                    "2024-01-01T00:00:00Z",
+                    "temp",
+                    "99",
+                ],
+                [
+                    "not-a-uuid",
+                    LOCATION["lat"],
+                    LOCATION["lng"],
+                    "2024-01-01T00:00:00Z",
+                    "hum",
+                    "50",
+                ],
+                [
+                    DATALOGGER_ID,
+                    LOCATION["lat"],
+                    LOCATION["lng"],
+                    "yesterday",
+                    "wind",
+                    "x",
+                ],
+            ],
+        )
+
+        output = self.import_files(path, max_errors=2)
+
+        self.assertIn("1 inserted", output)
+        self.assertIn("3 rejected", output)
+        self.assertIn("line 3: ", output)
+        self.assertIn("Temperature must be between -20 and 40.", output)
+        self.assertIn("line 4: ", output)
+        self.assertIn("1 more rejected rows", output)
+        self.assertEqual(Measurement.objects.count(), 1)
+
+    @override_settings(TIME_ZONE="Europe/Paris")
+    def test_import_csv_timestamps_like_the_api(self) -> None:
+        timestamps = [
+            "2024-01-01T10:00:00+02:00",
+            "2024-01-01 11:00:00Z",
+            "2024-01-01T12:00:00",
+            "2024-01-02",
+            "2024-01-01T13:00:00.5+0100",
+            "01/01/2024 14:00",
+        ]
+        path = self.write_csv(
+            "export.csv",
+            [
+                [DATALOGGER_ID, LOCATION["lat"], LOCATION["lng"], at, "temp", "10"]
+                for at in timestamps
+            ],
+        )
+
+        output = self.import_files(path)
+
+        # only explicit offsets, in the formats of DataRecordRequestSerializer
+        self.assertIn("2 inserted", output)
+        self.assertIn("4 rejected", output)
+        expected = set()
+        for at in timestamps:
+            serializer = DataRecordRequestSerializer(
+                data={
+                    "datalogger": DATALOGGER_ID,
+                    "location": LOCATION,
+                    "at": at,
+                    "measurements": [{"label": "temp", "value": 10}],
+                }
+            )
+            if serializer.is_valid():
+                expected.add(serializer.validated_data["at"])
+        self.assertEqual(
+            set(Measurement.objects.values_list("at", flat=True)), expected
+        )
+
+    def test_import_ndjson(self) -> None:
+        payloads = [generate_random_payload() for _ in range(10)]
+        path = os.path.join(self.directory, "records.ndjson")
+        with open(path, "w") as file:
+            file.writelines(json.dumps(p) + "\n" for p in payloads)
+            file.write("{not json\n")
+
+        output = self.import_files(path, batch_size=4)
+
+        expected_count = sum(len(p["measurements"]) for p in payloads)
+        self.assertIn(f"{expected_count} inserted", output)
+        self.assertIn("1 rejected", output)
+        self.assertEqual(Measurement.objects.count(), expected_count)
+
+    def test_import_unknown_format(self) -> None:
+        with self.assertRaises(CommandError):
+            self.import_files(os.path.join(self.directory, "export.xlsx"))
+
+
+class ImportMeasurementsWorkersTest(TransactionTestCase):
+    def test_import_files_in_parallel(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for i, (datalogger_id, location) in enumerate(DATALOGGERS.items()):
+                path = os.path.join(directory, f"export-{i}.csv")
+                with open(path, "w", newline="") as file:
+                    writer = csv.writer(file)
+                    writer.writerow(
+                        ["datalogger", "lat", "lng", "at", "label", "value"]
+                    )
+                    writer.writerows(
+                        [
+                            datalogger_id,
+                            location["lat"],
+                            location["lng"],
+                            f"2024-01-01T{h:02}:00:00Z",
+                            "temp",
+                            "1.5",
+                        ]
+                        for h in range(24)
+                    )
+                paths.append(path)
+
+            call_command("import_measurements", *paths, workers=3, stdout=StringIO())
+
+        self.assertEqual(Measurement.objects.count(), 24 * len(DATALOGGERS))
+        self.assertEqual(Datalogger.objects.count(), len(DATALOGGERS))
@@ -1,13 +1,17 @@
 from datetime import timedelta
+from unittest import mock
 
+from django.db import connection
+from django.test import override_settings
 from django.urls import reverse
 from django.utils.timezone import now
 from rest_framework.response import Response
 from rest_framework.test import APIClient, APITestCase
 
-from api.models import Measurement
+from api.models import MEASUREMENT_RULES, Datalogger, Measurement, MeasurementRule
+from api.registry import get_datalogger_registry
 
-from .test_utils import Payload, generate_random_payload
+from .test_utils import DATALOGGERS, Payload, generate_random_payload
 
 
 class IngestEndPointTest(APITestCase):
@@ -35,6 +39,122 @@ class IngestEndPointTest(APITestCase):
                 self.assertEqual(measurement.label, expected["label"])
                 self.assertAlmostEqual(measurement.value, expected["value"], places=2)
 
+    def test_ingest_set_based_queries(self) -> None:
+        payload: Payload = generate_random_payload()
+        payload["measurements"] = [
+            {"label": "temp", "value": 12.3},
+            {"label": "hum", "value": 45.6},
+            {"label": "rain", "value": 0.4},
+        ]
+        datalogger_id = payload["datalogger"]
+        Datalogger.objects.create(id=datalogger_id, **DATALOGGERS[datalogger_id])
+
+        # savepoint, datalogger lookup, one insert for all measurements, release
+        with self.assertNumQueries(4):
+            response: Response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(
+            Measurement.objects.filter(datalogger=datalogger_id).count(), 3
+        )
+
+    def test_ingest_new_datalogger_queries(self) -> None:
+        payload: Payload = generate_random_payload()
+        datalogger_id = payload["datalogger"]
+        registry = get_datalogger_registry()
+        registry.clear()
+        self.addCleanup(registry.clear)
+
+        # savepoint, datalogger lookup, one insert creating the datalogger, release
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(4):
+                response: Response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        datalogger = Datalogger.objects.get(id=datalogger_id)
+        self.assertEqual(
+            {"lat": datalogger.lat, "lng": datalogger.lng}, DATALOGGERS[datalogger_id]
+        )
+        self.assertIsNotNone(registry.get_many([datalogger_id])[datalogger_id])
+
+    @override_settings(INGEST_COPY_THRESHOLD=1)
+    def test_ingest_copy_path(self) -> None:
+        payload: Payload = generate_random_payload()
+        response: Response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            sorted(m["label"] for m in response.data),
+            sorted(m["label"] for m in payload["measurements"]),
+        )
+        self.assertEqual(
+            Measurement.objects.filter(datalogger=payload["datalogger"]).count(),
+            len(payload["measurements"]),
+        )
+
+    def test_ingest_replay_is_deduplicated(self) -> None:
+        payload: Payload = generate_random_payload()
+        response: Response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.headers["X-Ingest-Inserted"], str(len(payload["measurements"]))
+        )
+
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Ingest-Inserted"], "0")
+        self.assertEqual(
+            response.headers["X-Ingest-Deduplicated"],
+            str(len(payload["measurements"])),
+        )
+        self.assertEqual(len(response.data), len(payload["measurements"]))
+        self.assertEqual(
+            Measurement.objects.filter(datalogger=payload["datalogger"]).count(),
+            len(payload["measurements"]),
+        )
+
+    def test_ingest_repeated_label(self) -> None:
+        payload: Payload = generate_random_payload()
+        payload["measurements"] = [
+            {"label": "temp", "value": 12.3},
+            {"label": "temp", "value": 12.3},
+        ]
+        response: Response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.headers["X-Ingest-Deduplicated"], "1")
+
+        # two values for the same label and timestamp: nothing tells which one is right
+        payload["measurements"][1]["value"] = 12.4
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("measurements", response.data)
+
+    def test_ingest_replay_after_delete(self) -> None:
+        payload: Payload = generate_random_payload()
+        with self.captureOnCommitCallbacks(execute=True):
+            response: Response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.addCleanup(get_datalogger_registry().clear)
+
+        # rows deleted by another process, no signal reaches this one
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {Measurement._meta.db_table}")
+
+        # savepoint, insert and release: the replay is written again
+        with self.assertNumQueries(3):
+            response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.headers["X-Ingest-Inserted"], str(len(payload["measurements"]))
+        )
+        self.assertEqual(
+            Measurement.objects.filter(datalogger=payload["datalogger"]).count(),
+            len(payload["measurements"]),
+        )
+
     def test_ingest_invalid_label(self) -> None:
         payload: Payload = generate_random_payload()
         payload["measurements"][0]["label"] = "invalid_label"
@@ -77,6 +197,64 @@ class IngestEndPointTest(APITestCase):
         response: Response = self.client.post(self.url, payload, format="json")
         self.assertEqual(response.status_code, 400)
 
+    def test_ingest_measurement_errors_shape(self) -> None:
+        payload: Payload = generate_random_payload()
+        payload["measurements"] = [
+            {"label": "temp", "value": 12.5},
+            {"label": "temp", "value": 60.5},
+            {"label": "hum", "value": "wet"},
+            {"label": "snow", "value": 1.0},
+            {"value": 1.0},
+            "rain",
+        ]
+        response: Response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data,
+            {
+                "measurements": [
+                    {},
+                    {"value": ["Temperature must be between -20 and 40."]},
+                    {"value": ["A valid number is required."]},
+                    {"label": ['"snow" is not a valid choice.']},
+                    {"label": ["This field is required."]},
+                    {
+                        "non_field_errors": [
+                            "Invalid data. Expected a dictionary, but got str."
+                        ]
+                    },
+                ]
+            },
+        )
+
+    def test_ingest_valid_negative_and_integer_values(self) -> None:
+        payload: Payload = generate_random_payload()
+        payload["measurements"] = [
+            {"label": "temp", "value": -12.7},
+            {"label": "hum", "value": 55},
+            {"label": "rain", "value": 1.4},
+        ]
+        response: Response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_ingest_label_added_to_rules(self) -> None:
+        wind = MeasurementRule("Wind speed", 0, 60, 0.5, "m/s")
+        payload: Payload = generate_random_payload()
+
+        with mock.patch.dict(MEASUREMENT_RULES, {"wind": wind}):
+            payload["measurements"] = [{"label": "wind", "value": 12.5}]
+            response: Response = self.client.post(self.url, payload, format="json")
+            self.assertEqual(response.status_code, 201)
+
+            payload["measurements"] = [{"label": "wind", "value": 12.3}]
+            response = self.client.post(self.url, payload, format="json")
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                response.data["measurements"][0]["value"],
+                ["Wind speed must be in steps of 0.5."],
+            )
+
     def test_ingest_invalid_datetime_format(self) -> None:
         payload: Payload = generate_random_payload()
         payload["at"] = "2021/01/02 05:46:22"  # Not ISO-8601
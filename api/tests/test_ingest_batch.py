@@ -0,0 +1,108 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import Datalogger, Measurement
+
+from .test_utils import DATALOGGERS, Payload, generate_random_payload
+
+
+class IngestBatchEndPointTest(APITestCase):
+    url: str = reverse("api_ingest_batch")
+    client: APIClient
+
+    def test_ingest_batch_valid_data(self) -> None:
+        payloads = [generate_random_payload() for _ in range(20)]
+        response: Response = self.client.post(self.url, payloads, format="json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 20)
+        self.assertEqual(response.data["rejected"], 0)
+        self.assertTrue(all(r["status"] == "created" for r in response.data["results"]))
+
+        expected_count = sum(len(p["measurements"]) for p in payloads)
+        self.assertEqual(Measurement.objects.count(), expected_count)
+
+        expected_dataloggers = {p["datalogger"] for p in payloads}
+        self.assertEqual(
+            {str(pk) for pk in Datalogger.objects.values_list("id", flat=True)},
+            expected_dataloggers,
+        )
+
+    def test_ingest_batch_partial_errors(self) -> None:
+        invalid: Payload = generate_random_payload()
+        invalid["measurements"] = [{"label": "rain", "value": 23}]
+        payloads = [generate_random_payload(), invalid, generate_random_payload()]
+
+        response: Response = self.client.post(self.url, payloads, format="json")
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["rejected"], 1)
+
+        results = response.data["results"]
+        self.assertEqual(
+            [r["status"] for r in results], ["created", "invalid", "created"]
+        )
+        self.assertIn("measurements", results[1]["errors"])
+
+        expected_count = len(payloads[0]["measurements"]) + len(
+            payloads[2]["measurements"]
+        )
+        self.assertEqual(Measurement.objects.count(), expected_count)
+
+    def test_ingest_batch_duplicates(self) -> None:
+        payload: Payload = generate_random_payload()
+        response: Response = self.client.post(
+            self.url, [payload, payload], format="json"
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [r["status"] for r in response.data["results"]], ["created", "duplicate"]
+        )
+        self.assertEqual(response.data["inserted"], len(payload["measurements"]))
+        self.assertEqual(response.data["deduplicated"], len(payload["measurements"]))
+
+        response = self.client.post(self.url, [payload], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["status"], "duplicate")
+        self.assertEqual(Measurement.objects.count(), len(payload["measurements"]))
+
+    def test_ingest_batch_all_invalid(self) -> None:
+        payload: Payload = generate_random_payload()
+        del payload["at"]
+        response: Response = self.client.post(self.url, [payload], format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["results"][0]["status"], "invalid")
+        self.assertEqual(Measurement.objects.count(), 0)
+
+    def test_ingest_batch_not_a_list(self) -> None:
+        response: Response = self.client.post(
+            self.url, generate_random_payload(), format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_ingest_batch_empty(self) -> None:
+        response: Response = self.client.post(self.url, [], format="json")
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(INGEST_BATCH_MAX_RECORDS=2)
+    def test_ingest_batch_too_large(self) -> None:
+        payloads = [generate_random_payload() for _ in range(3)]
+        response: Response = self.client.post(self.url, payloads, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_ingest_batch_bulk_queries(self) -> None:
+        for datalogger_id, location in DATALOGGERS.items():
+            Datalogger.objects.create(id=datalogger_id, **location)
+
+        payloads = [generate_random_payload() for _ in range(50)]
+
+        # savepoint, datalogger lookup, measurements insert, savepoint release
+        with self.assertNumQueries(4):
+            response: Response = self.client.post(self.url, payloads, format="json")
+
+        self.assertEqual(response.status_code, 201)
@@ -0,0 +1,141 @@
+from typing import List
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APITestCase
+
+from api.buffer import BufferFull, WriteBehindBuffer, get_ingest_buffer
+from api.ingest import Record
+from api.models import Measurement
+from api.serializers import DataRecordRequestSerializer
+
+from .test_utils import Payload, generate_random_payload
+
+
+def write_behind(**config: object) -> override_settings:
+    # intervals and sizes large enough for the worker never to flush during a test
+    return override_settings(
+        INGEST_WRITE_BEHIND={
+            "ENABLED": True,
+            "MAX_RECORDS": 100,
+            "FLUSH_RECORDS": 1_000,
+            "FLUSH_INTERVAL": 3_600,
+            "FULL_STATUS": 503,
+            **config,
+        }
+    )
+
+
+class WriteBehindBufferTest(TestCase):
+    def test_buffer_flush(self) -> None:
+        buffer = WriteBehindBuffer(max_records=10, flush_records=2, flush_interval=60)
+        payloads = [generate_random_payload() for _ in range(3)]
+
+        for payload in payloads:
+            buffer.submit([self.to_record(payload)])
+        self.assertEqual(buffer.depth, 3)
+        self.assertEqual(Measurement.objects.count(), 0)
+
+        self.assertEqual(buffer.flush(), 3)
+
+        stats = buffer.stats()
+        self.assertEqual(stats["depth"], 0)
+        self.assertEqual(stats["flushed"], 3)
+        self.assertEqual(stats["flushes"], 1)
+        self.assertEqual(
+            Measurement.objects.count(),
+            sum(len(p["measurements"]) for p in payloads),
+        )
+
+    def test_buffer_full(self) -> None:
+        buffer = WriteBehindBuffer(max_records=2, flush_records=10, flush_interval=60)
+        record = self.to_record(generate_random_payload())
+
+        buffer.submit([record, record])
+        with self.assertRaises(BufferFull):
+            buffer.submit([record])
+
+        self.assertEqual(buffer.stats()["rejected"], 1)
+        self.assertEqual(buffer.depth, 2)
+
+    def test_buffer_requeue_is_bounded(self) -> None:
+        buffer = WriteBehindBuffer(max_records=3, flush_records=10, flush_interval=60)
+        records = [self.to_record(generate_random_payload()) for _ in range(5)]
+        buffer.submit(records[:3])
+
+        def unreachable(chunk: List[Record]) -> None:
+            # records accepted while the flush is running
+            buffer.submit(records[3:])
+            raise OperationalError("connection refused")
+
+        with (
+            mock.patch("api.buffer.save_records", side_effect=unreachable),
+            self.assertLogs("api.buffer", "ERROR") as logs,
+        ):
+            self.assertEqual(buffer.flush(), 0)
+
+        self.assertEqual(buffer.depth, 3)
+        self.assertEqual(list(buffer._records), [records[0], *records[3:]])
+        self.assertEqual(buffer.stats()["failed"], 2)
+        self.assertIn("1 records requeued, 2 dropped", logs.output[0])
+
+    def to_record(self, payload: Payload) -> Record:
+        serializer = DataRecordRequestSerializer(data=payload)
+        serializer.is_valid(raise_exception=True)
+        return dict(serializer.validated_data)
+
+
+class IngestWriteBehindEndPointTest(APITestCase):
+    url: str = reverse("api_ingest_data")
+    client: APIClient
+
+    @write_behind()
+    def test_ingest_accepted_then_flushed(self) -> None:
+        payload: Payload = generate_random_payload()
+        response: Response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(response.data), len(payload["measurements"]))
+        self.assertEqual(Measurement.objects.count(), 0)
+
+        metrics = self.client.get(reverse("api_metrics")).data
+        self.assertEqual(metrics["ingest_buffer"]["depth"], 1)
+
+        buffer = get_ingest_buffer()
+        assert buffer is not None
+        buffer.flush()
+
+        self.assertEqual(
+            Measurement.objects.filter(datalogger=payload["datalogger"]).count(),
+            len(payload["measurements"]),
+        )
+
+    @write_behind(MAX_RECORDS=1, FULL_STATUS=429)
+    def test_ingest_backpressure(self) -> None:
+        response: Response = self.client.post(
+            self.url, generate_random_payload(), format="json"
+        )
+        self.assertEqual(response.status_code, 202)
+
+        response = self.client.post(self.url, generate_random_payload(), format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response.headers)
+
+    @write_behind()
+    def test_ingest_invalid_data_not_buffered(self) -> None:
+        payload: Payload = generate_random_payload()
+        payload["measurements"] = []
+        response: Response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        buffer = get_ingest_buffer()
+        assert buffer is not None
+        self.assertEqual(buffer.depth, 0)
+
+    def test_metrics_without_buffer(self) -> None:
+        response = self.client.get(reverse("api_metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data["ingest_buffer"])
@@ -0,0 +1,80 @@
+import json
+from typing import Any, Dict, List
+
+from django.http import StreamingHttpResponse
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient, APITestCase
+
+from api.models import Measurement
+
+from .test_utils import Payload, generate_random_payload
+
+
+class IngestStreamEndPointTest(APITestCase):
+    url: str = reverse("api_ingest_stream")
+    client: APIClient
+
+    def post_lines(self, lines: List[str]) -> List[Dict[str, Any]]:
+        response = self.client.post(
+            self.url, "\n".join(lines), content_type="application/x-ndjson"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+
+        body = b"".join(response.streaming_content)  # type: ignore[attr-defined]
+        return [json.loads(line) for line in body.decode().splitlines()]
+
+    @override_settings(INGEST_STREAM_CHUNK_SIZE=2)
+    def test_ingest_stream_commits_in_chunks(self) -> None:
+        payloads = [generate_random_payload() for _ in range(5)]
+        events = self.post_lines([json.dumps(p) for p in payloads])
+
+        committed = [e for e in events if e["status"] == "committed"]
+        self.assertEqual([e["records"] for e in committed], [2, 2, 1])
+        self.assertEqual([e["lines"] for e in committed], [[1, 2], [3, 4], [5, 5]])
+
+        expected_count = sum(len(p["measurements"]) for p in payloads)
+        self.assertEqual(
+            events[-1],
+            {
+                "status": "done",
+                "lines": 5,
+                "created": 5,
+                "rejected": 0,
+                "inserted": expected_count,
+                "deduplicated": 0,
+            },
+        )
+        self.assertEqual(Measurement.objects.count(), expected_count)
+
+    def test_ingest_stream_reports_invalid_lines(self) -> None:
+        invalid: Payload = generate_random_payload()
+        invalid["measurements"] = [{"label": "temp", "value": 60.5}]
+        valid: Payload = generate_random_payload()
+
+        events = self.post_lines(
+            [json.dumps(valid), "{not json", "", json.dumps(invalid)]
+        )
+
+        errors = [e for e in events if e["status"] == "invalid"]
+        self.assertEqual([e["line"] for e in errors], [2, 4])
+        self.assertIn("measurements", errors[1]["errors"])
+        self.assertEqual(events[-1]["lines"], 4)
+        self.assertEqual(events[-1]["created"], 1)
+        self.assertEqual(events[-1]["rejected"], 2)
+        self.assertEqual(Measurement.objects.count(), len(valid["measurements"]))
+
+    @override_settings(INGEST_STREAM_MAX_LINE_BYTES=64)
+    def test_ingest_stream_line_too_long(self) -> None:
+        events = self.post_lines([json.dumps(generate_random_payload())])
+
+        self.assertEqual(events[0]["status"], "invalid")
+        self.assertEqual(events[-1]["rejected"], 1)
+        self.assertEqual(Measurement.objects.count(), 0)
+
+    def test_ingest_stream_wrong_content_type(self) -> None:
+        response = self.client.post(
+            self.url, [generate_random_payload()], format="json"
+        )
+        self.assertEqual(response.status_code, 415)
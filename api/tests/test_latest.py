@@ -0,0 +1,139 @@
+from datetime import timedelta
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+
+from api.ingest import save_records
+from api.models import Datalogger
+from api.registry import get_datalogger_registry
+
+from .test_utils import (
+    DATALOGGERS,
+    START,
+    DataloggerAPITestCase,
+    make_record,
+)
+
+# two of the test dataloggers
+IDS = list(DATALOGGERS)[:2]
+
+
+class LatestEndPointTest(DataloggerAPITestCase):
+    url: str = reverse("api_latest")
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        save_records(
+            [
+                make_record(START, IDS[0], temp=10.0, hum=50.0),
+                make_record(START + timedelta(hours=2), IDS[0], temp=12.0),
+                make_record(START + timedelta(hours=1), IDS[0], rain=0.2),
+                make_record(START, IDS[1], temp=-1.0),
+            ]
+        )
+
+    def setUp(self) -> None:
+        super().setUp()
+        # a fresh store, warmed from the data of the test, for each test
+        self.enterContext(self.settings(LATEST_VALUES={**settings.LATEST_VALUES}))
+
+    def get(self, ids: List[str], **params: Any) -> Dict[str, Any]:
+        response = self.client.get(self.url, {"datalogger": ids, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_latest_values(self) -> None:
+        # warmed by the first request, with a single query
+        with self.assertNumQueries(1):
+            self.get([IDS[0]])
+
+        with self.assertNumQueries(0):
+            data = self.get(IDS)
+
+        self.assertEqual(
+            data,
+            {
+                IDS[0]: {
+                    "hum": {"at": "2026-03-01T00:00:00+0000", "value": 50.0},
+                    "rain": {"at": "2026-03-01T01:00:00+0000", "value": 0.2},
+                    "temp": {"at": "2026-03-01T02:00:00+0000", "value": 12.0},
+                },
+                IDS[1]: {
+                    "temp": {"at": "2026-03-01T00:00:00+0000", "value": -1.0},
+                },
+            },
+        )
+        self.assertEqual(
+            list(self.get(IDS, label="temp,rain")[IDS[0]]),
+            ["rain", "temp"],
+        )
+        stats = self.client.get(reverse("api_metrics")).data["latest_values"]
+        self.assertEqual((stats["size"], stats["warmed"], stats["hits"]), (2, True, 5))
+
+    def test_ingest_updates_latest_values(self) -> None:
+        self.get(IDS)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("api_ingest_data"),
+                {
+                    "datalogger": IDS[0],
+                    "location": DATALOGGERS[IDS[0]],
+                    "at": (START + timedelta(hours=3)).isoformat(),
+                    "measurements": [{"label": "temp", "value": 13.5}],
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        # a late measurement does not replace the last one
+        with self.captureOnCommitCallbacks(execute=True):
+            save_records(
+                [make_record(START - timedelta(hours=5), IDS[0], temp=0.0, hum=40.0)]
+            )
+
+        with self.assertNumQueries(0):
+            data = self.get([IDS[0]])
+        self.assertEqual(data[IDS[0]]["temp"]["value"], 13.5)
+        self.assertEqual(data[IDS[0]]["hum"]["value"], 50.0)
+
+    def test_datalogger_without_measurements(self) -> None:
+        datalogger = Datalogger.objects.create(lat=1.0, lng=2.0)
+        get_datalogger_registry().add([datalogger])
+        self.get(IDS)
+
+        # loaded on demand, then stored
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(1):
+                self.assertEqual(
+                    self.get([str(datalogger.id)]), {str(datalogger.id): {}}
+                )
+        with self.assertNumQueries(0):
+            self.get([str(datalogger.id)])
+
+    def test_expired_entries_are_reloaded(self) -> None:
+        with self.settings(LATEST_VALUES={**settings.LATEST_VALUES, "TTL": 0}):
+            self.get(IDS)
+            with self.assertNumQueries(1):
+                data = self.get(IDS)
+            self.assertEqual(data[IDS[1]]["temp"]["value"], -1.0)
+
+    @override_settings(LATEST_VALUES={**settings.LATEST_VALUES, "ENABLED": False})
+    def test_disabled_store(self) -> None:
+        with self.assertNumQueries(1):
+            data = self.get([IDS[1]])
+        self.assertEqual(list(data[IDS[1]]), ["temp"])
+        self.assertIsNone(self.client.get(reverse("api_metrics")).data["latest_values"])
+
+    @override_settings(LATEST_VALUES={**settings.LATEST_VALUES, "MAX_DATALOGGERS": 1})
+    def test_invalid_requests(self) -> None:
+        unknown = "00000000-0000-0000-0000-000000000000"
+        response = self.client.get(self.url, {"datalogger": [IDS[0], unknown]})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(self.url, {"datalogger": unknown})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data["unknown"], [unknown])
+
+        self.assertEqual(self.client.get(self.url).status_code, 400)
@@ -0,0 +1,152 @@
+from datetime import timedelta
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.ingest import save_records
+from api.models import Measurement
+
+from .test_utils import DATALOGGERS, START, DataloggerAPITestCase, make_record
+
+# two of the test dataloggers
+IDS = list(DATALOGGERS)[:2]
+
+
+def plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+class QueryPlanTest(DataloggerAPITestCase):
+    """
+    The queries of the read endpoints must reach the measurements through an index.
+    The test tables are tiny, so sequential scans are disabled: the planner then only
+    picks one when no index can serve the query.
+    """
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        save_records(
+            [
+                make_record(
+                    START + timedelta(minutes=15 * i), datalogger, temp=10.0, rain=0.2
+                )
+                for datalogger in IDS
+                for i in range(200)
+            ]
+        )
+        # the same statistics for every run, whether autovacuum went by or not
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Measurement._meta.db_table}")
+
+    def measurement_scans(
+        self, name: str, params: Dict[str, Any]
+    ) -> List[Tuple[str, Optional[str], bool]]:
+        """
+        Call an endpoint and return the scans of the measurements table in the plans
+        of its queries.
+
+        Returns:
+            (node type, index name, has an index condition) tuples.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+
+        table = Measurement._meta.db_table
+        indexes = {
+            *(index.name for index in Measurement._meta.indexes),
+            *(constraint.name for constraint in Measurement._meta.constraints),
+        }
+        scans: List[Tuple[str, Optional[str], bool]] = []
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            for query in queries.captured_queries:
+                if table not in query["sql"]:
+                    continue
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {query['sql']}")
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scans.extend(
+                    (node["Node Type"], node.get("Index Name"), "Index Cond" in node)
+                    for node in plan_nodes(plan[0]["Plan"])
+                    # bitmap index scans only name their index
+                    if node.get("Relation Name") == table
+                    or node.get("Index Name") in indexes
+                )
+            cursor.execute("RESET enable_seqscan")
+        self.assertTrue(scans, f"no query of {name} reads the measurements")
+        return scans
+
+    def assertIndexScans(self, scans: List[Tuple[str, Optional[str], bool]]) -> None:
+        # neither a sequential scan nor a full index scan
+        for node_type, index, has_condition in scans:
+            self.assertNotEqual(node_type, "Seq Scan")
+            if index is not None:
+                self.assertTrue(has_condition, f"{node_type} on {index}")
+
+    def test_raw_data_plans(self) -> None:
+        params = {
+            "datalogger": IDS[0],
+            "since": "2026-03-01T06:00:00Z",
+            "before": "2026-03-02T00:00:00Z",
+        }
+        self.assertIndexScans(self.measurement_scans("api_fetch_data_raw", params))
+        self.assertIndexScans(
+            self.measurement_scans(
+                "api_fetch_data_raw", {**params, "label": "temp", "max_points": 10}
+            )
+        )
+        self.assertIndexScans(
+            self.measurement_scans(
+                "api_fetch_data_raw_batch", {**params, "datalogger": IDS}
+            )
+        )
+
+    def test_summary_plans(self) -> None:
+        params = {
+            "datalogger": IDS[0],
+            "since": "2026-03-01T06:10:00Z",
+            "before": "2026-03-02T12:00:00Z",
+            "span": "hour",
+        }
+        self.assertIndexScans(
+            self.measurement_scans("api_fetch_data_aggregates", params)
+        )
+        self.assertIndexScans(
+            self.measurement_scans(
+                "api_fetch_data_aggregates", {**params, "agg": "p50"}
+            )
+        )
+        self.assertIndexScans(
+            self.measurement_scans(
+                "api_fetch_data_rolling",
+                {**params, "window": "PT6H", "step": "PT1H"},
+            )
+        )
+
+    def test_fleet_plans(self) -> None:
+        # range scans over all the dataloggers go through the BRIN index on 'at'
+        scans = self.measurement_scans(
+            "api_fetch_data_aggregates_fleet",
+            {
+                "since": "2026-03-01T06:10:00Z",
+                "before": "2026-03-02T12:00:00Z",
+                "span": "day",
+                "agg": "p90",
+            },
+        )
+        self.assertIndexScans(scans)
+        self.assertIn("measurement_at_brin", [index for _, index, _ in scans])
+
+    def test_latest_plans(self) -> None:
+        with self.settings(LATEST_VALUES={**settings.LATEST_VALUES, "ENABLED": False}):
+            self.assertIndexScans(
+                self.measurement_scans("api_latest", {"datalogger": IDS})
+            )
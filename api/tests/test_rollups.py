@@ -0,0 +1,272 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+import random
+from typing import Any, Dict, List
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from api.ingest import save_records
+from api.models import DailyRollup, Datalogger, HourlyRollup, Measurement, RollupDelta
+from api.rollups import fold_rollups, plan_segments, verify_rollups
+from api.tests.test_utils import (
+    DATALOGGER,
+    DATALOGGERS,
+    DataloggerAPITestCase,
+    aggregate,
+    make_record,
+)
+
+
+class RollupIngestTest(TestCase):
+    def test_ingest_updates_rollups(self) -> None:
+        at = datetime(2026, 3, 1, 10, 15, tzinfo=timezone.utc)
+        save_records([make_record(at, temp=10.0, rain=0.2), make_record(at, temp=10.0)])
+        # late measurements of the same slots, and a replayed one
+        save_records(
+            [
+                make_record(at + timedelta(minutes=30), temp=14.0, rain=0.4),
+                make_record(at - timedelta(hours=2), temp=-2.0),
+                make_record(at, temp=10.0),
+            ]
+        )
+        self.assertEqual(fold_rollups(), 5)
+
+        hourly = HourlyRollup.objects.get(
+            label="temp", slot=datetime(2026, 3, 1, 10, tzinfo=timezone.utc)
+        )
+        self.assertEqual(
+            (hourly.count, hourly.sum, hourly.min, hourly.max, hourly.sum_sq),
+            (2, 24.0, 10.0, 14.0, 296.0),
+        )
+        daily = DailyRollup.objects.get(
+            label="temp", slot=datetime(2026, 3, 1, tzinfo=timezone.utc)
+        )
+        self.assertEqual(
+            (daily.count, daily.sum, daily.min, daily.max), (3, 22.0, -2.0, 14.0)
+        )
+        self.assertEqual(HourlyRollup.objects.count(), 3)
+        self.assertEqual(
+            verify_rollups(), {"api_dailyrollup": 0, "api_hourlyrollup": 0}
+        )
+
+    @override_settings(INGEST_COPY_THRESHOLD=1)
+    def test_copy_ingest_updates_rollups(self) -> None:
+        at = datetime(2026, 3, 1, 10, 15, tzinfo=timezone.utc)
+        save_records([make_record(at, temp=10.0, hum=50.0)])
+        fold_rollups()
+
+        self.assertEqual(HourlyRollup.objects.count(), 2)
+        self.assertEqual(DailyRollup.objects.get(label="hum").sum, 50.0)
+
+    def test_ingest_queues_deltas(self) -> None:
+        at = datetime(2026, 3, 1, 10, 15, tzinfo=timezone.utc)
+        other = list(DATALOGGERS)[1]
+        save_records([make_record(at, temp=10.0), make_record(at, other, temp=10.0)])
+
+        # ingest does not touch the rollups shared with the other writers
+        self.assertFalse(HourlyRollup.objects.exists())
+        self.assertFalse(DailyRollup.objects.exists())
+        self.assertEqual(RollupDelta.objects.count(), 2)
+        self.assertEqual(
+            verify_rollups(), {"api_dailyrollup": 0, "api_hourlyrollup": 0}
+        )
+
+        self.assertEqual(fold_rollups(), 2)
+        self.assertFalse(RollupDelta.objects.exists())
+        self.assertEqual(HourlyRollup.objects.count(), 2)
+        self.assertEqual(fold_rollups(), 0)
+
+    def test_fold_after_commit(self) -> None:
+        at = datetime(2026, 3, 1, 10, 15, tzinfo=timezone.utc)
+        with self.settings(ROLLUP_FOLD_INTERVAL=0.0):
+            with self.captureOnCommitCallbacks(execute=True):
+                save_records([make_record(at, temp=10.0)])
+        self.assertFalse(RollupDelta.objects.exists())
+        self.assertEqual(HourlyRollup.objects.get().sum, 10.0)
+
+        # no other fold until the end of the interval
+        with self.settings(ROLLUP_FOLD_INTERVAL=3600.0):
+            for minutes in [10, 20]:
+                with self.captureOnCommitCallbacks(execute=True):
+                    save_records(
+                        [make_record(at + timedelta(minutes=minutes), temp=12.0)]
+                    )
+        self.assertEqual(RollupDelta.objects.count(), 2)
+        self.assertEqual(HourlyRollup.objects.get().count, 1)
+
+        with self.settings(ROLLUP_FOLD_INTERVAL=None):
+            with self.captureOnCommitCallbacks(execute=True):
+                save_records([make_record(at + timedelta(minutes=30), temp=12.0)])
+        self.assertEqual(RollupDelta.objects.count(), 3)
+
+        out = StringIO()
+        call_command("fold_rollups", stdout=out)
+        self.assertIn("3 deltas folded", out.getvalue())
+        self.assertEqual(HourlyRollup.objects.get().count, 4)
+
+    def test_rebuild_and_verify_command(self) -> None:
+        at = datetime(2026, 3, 1, 10, 15, tzinfo=timezone.utc)
+        save_records(
+            [make_record(at, temp=10.0), make_record(at + timedelta(days=1), temp=5.0)]
+        )
+        fold_rollups()
+        DailyRollup.objects.filter(label="temp").update(count=7)
+        HourlyRollup.objects.filter(slot__day=2).delete()
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_rollups", verify=True, stdout=StringIO())
+
+        out = StringIO()
+        call_command("rebuild_rollups", datalogger=DATALOGGER, stdout=out)
+        self.assertIn("api_hourlyrollup: 2 slots", out.getvalue())
+
+        call_command("rebuild_rollups", verify=True, stdout=StringIO())
+        self.assertEqual(DailyRollup.objects.filter(count=1).count(), 2)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_rollups", datalogger="nope", stdout=StringIO())
+
+
+class RollupConcurrentIngestTest(TransactionTestCase):
+    def test_concurrent_batches_of_the_same_slots(self) -> None:
+        start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        ids = list(DATALOGGERS)
+
+        def ingest(worker: int) -> None:
+            generator = random.Random(worker)
+            try:
+                # batches of shared slots, each one with its own dataloggers and hours
+                for _ in range(20):
+                    save_records(
+                        [
+                            make_record(
+                                start + timedelta(seconds=generator.randrange(10_800)),
+                                datalogger,
+                                temp=10.0,
+                                hum=50.0,
+                                rain=0.2,
+                            )
+                            for datalogger in generator.sample(ids, 2)
+                            for _ in range(4)
+                        ]
+                    )
+            finally:
+                connection.close()
+
+        # a deadlock would be raised by the map
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            list(executor.map(ingest, range(6)))
+
+        self.assertEqual(
+            verify_rollups(), {"api_dailyrollup": 0, "api_hourlyrollup": 0}
+        )
+
+
+class RollupSegmentsTest(TestCase):
+    def test_plan_segments(self) -> None:
+        def at(day: int, hour: int, minute: int = 0) -> datetime:
+            return datetime(2026, 3, day, hour, minute, tzinfo=timezone.utc)
+
+        segments = plan_segments(
+            at(1, 10, 30), at(4, 5, 17), [DailyRollup, HourlyRollup]
+        )
+        self.assertEqual(
+            segments,
+            [
+                (DailyRollup, at(2, 0), at(4, 0)),
+                (HourlyRollup, at(1, 11), at(2, 0)),
+                (None, at(1, 10, 30), at(1, 11)),
+                (HourlyRollup, at(4, 0), at(4, 5)),
+                (None, at(4, 5), at(4, 5, 17)),
+            ],
+        )
+        # nothing is read from the raw rows on slot boundaries
+        self.assertEqual(
+            plan_segments(at(1, 0), at(2, 0), [DailyRollup, HourlyRollup]),
+            [(DailyRollup, at(1, 0), at(2, 0))],
+        )
+        self.assertEqual(
+            plan_segments(None, at(1, 10, 30), [HourlyRollup]),
+            [(HourlyRollup, None, at(1, 10)), (None, at(1, 10), at(1, 10, 30))],
+        )
+
+
+class RollupSummaryTest(DataloggerAPITestCase):
+    url: str
+    datalogger: Datalogger
+    measurements: List[Measurement]
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        cls.url = reverse("api_fetch_data_aggregates")
+        call_command("populate_db", dataloggers=1, measurements=200, stdout=StringIO())
+        cls.datalogger = Datalogger.objects.get()
+        cls.measurements = list(Measurement.objects.filter(datalogger=cls.datalogger))
+
+    def test_summary_with_partial_slots(self) -> None:
+        ats = sorted(m.at for m in self.measurements)
+        ranges: List[Dict[str, Any]] = [
+            {"since": ats[20], "before": ats[150]},
+            {"since": ats[20]},
+            {"before": ats[150]},
+        ]
+        for span in ["hour", "day"]:
+            for bounds in ranges:
+                with self.subTest(span=span, bounds=bounds):
+                    since, before = bounds.get("since"), bounds.get("before")
+                    expected = aggregate(
+                        [
+                            m
+                            for m in self.measurements
+                            if (since is None or m.at >= since)
+                            and (before is None or m.at <= before)
+                        ],
+                        span,
+                    )
+                    params = {k: v.isoformat() for k, v in bounds.items()}
+                    # rollups and raw edges are read in a single query
+                    with self.assertNumQueries(1):
+                        response = self.client.get(
+                            self.url,
+                            {
+                                "datalogger": str(self.datalogger.id),
+                                "span": span,
+                                **params,
+                            },
+                        )
+
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data), len(expected))
+                    values = {
+                        (r["label"], r["time_slot"][:19]): r["value"]
+                        for r in response.data
+                    }
+                    for item in expected:
+                        self.assertAlmostEqual(
+                            values[(item["label"], item["time_slot"])],
+                            item["value"],
+                            places=6,
+                        )
+
+    def test_summary_before_and_after_fold(self) -> None:
+        params = {"datalogger": str(self.datalogger.id), "span": "day"}
+        params["agg"] = "count,min,max,avg,sum,stddev"
+        queued = self.client.get(self.url, params)
+        self.assertTrue(RollupDelta.objects.exists())
+
+        fold_rollups()
+        folded = self.client.get(self.url, params)
+
+        self.assertFalse(RollupDelta.objects.exists())
+        self.assertEqual(len(queued.data), len(folded.data))
+        for before, after in zip(queued.data, folded.data):
+            self.assertEqual(before.keys(), after.keys())
+            for name, value in before.items():
+                if isinstance(value, float):
+                    self.assertAlmostEqual(value, after[name], places=9)
+                else:
+                    self.assertEqual(value, after[name])
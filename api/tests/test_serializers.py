@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Datalogger, Measurement
+from api.serializers import DataRecordResponseSerializer, MeasurementRowSerializer
+
+
+class MeasurementRowSerializerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls) -> None:
+        datalogger = Datalogger.objects.create(lat=47.5, lng=1.5)
+        start = timezone.now().replace(microsecond=123456)
+        Measurement.objects.bulk_create(
+            Measurement(
+                datalogger=datalogger,
+                label=label,
+                at=start + timedelta(minutes=i),
+                value=value,
+            )
+            for i in range(20)
+            for label, value in [("temp", -3.5 + i), ("hum", 50.0), ("rain", 0.2)]
+        )
+
+    def assert_same_output(self) -> None:
+        queryset = Measurement.objects.order_by("at", "id")
+        renderer = JSONRenderer()
+
+        expected = renderer.render(
+            DataRecordResponseSerializer(queryset, many=True).data
+        )
+        serializer = MeasurementRowSerializer()
+        rows = queryset.values_list(*serializer.columns)
+        output = renderer.render(list(serializer.serialize(rows)))
+
+        self.assertEqual(output, expected)
+
+    def test_same_output_as_model_serializer(self) -> None:
+        self.assert_same_output()
+
+    def test_same_output_in_another_timezone(self) -> None:
+        with timezone.override("Europe/Paris"):
+            self.assert_same_output()
+
+    def test_same_output_with_other_datetime_formats(self) -> None:
+        for datetime_format in ["iso-8601", "%d/%m/%Y %H:%M", None]:
+            with self.subTest(datetime_format=datetime_format):
+                with override_settings(
+                    REST_FRAMEWORK={"DATETIME_FORMAT": datetime_format}
+                ):
+                    self.assert_same_output()
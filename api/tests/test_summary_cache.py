@@ -0,0 +1,173 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.response import Response
+
+from api.ingest import save_records
+from api.summary_cache import SummaryCache
+
+from .test_utils import DATALOGGER, START, DataloggerAPITestCase, make_record
+
+
+class SummaryCacheTest(DataloggerAPITestCase):
+    url: str = reverse("api_fetch_data_aggregates")
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        save_records(
+            [make_record(START + timedelta(hours=h), temp=10.0) for h in range(48)]
+        )
+
+    def setUp(self) -> None:
+        super().setUp()
+        # a fresh SummaryCache, with its own counters, for each test
+        self.enterContext(self.settings(SUMMARY_CACHE={**settings.SUMMARY_CACHE}))
+
+    def get(self, params: Dict[str, Any]) -> Response:
+        response = self.client.get(self.url, {"datalogger": DATALOGGER, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def warm(self, params: Dict[str, Any]) -> None:
+        # the first summary of a datalogger starts its write log, the next one is cached
+        self.get(params)
+        self.get(params)
+
+    def write(self, at: datetime, temp: float) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            save_records([make_record(at, temp=temp)])
+
+    def stats(self) -> Dict[str, Any]:
+        return self.client.get(reverse("api_metrics")).data["summary_cache"]
+
+    def test_cached_summary_skips_database(self) -> None:
+        params = {"span": "day"}
+        self.warm(params)
+
+        with self.assertNumQueries(0):
+            response = self.get(params)
+
+        self.assertEqual(
+            [(r["time_slot"][:10], r["value"]) for r in response.data],
+            [("2026-03-01", 10.0), ("2026-03-02", 10.0)],
+        )
+        self.assertEqual(
+            self.stats(), {"hits": 1, "misses": 2, "invalidations": 0, "oversized": 0}
+        )
+
+    def test_equivalent_queries_share_entry(self) -> None:
+        self.warm({"span": "day", "agg": "min,max", "since": "2026-03-01T00:00:00Z"})
+
+        # statistics in another order, the same instant in another offset
+        with self.assertNumQueries(0):
+            self.get(
+                {"span": "day", "agg": "max,min", "since": "2026-03-01T02:00:00+02:00"}
+            )
+        # a columnar summary is another entry
+        with self.assertNumQueries(1):
+            self.client.get(
+                self.url,
+                {"datalogger": DATALOGGER, "span": "day", "agg": "min,max"},
+                HTTP_ACCEPT="application/vnd.weenat.columnar+json",
+            )
+
+    def test_overlapping_write_invalidates_entry(self) -> None:
+        params = {
+            "span": "day",
+            "since": "2026-03-01T00:00:00Z",
+            "before": "2026-03-01T23:59:59Z",
+        }
+        self.warm(params)
+
+        # after the range: the entry is still valid
+        self.write(START + timedelta(days=3), 50.0)
+        with self.assertNumQueries(0):
+            self.get(params)
+
+        self.write(START + timedelta(minutes=30), 34.0)
+        with self.assertNumQueries(1):
+            response = self.get(params)
+
+        self.assertEqual(response.data[0]["value"], (24 * 10.0 + 34.0) / 25)
+        self.assertEqual(self.stats()["invalidations"], 1)
+
+    def test_unbounded_range_is_invalidated_by_any_write(self) -> None:
+        params = {"span": "day", "since": "2026-03-02T00:00:00Z"}
+        self.warm(params)
+
+        self.write(START + timedelta(days=30), 50.0)
+        with self.assertNumQueries(1):
+            response = self.get(params)
+
+        self.assertEqual(response.data[-1]["time_slot"][:10], "2026-03-31")
+
+    def test_interleaved_writers_are_all_logged(self) -> None:
+        summary_cache = SummaryCache("summary", max_entry_bytes=1024, max_writes=10)
+        self.assertIsNone(summary_cache.generation(DATALOGGER))
+        generation = summary_cache.generation(DATALOGGER)
+        day = timedelta(days=1)
+        for i in range(3):
+            summary_cache.set(
+                DATALOGGER,
+                f"day{i}",
+                generation,
+                START + i * day,
+                START + (i + 1) * day,
+                i,
+            )
+
+        cache = caches["summary"]
+        incr = cache.incr
+        interleaved: List[bool] = []
+
+        def incr_then_interleave(key: str) -> int:
+            number = incr(key)
+            # the second writer logs its write between the two steps of the first
+            if not interleaved:
+                interleaved.append(True)
+                summary_cache.record_writes({DATALOGGER: (START + day, START + day)})
+            return number
+
+        with mock.patch.object(cache, "incr", side_effect=incr_then_interleave):
+            summary_cache.record_writes({DATALOGGER: (START, START)})
+
+        self.assertIsNone(summary_cache.get(DATALOGGER, "day0"))
+        self.assertIsNone(summary_cache.get(DATALOGGER, "day1"))
+        self.assertEqual(summary_cache.get(DATALOGGER, "day2"), 2)
+
+    def test_counters_of_concurrent_lookups(self) -> None:
+        summary_cache = SummaryCache("summary", max_entry_bytes=1024, max_writes=10)
+
+        def lookups(thread: int) -> None:
+            for i in range(500):
+                summary_cache.get(DATALOGGER, f"missing{thread}:{i}")
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lookups, range(8)))
+
+        self.assertEqual(summary_cache.stats()["misses"], 4000)
+
+    def test_oversized_summary_is_not_cached(self) -> None:
+        params = {"span": "hour"}
+        with self.settings(
+            SUMMARY_CACHE={**settings.SUMMARY_CACHE, "MAX_ENTRY_BYTES": 1024}
+        ):
+            self.warm(params)
+            with self.assertNumQueries(1):
+                self.get(params)
+            self.assertEqual(self.stats()["oversized"], 3)
+
+    @override_settings(SUMMARY_CACHE={**settings.SUMMARY_CACHE, "ENABLED": False})
+    def test_disabled_cache(self) -> None:
+        params = {"span": "day"}
+        self.warm(params)
+
+        with self.assertNumQueries(1):
+            self.get(params)
+        self.assertIsNone(self.stats())
@@ -1,13 +1,17 @@
 from collections import defaultdict
 import copy
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import json
 import random
 from typing import Any, Callable, DefaultDict, Dict, List, Tuple
 
+from django.core.cache import caches
 from django.utils.timezone import make_naive, now
+from rest_framework.test import APITestCase
 
-from api.models import Measurement
+from api.ingest import Record
+from api.models import Datalogger, Measurement
+from api.registry import get_datalogger_registry
 
 LABELS: List[str] = ["temp", "hum", "rain"]
 
@@ -25,6 +29,47 @@ DATALOGGERS: Dict[str, Dict[str, float]] = {
 }
 
 
+# the datalogger and start time of the tests writing their own measurements
+DATALOGGER: str = next(iter(DATALOGGERS))
+START: datetime = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def make_record(
+    at: datetime, datalogger: str = DATALOGGER, /, **values: float
+) -> Record:
+    """
+    Build a validated data record of one of the DATALOGGERS, at its location.
+
+    Args:
+        at: Timestamp of the record.
+        datalogger: Id of the datalogger, one of DATALOGGERS.
+        **values: Value of each measurement label.
+
+    Returns:
+        A record for save_records.
+    """
+    return {
+        "datalogger": datalogger,
+        "location": DATALOGGERS[datalogger],
+        "at": at,
+        "measurements": [{"label": k, "value": v} for k, v in values.items()],
+    }
+
+
+class DataloggerAPITestCase(APITestCase):
+    """
+    Each test starts with the dataloggers of the database in the registry and an
+    empty summary cache, so that query counts do not depend on the previous tests.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        caches["summary"].clear()
+        registry = get_datalogger_registry()
+        registry.add(Datalogger.objects.all())
+        self.addCleanup(registry.clear)
+
+
 def print_json(data: Any) -> None:
     print(json.dumps(data, indent=2, ensure_ascii=False))
 
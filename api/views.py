@@ -1,31 +1,82 @@
-from typing import Any
+from datetime import tzinfo
+import json
+import math
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 from uuid import UUID
 
-from django.db.models import Avg, QuerySet, Sum
-from django.db.models.functions import TruncDay, TruncHour
-from django.db.models.functions.datetime import TruncBase
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.utils.timezone import get_current_timezone, override
 from rest_framework import status
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, UnsupportedMediaType, ValidationError
 from rest_framework.generics import ListAPIView
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
-from .models import Datalogger, Measurement
+from .buffer import (
+    BufferFull,
+    WriteBehindBuffer,
+    get_ingest_buffer,
+    ingest_buffer_stats,
+)
+from .downsampling import downsample
+from .filling import fill_summary
+from .ingest import Record, save_records
+from .latest import get_latest_values, latest_store_stats
+from .models import MEASUREMENT_RULES, Datalogger, Measurement
+from .pagination import KeysetPagination
+from .registry import datalogger_registry_stats, get_datalogger, get_dataloggers
+from .renderers import (
+    DATA_RENDERERS,
+    ColumnarJSONRenderer,
+    CSVRenderer,
+    NDJSONRenderer,
+    iter_csv,
+    iter_json_array,
+    iter_ndjson,
+    to_columnar,
+)
+from .rolling import rolling_statistics
+from .rollups import SlotAggregate, summarize, summarize_dataloggers
 from .serializers import (
     DataQueryParamsSerializer,
     DataRecordAggregateResponseSerializer,
     DataRecordRequestSerializer,
     DataRecordResponseSerializer,
+    FleetSummaryQueryParamsSerializer,
+    LatestQueryParamsSerializer,
+    MeasurementRowSerializer,
+    MultiDataQueryParamsSerializer,
+    RollingQueryParamsSerializer,
+    RollingRecordResponseSerializer,
     SummaryQueryParamsSerializer,
+    datetime_formatter,
 )
+from .summary_cache import get_summary_cache, summary_cache_stats
+
+
+def slot_values(
+    aggregate: SlotAggregate, statistics: Sequence[str]
+) -> List[Optional[float]]:
+    """
+    Values output for a summary slot: the statistics asked for, or the value
+    aggregated according to the rule of the label.
+    """
+    if statistics:
+        return [aggregate.statistic(name) for name in statistics]
+    return [aggregate.statistic(MEASUREMENT_RULES[aggregate.label].aggregate)]
 
 
 def get_datalogger_or_404(datalogger_id: UUID) -> Datalogger:
-    try:
-        return Datalogger.objects.get(id=datalogger_id)
-    except Datalogger.DoesNotExist as err:
-        raise NotFound(detail=f"Datalogger with id {datalogger_id} not found.") from err
+    datalogger = get_datalogger(str(datalogger_id))
+    if datalogger is None:
+        raise NotFound(detail=f"Datalogger with id {datalogger_id} not found.")
+    return datalogger
 
 
 class IngestDataView(APIView):
@@ -34,6 +85,10 @@ class IngestDataView(APIView):
 
     Accepts a payload validated by DataRecordRequestSerializer and saves
     the related measurements.
+
+    When settings.INGEST_WRITE_BEHIND is enabled, the record is only queued in the
+    write-behind buffer and acknowledged with a 202, the measurements are written
+    asynchronously by the buffer worker.
     """
 
     def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
@@ -44,12 +99,238 @@ class IngestDataView(APIView):
                 request_serializer.errors, status=status.HTTP_400_BAD_REQUEST
             )
 
+        buffer = get_ingest_buffer()
+        if buffer is not None:
+            return self.enqueue(buffer, request_serializer.validated_data)
+
         result = request_serializer.save()
 
         response_serializer = DataRecordResponseSerializer(
             result["measurements"], many=True
         )
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        # a replay of measurements already stored is acknowledged without creating anything
+        return Response(
+            response_serializer.data,
+            status=status.HTTP_201_CREATED
+            if result["inserted"]
+            else status.HTTP_200_OK,
+            headers={
+                "X-Ingest-Inserted": str(result["inserted"]),
+                "X-Ingest-Deduplicated": str(result["deduplicated"]),
+            },
+        )
+
+    def enqueue(self, buffer: WriteBehindBuffer, record: Record) -> Response:
+        try:
+            buffer.submit([record])
+        except BufferFull as err:
+            return Response(
+                {"detail": str(err)},
+                status=settings.INGEST_WRITE_BEHIND["FULL_STATUS"],
+                headers={"Retry-After": str(math.ceil(buffer.flush_interval))},
+            )
+
+        measurements = [
+            {"label": m["label"], "at": record["at"], "value": m["value"]}
+            for m in record["measurements"]
+        ]
+        response_serializer = DataRecordResponseSerializer(measurements, many=True)
+        return Response(response_serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class IngestBatchDataView(APIView):
+    """
+    This view implements the POST /api/ingest/batch endpoint to ingest many data records at once.
+
+    Accepts a list of payloads, each validated by DataRecordRequestSerializer. Valid records
+    are saved together with bulk inserts, invalid ones are reported without rejecting the batch.
+    """
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {"detail": "Expected a non-empty list of data records."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        max_records = settings.INGEST_BATCH_MAX_RECORDS
+        if len(request.data) > max_records:
+            return Response(
+                {"detail": f"A batch cannot contain more than {max_records} records."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results: List[Optional[Dict[str, Any]]] = []
+        valid_records: List[Dict[str, Any]] = []
+        valid_indexes: List[int] = []
+
+        for index, item in enumerate(request.data):
+            request_serializer = DataRecordRequestSerializer(data=item)
+            if request_serializer.is_valid():
+                valid_records.append(request_serializer.validated_data)
+                valid_indexes.append(index)
+                results.append(None)
+            else:
+                results.append(
+                    {
+                        "index": index,
+                        "status": "invalid",
+                        "errors": request_serializer.errors,
+                    }
+                )
+
+        saved = save_records(valid_records)
+        for index, measurements, inserted in zip(
+            valid_indexes, saved.measurements, saved.inserted_per_record, strict=True
+        ):
+            results[index] = {
+                "index": index,
+                "status": "created" if inserted else "duplicate",
+                "measurements": len(measurements),
+                "inserted": inserted,
+            }
+
+        if not valid_records:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif len(valid_records) < len(results):
+            response_status = status.HTTP_207_MULTI_STATUS
+        elif saved.inserted:
+            response_status = status.HTTP_201_CREATED
+        else:
+            response_status = status.HTTP_200_OK
+
+        return Response(
+            {
+                "created": len(valid_records),
+                "rejected": len(results) - len(valid_records),
+                "inserted": saved.inserted,
+                "deduplicated": saved.deduplicated,
+                "results": results,
+            },
+            status=response_status,
+        )
+
+
+class IngestStreamDataView(APIView):
+    """
+    This view implements the POST /api/ingest/stream endpoint to ingest an NDJSON body,
+    one data record per line, typically to backfill dataloggers that were offline.
+
+    The body is read incrementally and valid records are committed in chunks of
+    settings.INGEST_STREAM_CHUNK_SIZE, so memory use does not depend on the upload size.
+    The response is an NDJSON report streamed as the body is processed: one line per
+    rejected record, one line per committed chunk and a final summary line.
+    """
+
+    media_types = ["application/x-ndjson", "application/ndjson"]
+
+    def post(
+        self, request: Request, *args: Any, **kwargs: Any
+    ) -> StreamingHttpResponse:
+        if request.content_type.split(";")[0].strip() not in self.media_types:
+            raise UnsupportedMediaType(request.content_type)
+
+        report = (
+            json.dumps(event, cls=JSONEncoder) + "\n"
+            for event in self.ingest_lines(self.read_lines(request))
+        )
+        return StreamingHttpResponse(report, content_type="application/x-ndjson")
+
+    def read_lines(self, request: Request) -> Iterator[Optional[bytes]]:
+        """
+        Read the request body line by line. Lines longer than
+        settings.INGEST_STREAM_MAX_LINE_BYTES are skipped and yielded as None.
+        """
+        stream = request.stream
+        if stream is None:
+            return
+
+        max_bytes = settings.INGEST_STREAM_MAX_LINE_BYTES
+        while line := stream.readline(max_bytes + 1):
+            if len(line) <= max_bytes or line.endswith(b"\n"):
+                yield line
+                continue
+            # drop the rest of the oversized line
+            while (line := stream.readline(max_bytes)) and not line.endswith(b"\n"):
+                pass
+            yield None
+
+    def ingest_lines(
+        self, lines: Iterator[Optional[bytes]]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Validate each line with DataRecordRequestSerializer and save the valid
+        records chunk by chunk, yielding the report events.
+        """
+        chunk_size = settings.INGEST_STREAM_CHUNK_SIZE
+        chunk: List[Record] = []
+        first_line = 1
+        total_lines = created = rejected = inserted = deduplicated = 0
+
+        def commit(last_line: int) -> Dict[str, Any]:
+            nonlocal created, rejected, inserted, deduplicated
+            try:
+                result = save_records(chunk)
+            except DatabaseError as err:
+                rejected += len(chunk)
+                return {
+                    "lines": [first_line, last_line],
+                    "status": "failed",
+                    "records": len(chunk),
+                    "errors": str(err),
+                }
+            created += len(chunk)
+            inserted += result.inserted
+            deduplicated += result.deduplicated
+            return {
+                "lines": [first_line, last_line],
+                "status": "committed",
+                "records": len(chunk),
+                "inserted": result.inserted,
+                "deduplicated": result.deduplicated,
+            }
+
+        for number, line in enumerate(lines, start=1):
+            total_lines = number
+            if line is not None and not line.strip():
+                continue
+
+            errors: Any = None
+            if line is None:
+                errors = {"non_field_errors": ["Line is too long."]}
+            else:
+                try:
+                    request_serializer = DataRecordRequestSerializer(
+                        data=json.loads(line)
+                    )
+                except ValueError:
+                    errors = {"non_field_errors": ["Line is not valid JSON."]}
+                else:
+                    if request_serializer.is_valid():
+                        chunk.append(request_serializer.validated_data)
+                    else:
+                        errors = request_serializer.errors
+
+            if errors is not None:
+                rejected += 1
+                yield {"line": number, "status": "invalid", "errors": errors}
+
+            if len(chunk) >= chunk_size:
+                yield commit(number)
+                chunk = []
+                first_line = number + 1
+
+        if chunk:
+            yield commit(total_lines)
+
+        yield {
+            "status": "done",
+            "lines": total_lines,
+            "created": created,
+            "rejected": rejected,
+            "inserted": inserted,
+            "deduplicated": deduplicated,
+        }
 
 
 # we use ListAPIView because we use directly the model - we can use django_filters
@@ -57,18 +338,38 @@ class IngestDataView(APIView):
 class FetchRawDataView(ListAPIView):
     """
     This view implements the GET /api/data endpoint to fetch raw measurements filtered by query parameters.
+
+    Measurements are ordered by time and paginated with a cursor, see KeysetPagination.
+    With 'stream=true', all the matching measurements are streamed in one response
+    instead, as a JSON array or as NDJSON (Accept: application/x-ndjson or
+    format=ndjson) or CSV, read from the database through a server-side cursor.
+
+    Besides JSON, pages can be negotiated as NDJSON, CSV or in the columnar layout
+    of to_columnar (Accept header or 'format' parameter).
+
+    'label' keeps only some measurement labels and 'fields' some output fields, both
+    applied in SQL. The columnar layout always has the timestamps and values.
+
+    With 'max_points', each label is downsampled in the database to at most that many
+    rows (see downsample) and returned in one response, without pages.
     """
 
     serializer_class = DataRecordResponseSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = DATA_RENDERERS
 
-    def get_queryset(self) -> QuerySet[Measurement]:
-        serializer = DataQueryParamsSerializer(data=self.request.query_params)
-        serializer.is_valid(raise_exception=True)
-        params = serializer.validated_data
+    _params: Optional[Dict[str, Any]] = None
 
-        datalogger_id = params["datalogger"]
-        if not Datalogger.objects.filter(id=datalogger_id).exists():
-            raise NotFound(detail=f"Datalogger with id {datalogger_id} not found.")
+    def get_params(self) -> Dict[str, Any]:
+        # validated once per request, by list or by get_queryset
+        if self._params is None:
+            serializer = DataQueryParamsSerializer(data=self.request.query_params)
+            serializer.is_valid(raise_exception=True)
+            self._params = serializer.validated_data
+        return self._params
+
+    def get_queryset(self) -> QuerySet[Measurement]:
+        params = self.get_params()
 
         datalogger = get_datalogger_or_404(params["datalogger"])
         queryset = Measurement.objects.filter(datalogger=datalogger)
@@ -77,66 +378,434 @@ class FetchRawDataView(ListAPIView):
             queryset = queryset.filter(at__gte=params["since"])
         if "before" in params:
             queryset = queryset.filter(at__lte=params["before"])
+        if "label" in params:
+            queryset = queryset.filter(label__in=params["label"])
 
         return queryset
 
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Any:
+        params = self.get_params()
+        columnar = isinstance(request.accepted_renderer, ColumnarJSONRenderer)
+        serializer = MeasurementRowSerializer(
+            None if columnar else params.get("fields")
+        )
+
+        if params["stream"]:
+            if columnar:
+                raise ValidationError(
+                    {"stream": "The columnar format cannot be streamed, use pages."}
+                )
+            if "max_points" in params:
+                raise ValidationError(
+                    {"stream": "Downsampled series are not streamed."}
+                )
+            return self.stream(request, serializer)
+
+        if "max_points" in params:
+            points = downsample(
+                self.get_queryset(), serializer.columns, params["max_points"]
+            )
+            if columnar:
+                return Response(to_columnar(points))
+            return Response(list(serializer.serialize(points)))
+
+        # rows are read as tuples, no model instance is created on the read path;
+        # the pagination also needs the position of the rows
+        position = [c for c in ("at", "id") if c not in serializer.columns]
+        rows = self.paginate_queryset(
+            self.get_queryset().values_list(*serializer.columns, *position, named=True)
+        )
+        if columnar:
+            data: Any = to_columnar(rows or [])
+        else:
+            data = list(serializer.serialize(rows or []))
+        return self.get_paginated_response(data)
+
+    def stream(
+        self, request: Request, serializer: MeasurementRowSerializer
+    ) -> StreamingHttpResponse:
+        queryset = (
+            self.get_queryset().values_list(*serializer.columns).order_by("at", "id")
+        )
+        chunk_size = settings.RAW_DATA_STREAM_CHUNK_SIZE
+        # rows are fetched chunk by chunk from a server-side cursor while the body is sent
+        rows = serializer.serialize(queryset.iterator(chunk_size=chunk_size))
+
+        renderer = request.accepted_renderer
+        if isinstance(renderer, NDJSONRenderer):
+            body = iter_ndjson(rows, chunk_size)
+        elif isinstance(renderer, CSVRenderer):
+            body = iter_csv(rows, chunk_size)
+        else:
+            return StreamingHttpResponse(
+                iter_json_array(rows, chunk_size), content_type="application/json"
+            )
+        return StreamingHttpResponse(body, content_type=renderer.media_type)
+
+
+class FetchMultiRawDataView(APIView):
+    """
+    This view implements the GET /api/data/batch endpoint to fetch the raw measurements
+    of several dataloggers at once, with the filters of /api/data.
+
+    Measurements are read with a single query and grouped per datalogger in the order
+    of the request: {datalogger id: [measurements]}. Pages are cut like /api/data
+    (KeysetPagination, ordered by time across all the dataloggers). The response is
+    a 404 listing the unknown ids if any.
+    """
+
+    renderer_classes = [JSONRenderer, BrowsableAPIRenderer, ColumnarJSONRenderer]
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        params_serializer = MultiDataQueryParamsSerializer(data=request.query_params)
+        params_serializer.is_valid(raise_exception=True)
+        params = params_serializer.validated_data
+
+        ids = [str(pk) for pk in params["datalogger"]]
+        dataloggers = get_dataloggers(ids)
+        unknown = [pk for pk in ids if dataloggers[pk] is None]
+        if unknown:
+            raise NotFound(
+                {"detail": "Some dataloggers were not found.", "unknown": unknown}
+            )
+
+        queryset = Measurement.objects.filter(datalogger__in=ids)
+        if "since" in params:
+            queryset = queryset.filter(at__gte=params["since"])
+        if "before" in params:
+            queryset = queryset.filter(at__lte=params["before"])
+        if "label" in params:
+            queryset = queryset.filter(label__in=params["label"])
+
+        columnar = isinstance(request.accepted_renderer, ColumnarJSONRenderer)
+        serializer = MeasurementRowSerializer(
+            None if columnar else params.get("fields")
+        )
+        position = [c for c in ("at", "id") if c not in serializer.columns]
+        paginator = KeysetPagination()
+        rows = paginator.paginate_queryset(
+            queryset.values_list(
+                *serializer.columns, *position, "datalogger_id", named=True
+            ),
+            request,
+            view=self,
+        )
+
+        groups: Dict[str, List[Any]] = {pk: [] for pk in ids}
+        for row in rows:
+            groups[str(row.datalogger_id)].append(row)
+
+        if columnar:
+            return paginator.get_paginated_response(
+                {pk: to_columnar(group) for pk, group in groups.items()}
+            )
+        return paginator.get_paginated_response(
+            {pk: list(serializer.serialize(group)) for pk, group in groups.items()}
+        )
+
+
+class RollingDataView(APIView):
+    """
+    This view implements the GET /api/data/rolling endpoint computing moving
+    statistics of the measurements of a datalogger ('PT24H' cumulative rain, 'P7D'
+    mean temperature, ...).
+
+    Takes the filters of /api/data ('since' and 'before' being required), a 'window'
+    and a 'step': every step between 'since' and 'before' (aligned on a Monday at
+    midnight in the current time zone), each label gets the statistics of its
+    measurements of the window ending there, computed in the database by window
+    functions over buckets of measurements (see rolling_statistics). Returns the
+    aggregate of the rule of each label, or the statistics listed in 'agg' (count,
+    min, max, avg, sum, stddev).
+    """
+
+    renderer_classes = DATA_RENDERERS
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        serializer = RollingQueryParamsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        datalogger = get_datalogger_or_404(params["datalogger"])
+        statistics = params.get("agg", [])
+        rows = rolling_statistics(
+            datalogger,
+            params["window"],
+            params["step"],
+            params["since"],
+            params["before"],
+            get_current_timezone(),
+            statistics,
+            params.get("label"),
+        )
+        columns = statistics or ["value"]
+
+        if isinstance(request.accepted_renderer, ColumnarJSONRenderer):
+            return Response(to_columnar(rows, columns))
+        response_serializer = RollingRecordResponseSerializer(
+            [
+                {"label": label, "at": at, **dict(zip(columns, values))}
+                for label, at, *values in rows
+            ],
+            many=True,
+        )
+        return Response(response_serializer.data)
+
 
 # custom view - we need to create our own filter and to serialize query params
 class SummaryView(APIView):
     """
     This view implements the GET /api/summary endpoint to summarize measurement data over a time span.
 
-    Supports optional filtering via 'since', 'before', and aggregation by 'span' ("hour" or "day").
-    Aggregates using average for all labels except "rain", which is summed.
+    Supports optional filtering via 'since', 'before', and aggregation by 'span': a
+    truncation ("minute", "hour", "day", "week", "month"), "15min" or an ISO 8601
+    duration ("PT5M", "P2D"), in the time zone 'tz'.
+    Aggregates with the aggregate of the rule of each label: average for all labels
+    except "rain", which is summed, or with the statistics listed in 'agg' (count,
+    min, max, avg, sum, stddev, p50, p90) computed by the same query. Slots are ordered
+    by label and time, and read from the hourly and daily rollups (see summarize) in a
+    single query. With 'fill', every slot between 'since' and 'before' is returned,
+    empty ones being filled by the database (see fill_summary). Summaries are cached
+    until a write overlaps their range, see SummaryCache.
+    Like /api/data, the result can be negotiated as NDJSON, CSV or columnar JSON.
     """
 
+    renderer_classes = DATA_RENDERERS
+
     def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
         serializer = SummaryQueryParamsSerializer(data=request.query_params)
         serializer.is_valid(raise_exception=True)
         params = serializer.validated_data
 
         datalogger = get_datalogger_or_404(params["datalogger"])
+        tz = params.get("tz", get_current_timezone())
+
+        summary_cache = get_summary_cache() if "span" in params else None
+        if summary_cache is None:
+            # datetimes are output in the requested time zone
+            with override(tz):
+                return self.summarize(request, datalogger, params, tz)
+
+        pk = str(datalogger.id)
+        columnar = isinstance(request.accepted_renderer, ColumnarJSONRenderer)
+        key = summary_cache.key(pk, params, tz, columnar)
+        data = summary_cache.get(pk, key)
+        if data is not None:
+            return Response(data)
+
+        generation = summary_cache.generation(pk)
+        with override(tz):
+            response = self.summarize(request, datalogger, params, tz)
+        summary_cache.set(
+            pk,
+            key,
+            generation,
+            params.get("since"),
+            params.get("before"),
+            response.data,
+        )
+        return response
 
-        measurements = Measurement.objects.filter(datalogger=datalogger)
-
-        if "since" in params:
-            measurements = measurements.filter(at__gte=params["since"])
-        if "before" in params:
-            measurements = measurements.filter(at__lte=params["before"])
+    def summarize(
+        self,
+        request: Request,
+        datalogger: Datalogger,
+        params: Dict[str, Any],
+        tz: tzinfo,
+    ) -> Response:
+        columnar = isinstance(request.accepted_renderer, ColumnarJSONRenderer)
 
         span = params.get("span")
-
         if not span:
-            data_serializer = DataRecordResponseSerializer(measurements, many=True)
-            return Response(data_serializer.data)
+            measurements = Measurement.objects.filter(datalogger=datalogger)
+            if "since" in params:
+                measurements = measurements.filter(at__gte=params["since"])
+            if "before" in params:
+                measurements = measurements.filter(at__lte=params["before"])
+
+            row_serializer = MeasurementRowSerializer()
+            rows = measurements.values_list(*row_serializer.columns)
+            if columnar:
+                return Response(to_columnar(rows))
+            return Response(list(row_serializer.serialize(rows)))
+
+        # slots are computed in SQL, full slots are read from the rollups when they
+        # match them, raw rows only at the edges of the range
+        statistics = params.get("agg", [])
+        columns = statistics or ["value"]
+        records: List[Tuple[Any, ...]]
+        if "fill" in params:
+            # the dense series is generated and filled by the database
+            records = fill_summary(
+                str(datalogger.id),
+                span,
+                params["since"],
+                params["before"],
+                tz,
+                statistics,
+                params["fill"],
+            )
+        else:
+            records = [
+                (aggregate.label, aggregate.slot, *slot_values(aggregate, statistics))
+                for aggregate in summarize(
+                    datalogger,
+                    span,
+                    params.get("since"),
+                    params.get("before"),
+                    tz,
+                    statistics,
+                )
+            ]
+
+        if columnar:
+            return Response(to_columnar(records, columns))
+
+        response_serializer = DataRecordAggregateResponseSerializer(
+            [
+                {"label": label, "time_slot": slot, **dict(zip(columns, values))}
+                for label, slot, *values in records
+            ],
+            many=True,
+        )
+        return Response(response_serializer.data)
 
-        if span not in ["day", "hour"]:
-            return Response({"detail": "Invalid span value."}, status=400)
 
-        trunc_func: TruncBase = TruncDay("at") if span == "day" else TruncHour("at")
+class FleetSummaryView(APIView):
+    """
+    This view implements the GET /api/summary/fleet endpoint to summarize the
+    measurements of several dataloggers, or of the whole fleet, in a single grouped
+    query.
+
+    Takes the parameters of /api/summary, with a required 'span', a list of
+    'datalogger' ids (all the dataloggers when missing) and optional 'label' filter.
+    Each slot aggregates the measurements of all the dataloggers, with the same
+    statistics and rollups as /api/summary, or of each datalogger with
+    'group_by=datalogger'. The response is a 404 listing the unknown ids if any.
+    """
 
-        aggregation = []
-        labels = measurements.values_list("label", flat=True).distinct()
+    renderer_classes = DATA_RENDERERS
 
-        for label in labels:
-            subset = measurements.filter(label=label)
-            annotated = subset.annotate(time_slot=trunc_func).values("time_slot")
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        serializer = FleetSummaryQueryParamsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
 
-            if label == "rain":
-                aggregated_data = annotated.annotate(value=Sum("value"))
-            else:
-                aggregated_data = annotated.annotate(value=Avg("value"))
+        ids: Optional[List[str]] = None
+        if "datalogger" in params:
+            ids = [str(pk) for pk in params["datalogger"]]
+            dataloggers = get_dataloggers(ids)
+            unknown = [pk for pk in ids if dataloggers[pk] is None]
+            if unknown:
+                raise NotFound(
+                    {"detail": "Some dataloggers were not found.", "unknown": unknown}
+                )
 
-            for item in aggregated_data:
-                aggregation.append(
+        tz = params.get("tz", get_current_timezone())
+        statistics = params.get("agg", [])
+        by_datalogger = params.get("group_by") == "datalogger"
+        slots = summarize_dataloggers(
+            ids,
+            params["span"],
+            params.get("since"),
+            params.get("before"),
+            tz,
+            statistics,
+            labels=params.get("label"),
+            by_datalogger=by_datalogger,
+        )
+        columns = statistics or ["value"]
+
+        if isinstance(request.accepted_renderer, ColumnarJSONRenderer):
+            groups: Dict[Optional[str], List[Any]] = {}
+            for aggregate in slots:
+                groups.setdefault(aggregate.datalogger, []).append(
+                    (
+                        aggregate.label,
+                        aggregate.slot,
+                        *slot_values(aggregate, statistics),
+                    )
+                )
+            if by_datalogger:
+                return Response(
+                    {pk: to_columnar(group, columns) for pk, group in groups.items()}
+                )
+            return Response(to_columnar(groups.get(None, []), columns))
+
+        # datetimes are output in the requested time zone
+        with override(tz):
+            response_serializer = DataRecordAggregateResponseSerializer(
+                [
                     {
-                        "label": label,
-                        "time_slot": item["time_slot"],
-                        "value": item["value"],
+                        **(
+                            {"datalogger": aggregate.datalogger}
+                            if by_datalogger
+                            else {}
+                        ),
+                        "label": aggregate.label,
+                        "time_slot": aggregate.slot,
+                        **dict(zip(columns, slot_values(aggregate, statistics))),
                     }
-                )
+                    for aggregate in slots
+                ],
+                many=True,
+            )
+            return Response(response_serializer.data)
 
-        response_serializer = DataRecordAggregateResponseSerializer(
-            aggregation, many=True
+
+class LatestView(APIView):
+    """
+    This view implements the GET /api/latest endpoint returning the last measurement
+    of each label of one or several dataloggers: {datalogger id: {label: {"at": ...,
+    "value": ...}}}, a label being missing when it has no measurement.
+
+    Served from the in-memory LatestValueStore: a hit, for a datalogger already in
+    the registry, does not reach the database. The response is a 404 listing the
+    unknown ids if any.
+    """
+
+    renderer_classes = [JSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        serializer = LatestQueryParamsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        ids = [str(pk) for pk in params["datalogger"]]
+        dataloggers = get_dataloggers(ids)
+        unknown = [pk for pk in ids if dataloggers[pk] is None]
+        if unknown:
+            raise NotFound(
+                {"detail": "Some dataloggers were not found.", "unknown": unknown}
+            )
+
+        labels = params.get("label")
+        format_datetime = datetime_formatter()
+        return Response(
+            {
+                pk: {
+                    label: {"at": format_datetime(at), "value": value}
+                    for label, (at, value) in sorted(values.items())
+                    if labels is None or label in labels
+                }
+                for pk, values in get_latest_values(ids).items()
+            }
+        )
+
+
+class MetricsView(APIView):
+    """
+    This view implements the GET /api/metrics endpoint exposing the in-process counters
+    of the API (write-behind ingest buffer, datalogger registry, summary cache, latest
+    values), null for the components that are disabled or not used yet.
+    """
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return Response(
+            {
+                "ingest_buffer": ingest_buffer_stats(),
+                "datalogger_registry": datalogger_registry_stats(),
+                "summary_cache": summary_cache_stats(),
+                "latest_values": latest_store_stats(),
+            }
         )
-        return Response(response_serializer.data)
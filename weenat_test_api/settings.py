@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+from typing import Any, Dict, Optional
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -94,6 +95,23 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # /api/summary results, see SUMMARY_CACHE
+    "summary": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "summary",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 500},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -134,3 +152,79 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# API tuning
+
+# Maximum number of records accepted by one POST /api/ingest/batch request
+INGEST_BATCH_MAX_RECORDS = 10_000
+
+# Batches of at least this many measurements are written with a PostgreSQL COPY
+# instead of a multi-row INSERT (None disables COPY)
+INGEST_COPY_THRESHOLD = 1_000
+
+# Ingest queues the aggregates of the inserted measurements, a process folds them into
+# the rollups after an ingest commit at most every ROLLUP_FOLD_INTERVAL seconds (None:
+# only the fold_rollups command does)
+ROLLUP_FOLD_INTERVAL: Optional[float] = 5.0
+
+# GET /api/data pages: default number of measurements, and maximum a client can ask
+RAW_DATA_PAGE_SIZE = 1_000
+RAW_DATA_MAX_PAGE_SIZE = 10_000
+# GET /api/data/batch: maximum number of dataloggers fetched at once
+RAW_DATA_MAX_DATALOGGERS = 100
+# GET /api/summary/fleet: maximum number of dataloggers listed in a request (the
+# whole fleet is summarized when none is listed)
+SUMMARY_MAX_DATALOGGERS = 1_000
+# GET /api/summary?fill=...: maximum number of slots of the dense series of a label
+SUMMARY_MAX_FILLED_SLOTS = 10_000
+# GET /api/data/rolling: maximum number of points of a label
+ROLLING_MAX_POINTS = 10_000
+# GET /api/data?stream=true: rows fetched from the server-side cursor and sent per chunk
+RAW_DATA_STREAM_CHUNK_SIZE = 2_000
+
+# In-process cache of the known dataloggers shared by the ingest and read paths:
+# at most CAPACITY entries, kept TTL seconds, or NEGATIVE_TTL seconds for unknown ids
+DATALOGGER_REGISTRY: Dict[str, Any] = {
+    "CAPACITY": 10_000,
+    "TTL": 300.0,
+    "NEGATIVE_TTL": 5.0,
+}
+
+# POST /api/ingest/stream commits valid records in chunks of this size
+INGEST_STREAM_CHUNK_SIZE = 500
+# NDJSON lines longer than this are rejected without being parsed
+INGEST_STREAM_MAX_LINE_BYTES = 64 * 1024
+
+# Asynchronous ingest: POST /api/ingest only validates and queues the record in a
+# bounded in-process buffer (202), a background worker writes it in bulk when the
+# buffer holds FLUSH_RECORDS records or every FLUSH_INTERVAL seconds. When the buffer
+# holds MAX_RECORDS records, requests are rejected with FULL_STATUS (429 or 503).
+INGEST_WRITE_BEHIND: Dict[str, Any] = {
+    "ENABLED": False,
+    "MAX_RECORDS": 10_000,
+    "FLUSH_RECORDS": 500,
+    "FLUSH_INTERVAL": 1.0,
+    "FULL_STATUS": 503,
+}
+
+# GET /api/summary results are cached in the ALIAS cache of CACHES, whose backend
+# bounds the number of entries. Results larger than MAX_ENTRY_BYTES are not cached.
+# Entries are invalidated by the writes overlapping their range; an entry followed by
+# more than MAX_WRITES writes of its datalogger is dropped without checking them.
+SUMMARY_CACHE: Dict[str, Any] = {
+    "ENABLED": True,
+    "ALIAS": "summary",
+    "MAX_ENTRY_BYTES": 128 * 1024,
+    "MAX_WRITES": 100,
+}
+
+# GET /api/latest is served from an in-process store of the last value of each label
+# of each datalogger, warmed on first use and updated by the writes of this process.
+# Entries are reloaded after TTL seconds (None: never) to see the writes of other
+# processes. At most MAX_DATALOGGERS dataloggers per request.
+LATEST_VALUES: Dict[str, Any] = {
+    "ENABLED": True,
+    "TTL": 60.0,
+    "MAX_DATALOGGERS": 1_000,
+}
@@ -15,7 +15,18 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from api.views import FetchRawDataView, IngestDataView, SummaryView
+from api.views import (
+    FetchMultiRawDataView,
+    FetchRawDataView,
+    FleetSummaryView,
+    IngestBatchDataView,
+    IngestDataView,
+    IngestStreamDataView,
+    LatestView,
+    MetricsView,
+    RollingDataView,
+    SummaryView,
+)
 from django.contrib import admin
 from django.urls import path
 
@@ -23,6 +34,25 @@ from django.urls import path
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/ingest/", IngestDataView.as_view(), name="api_ingest_data"),
+    path("api/ingest/batch/", IngestBatchDataView.as_view(), name="api_ingest_batch"),
+    path(
+        "api/ingest/stream/",
+        IngestStreamDataView.as_view(),
+        name="api_ingest_stream",
+    ),
     path("api/data/", FetchRawDataView.as_view(), name="api_fetch_data_raw"),
+    path(
+        "api/data/batch/",
+        FetchMultiRawDataView.as_view(),
+        name="api_fetch_data_raw_batch",
+    ),
+    path("api/data/rolling/", RollingDataView.as_view(), name="api_fetch_data_rolling"),
     path("api/summary/", SummaryView.as_view(), name="api_fetch_data_aggregates"),
+    path(
+        "api/summary/fleet/",
+        FleetSummaryView.as_view(),
+        name="api_fetch_data_aggregates_fleet",
+    ),
+    path("api/latest/", LatestView.as_view(), name="api_latest"),
+    path("api/metrics/", MetricsView.as_view(), name="api_metrics"),
 ]